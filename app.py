@@ -1,16 +1,57 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import plotly.express as px
-import os
-from crop_recommendation_model import train_model, predict_crop
-from crop_data import crop_info, get_dataset, fertilizer_info, recommend_fertilizer
-from reportlab_pdf import create_pdf_report
-from settings import load_settings, settings_page
+from compute_scheduler import SchedulerBusy
+from crop_recommendation_model import get_model, model_version, predict_crop
+from crop_data import recommend_fertilizer, optimal_levels_for
+from settings import settings_page
+from email_outbox import email_status_panel
+from climate_grid import climate_for_location, get_climate_grid, slider_values
+from field_history import record_submission
+from model_inputs import SLIDER_RANGES, field_row
+from drift_monitor import observe_inputs
+from suitability_map import get_suitability_map, suitability_map_page
+from result_store import get_session_store, input_key
+from result_sections import (crop_cards, input_range_warning, visualization_section, explanation_section,
+                             what_if_section, robustness_section, similar_fields_section, condition_analysis_section,
+                             fertilizer_section, rotation_section, pdf_section)
 
-# Load email settings
-load_settings()
+def input_row(field_conditions):
+    """The field conditions as one model input row."""
+    return np.array([field_row(field_conditions)])
+
+def compute_recommendation(field_conditions):
+    """
+    Run the recommendation pipeline for one set of field conditions.
+    
+    Returns:
+        dict: Class probabilities, top 3 crops with confidences, fertilizer
+            recommendations and optimal N/P/K levels for the top crop
+    """
+    # Load the compact model, shared by all sessions (trained on first use)
+    model, label_encoder = get_model()
+    
+    # Prepare input data for prediction
+    input_data = input_row(field_conditions)
+    
+    # Make prediction with probabilities
+    predictions, probabilities = predict_crop(model, label_encoder, input_data)
+    
+    # Get top 3 recommendations
+    top_indices = np.argsort(probabilities[0])[::-1][:3]
+    top_crops = [label_encoder.inverse_transform([idx])[0] for idx in top_indices]
+    top_probs = [probabilities[0][idx] * 100 for idx in top_indices]
+    
+    top_crop = top_crops[0]
+    return {
+        'probabilities': probabilities[0],
+        'classes': list(label_encoder.classes_),
+        'top_crops': top_crops,
+        'top_probs': top_probs,
+        'fertilizer_recs': recommend_fertilizer(
+            field_conditions['n_value'], field_conditions['p_value'], field_conditions['k_value'], top_crop
+        ),
+        'optimal_levels': optimal_levels_for(top_crop),
+    }
 
 # Set page configuration
 st.set_page_config(
@@ -48,7 +89,9 @@ st.markdown("""
 # Use horizontal radio buttons at top for better mobile experience
 col1, col2, col3 = st.columns([1, 2, 1])
 with col2:
-    page = st.radio("Navigation", ["Home", "Settings"], horizontal=True)
+    # The map page only appears once `python suitability_map.py build` has run
+    pages = ["Home", "Suitability Map", "Settings"] if get_suitability_map() is not None else ["Home", "Settings"]
+    page = st.radio("Navigation", pages, horizontal=True)
 
 if page == "Home":
     # App title and description
@@ -67,6 +110,7 @@ if page == "Home":
 
 # Initialize variables to avoid "possibly unbound" errors
 submit_button = False
+field_id = ""
 soil_type = "Loamy"
 n_value = 50
 p_value = 50
@@ -104,8 +148,32 @@ if page == "Home":
     # Create sidebar for inputs
     st.sidebar.header("Field Conditions")
     
+    # Optional location, outside the form so it updates the sliders as soon
+    # as it is entered: temperature, humidity and rainfall defaults come from
+    # local climate grids (see climate_grid.py). Hidden without a grid.
+    prefill = {}
+    if get_climate_grid() is not None:
+        location = st.sidebar.text_input("Location (optional)", max_chars=64, key='location',
+                                         help="Latitude and longitude (e.g. 12.97, 77.59) or a district code")
+        if location.strip():
+            try:
+                climate = climate_for_location(location)
+            except ValueError as e:
+                st.sidebar.warning(str(e))
+            else:
+                prefill = slider_values(climate)
+                clamped = [name for name, value in prefill.items() if abs(climate[name] - value) > 0.05]
+                st.sidebar.caption(
+                    f"Prefilled from local climate data for {climate['label']}"
+                    + (f" (limited to the slider range: {', '.join(clamped)})" if clamped else "")
+                    + ". Adjust the sliders if your field differs.")
+    
     # Input form for environmental conditions 
     with st.sidebar.form("input_form"):
+        # Optional name, so submissions for the same field can be found in the history
+        field_id = st.text_input("Field Name or ID (optional)", max_chars=64, key='field-id',
+                                 help="Used to group your submissions for this field in the history")
+        
         # Soil type selection
         soil_type = st.selectbox(
             "Soil Type",
@@ -114,354 +182,113 @@ if page == "Home":
         )
     
         # Numerical inputs with appropriate ranges
-        n_value = st.slider("Nitrogen (N) Content (kg/ha)", 0, 140, 50, help="Amount of nitrogen in the soil")
-        p_value = st.slider("Phosphorus (P) Content (kg/ha)", 5, 145, 50, help="Amount of phosphorus in the soil")
-        k_value = st.slider("Potassium (K) Content (kg/ha)", 5, 205, 50, help="Amount of potassium in the soil")
+        n_value = st.slider("Nitrogen (N) Content (kg/ha)", *SLIDER_RANGES['n_value'], 50, help="Amount of nitrogen in the soil")
+        p_value = st.slider("Phosphorus (P) Content (kg/ha)", *SLIDER_RANGES['p_value'], 50, help="Amount of phosphorus in the soil")
+        k_value = st.slider("Potassium (K) Content (kg/ha)", *SLIDER_RANGES['k_value'], 50, help="Amount of potassium in the soil")
         
         # Temperature input
-        temperature = st.slider("Temperature (°C)", 8.0, 44.0, 25.0, help="Average temperature in your area")
+        # A prefilled default gives the slider a new identity, so a new
+        # location replaces the old value while manual changes still stick
+        temperature = st.slider("Temperature (°C)", *SLIDER_RANGES['temperature'], prefill.get('temperature', 25.0),
+                                help="Average temperature in your area")
         
         # Humidity input
-        humidity = st.slider("Humidity (%)", 14.0, 100.0, 65.0, help="Average humidity percentage in your area")
+        humidity = st.slider("Humidity (%)", *SLIDER_RANGES['humidity'], prefill.get('humidity', 65.0),
+                             help="Average humidity percentage in your area")
         
         # pH input
-        ph_value = st.slider("pH Value", 3.5, 10.0, 6.5, help="pH level of your soil")
+        ph_value = st.slider("pH Value", *SLIDER_RANGES['ph_value'], 6.5, help="pH level of your soil")
         
         # Rainfall input
-        rainfall = st.slider("Rainfall (mm)", 20.0, 300.0, 100.0, help="Average rainfall in your area")
+        rainfall = st.slider("Rainfall (mm)", *SLIDER_RANGES['rainfall'], prefill.get('rainfall', 100.0),
+                             help="Average rainfall in your area")
         
         # Submit button
         submit_button = st.form_submit_button("Get Recommendations")
 
-# Main area for displaying results
-if page == "Home" and submit_button:
-    # Show a spinner while processing
-    with st.spinner("Analyzing your field conditions..."):
-        # Load and train the model
-        model, label_encoder = train_model()
-        
-        # Prepare input data for prediction
-        input_data = np.array([[n_value, p_value, k_value, temperature, humidity, ph_value, rainfall]])
-        
-        # Make prediction with probabilities
-        predictions, probabilities = predict_crop(model, label_encoder, input_data)
-        
-        # Get top 3 recommendations
-        top_indices = np.argsort(probabilities[0])[::-1][:3]
-        top_crops = [label_encoder.inverse_transform([idx])[0] for idx in top_indices]
-        top_probs = [probabilities[0][idx] * 100 for idx in top_indices]
-        
-        # Display results
-        st.header("Recommended Crops")
-        
-        # Create columns for top recommendations
-        cols = st.columns(3)
-        
-        for i, (crop, prob) in enumerate(zip(top_crops, top_probs)):
-            with cols[i]:
-                st.subheader(f"{i+1}. {crop}")
-                st.metric("Confidence", f"{prob:.1f}%")
-                
-                # Display crop information
-                if crop in crop_info:
-                    info = crop_info[crop]
-                    st.write(f"**Description:** {info['description']}")
-                    st.write(f"**Growing Season:** {info['growing_season']}")
-                    st.write(f"**Ideal Conditions:**")
-                    st.write(f"- Temperature: {info['ideal_temp']}")
-                    st.write(f"- Soil pH: {info['ideal_ph']}")
-                    st.write(f"- Water Needs: {info['water_needs']}")
-        
-        # Visualization section
-        st.header("Visualization")
-        
-        # Create a bar chart for probabilities
-        fig = px.bar(
-            x=[crop for crop in top_crops],
-            y=[prob for prob in top_probs],
-            labels={'x': 'Crop', 'y': 'Confidence (%)'},
-            title='Top Crop Recommendations',
-            color=top_probs,
-            color_continuous_scale='Viridis',
-        )
-        st.plotly_chart(fig)
-        
-        # Display a radar chart for input conditions
-        categories = ['Nitrogen', 'Phosphorus', 'Potassium', 'Temperature', 'Humidity', 'pH', 'Rainfall']
-        
-        # Normalize values for better visualization
-        normalized_values = [
-            n_value/140, p_value/145, k_value/205, 
-            (temperature-8)/(44-8), humidity/100, 
-            (ph_value-3.5)/(10-3.5), rainfall/300
-        ]
-        
-        fig = px.line_polar(
-            r=normalized_values,
-            theta=categories,
-            line_close=True,
-            title="Your Field Conditions",
-        )
-        fig.update_traces(fill='toself')
-        st.plotly_chart(fig)
-        
-        # Show environmental condition analysis
-        st.header("Environmental Condition Analysis")
-        
-        # Create a comparison table
-        comparison_data = []
-        for crop in top_crops:
-            if crop in crop_info:
-                info = crop_info[crop]
-                comparison_data.append({
-                    "Crop": crop,
-                    "Your Temperature": f"{temperature}°C",
-                    "Ideal Temperature": info['ideal_temp'],
-                    "Your pH": f"{ph_value}",
-                    "Ideal pH": info['ideal_ph'],
-                    "Your Rainfall": f"{rainfall} mm",
-                    "Water Needs": info['water_needs']
-                })
-        
-        if comparison_data:
-            st.table(pd.DataFrame(comparison_data))
-            
-        # Fertilizer recommendation section
-        st.header("Fertilizer Recommendations")
-        
-        # Get fertilizer recommendations for the top crop
-        if top_crops:
-            top_crop = top_crops[0]
-            fertilizer_recs = recommend_fertilizer(n_value, p_value, k_value, top_crop)
-            
-            st.write(f"Based on your soil nutrient levels and the recommended crop ({top_crop}), we suggest:")
-            
-            # Create columns for fertilizer recommendations
-            fert_cols = st.columns(len(fertilizer_recs))
-            
-            for i, rec in enumerate(fertilizer_recs):
-                with fert_cols[i]:
-                    st.subheader(rec["fertilizer"])
-                    st.write(rec["rationale"])
-                    
-                    # Display fertilizer details if available in our database
-                    if rec["fertilizer"] in fertilizer_info:
-                        fert_data = fertilizer_info[rec["fertilizer"]]
-                        st.write("**Details:**")
-                        st.write(f"- {fert_data['description']}")
-                        st.write(f"- N-P-K Content: {fert_data['n_content']}-{fert_data['p_content']}-{fert_data['k_content']}")
-                        st.write(f"- Recommended application: {fert_data['application_rate']}")
-                        st.write(f"- Best time to apply: {fert_data['best_time']}")
-            
-            # Show NPK deficiency visualization
-            st.subheader("Soil Nutrient Analysis")
-            
-            # Define optimal NPK levels for the recommended crop
-            optimal_levels = {"N": 80, "P": 40, "K": 40}
-            if top_crop in ["rice", "maize", "wheat"]:
-                optimal_levels = {"N": 120, "P": 60, "K": 50}
-            elif top_crop in ["vegetables", "tomato", "potato", "cabbage"]:
-                optimal_levels = {"N": 100, "P": 80, "K": 80}
-            
-            # Calculate deficiency percentages
-            n_deficit_pct = max(0, 100 * (1 - (n_value / optimal_levels["N"])))
-            p_deficit_pct = max(0, 100 * (1 - (p_value / optimal_levels["P"])))
-            k_deficit_pct = max(0, 100 * (1 - (k_value / optimal_levels["K"])))
-            
-            # Create a bar chart for nutrient deficiencies
-            nutrient_df = pd.DataFrame({
-                "Nutrient": ["Nitrogen (N)", "Phosphorus (P)", "Potassium (K)"],
-                "Current Level": [n_value, p_value, k_value],
-                "Optimal Level": [optimal_levels["N"], optimal_levels["P"], optimal_levels["K"]],
-                "Deficiency (%)": [n_deficit_pct, p_deficit_pct, k_deficit_pct]
-            })
-            
-            # Create two columns for visualization
-            nutrient_cols = st.columns(2)
-            
-            with nutrient_cols[0]:
-                # Bar chart comparing current vs optimal
-                fig = px.bar(
-                    nutrient_df,
-                    x="Nutrient",
-                    y=["Current Level", "Optimal Level"],
-                    barmode="group",
-                    title=f"Soil Nutrient Levels for {top_crop}",
-                    color_discrete_sequence=["#1E88E5", "#FFC107"]
-                )
-                st.plotly_chart(fig)
-            
-            with nutrient_cols[1]:
-                # Pie chart showing deficiency percentage
-                if any([n_deficit_pct > 0, p_deficit_pct > 0, k_deficit_pct > 0]):
-                    # Only nutrients with deficiency
-                    deficiency_data = []
-                    labels = []
-                    
-                    if n_deficit_pct > 0:
-                        deficiency_data.append(n_deficit_pct)
-                        labels.append("Nitrogen (N)")
-                    if p_deficit_pct > 0:
-                        deficiency_data.append(p_deficit_pct)
-                        labels.append("Phosphorus (P)")
-                    if k_deficit_pct > 0:
-                        deficiency_data.append(k_deficit_pct)
-                        labels.append("Potassium (K)")
-                    
-                    if deficiency_data:
-                        fig = px.pie(
-                            values=deficiency_data,
-                            names=labels,
-                            title="Nutrient Deficiency Distribution",
-                            color_discrete_sequence=px.colors.sequential.Viridis
-                        )
-                        st.plotly_chart(fig)
-                    else:
-                        st.info("Your soil has adequate nutrient levels. No significant deficiencies detected.")
-                else:
-                    st.info("Your soil has adequate nutrient levels. No significant deficiencies detected.")
-                    
-            # Generate PDF Report Section
-            st.header("PDF Report")
-            st.write("Get a comprehensive PDF report of your crop and fertilizer recommendations for offline reference.")
-            
-            # Collect all data for the PDF report
-            field_conditions = {
-                'soil_type': soil_type,
-                'n_value': n_value,
-                'p_value': p_value,
-                'k_value': k_value,
-                'temperature': temperature,
-                'humidity': humidity,
-                'ph_value': ph_value,
-                'rainfall': rainfall
-            }
-            
-            # Soil analysis for PDF
-            soil_analysis = {
-                'n_value': n_value,
-                'p_value': p_value,
-                'k_value': k_value
-            }
-            
-            # Create PDF generation button
-            pdf_col1, pdf_col2 = st.columns([2, 3])
-            
-            with pdf_col1:
-                generate_pdf = st.button("Generate PDF Report")
-                
-            # Generate PDF when button is clicked
-            if generate_pdf:
-                with st.spinner("Generating PDF Report..."):
-                    # Create the PDF report
-                    b64_pdf, pdf_bytes = create_pdf_report(
-                        field_conditions=field_conditions,
-                        top_crops=top_crops,
-                        top_probs=top_probs,
-                        fertilizer_recs=fertilizer_recs,
-                        soil_analysis=soil_analysis,
-                        optimal_levels=optimal_levels,
-                        crop_info=crop_info
-                    )
-                    
-                    st.success("PDF Report Generated! You can now download or email it.")
-                    
-                    # Create columns for download and email buttons
-                    download_col, email_col = st.columns(2)
-                    
-                    # Download button
-                    with download_col:
-                        st.download_button(
-                            label="Download PDF Report",
-                            data=pdf_bytes,
-                            file_name="crop_fertilizer_report.pdf",
-                            mime="application/pdf",
-                            key='pdf-download'
-                        )
-                    
-                    # Email section
-                    with email_col:
-                        # Add email input
-                        email_address = st.text_input("Email address to send the report to:", placeholder="your.email@example.com")
-                        
-                        # Email button
-                        if st.button("Email PDF Report"):
-                            if email_address and "@" in email_address:
-                                # Here we'll add the email sending logic
-                                with st.spinner("Sending email..."):
-                                    try:
-                                        import smtplib
-                                        from email.mime.multipart import MIMEMultipart
-                                        from email.mime.base import MIMEBase
-                                        from email.mime.text import MIMEText
-                                        from email.utils import formatdate
-                                        from email import encoders
-                                        
-                                        # Check if we have environment variables for email
-                                        import os
-                                        
-                                        # Ask for email credentials if not already set
-                                        if not os.environ.get('EMAIL_PASSWORD'):
-                                            st.error("Email configuration required. Please ask the administrator to set up email credentials.")
-                                        else:
-                                            # Setup email
-                                            sender_email = os.environ.get('EMAIL_USER', 'cropadviser@example.com')
-                                            sender_password = os.environ.get('EMAIL_PASSWORD')
-                                            
-                                            msg = MIMEMultipart()
-                                            msg['From'] = sender_email
-                                            msg['To'] = email_address
-                                            msg['Date'] = formatdate(localtime=True)
-                                            msg['Subject'] = "Your Crop & Fertilizer Recommendation Report"
-                                            
-                                            # Email body
-                                            email_body = f"""
-                                            Hello,
-                                            
-                                            Thank you for using our Crop & Fertilizer Recommendation System.
-                                            
-                                            Attached is your personalized report based on the field conditions you provided.
-                                            
-                                            Top recommended crop: {top_crops[0] if top_crops else 'N/A'}
-                                            
-                                            This report includes detailed recommendations for crops, fertilizers, and soil analysis
-                                            to help optimize your agricultural practices.
-                                            
-                                            Regards,
-                                            Crop & Fertilizer Recommendation System
-                                            """
-                                            
-                                            msg.attach(MIMEText(email_body))
-                                            
-                                            # Attach PDF
-                                            part = MIMEBase('application', 'pdf')
-                                            part.set_payload(pdf_bytes)
-                                            encoders.encode_base64(part)
-                                            part.add_header('Content-Disposition', 'attachment', filename="crop_fertilizer_report.pdf")
-                                            msg.attach(part)
-                                            
-                                            # Connect to server and send email
-                                            smtp_server = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
-                                            smtp_port = int(os.environ.get('SMTP_PORT', 587))
-                                            
-                                            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                                                server.starttls()
-                                                server.login(sender_email, sender_password)
-                                                server.sendmail(sender_email, email_address, msg.as_string())
-                                            
-                                            st.success(f"Email sent successfully to {email_address}!")
-                                    except Exception as e:
-                                        st.error(f"Failed to send email: {str(e)}")
-                                        st.info("For testing purposes, you can use the download option instead.")
-                            else:
-                                st.error("Please enter a valid email address.")
-        
+# Collect the submitted field conditions
+field_conditions = {
+    'soil_type': soil_type,
+    'n_value': n_value,
+    'p_value': p_value,
+    'k_value': k_value,
+    'temperature': temperature,
+    'humidity': humidity,
+    'ph_value': ph_value,
+    'rainfall': rainfall
+}
+
+# Look up the recommendation for these inputs. Reruns triggered by the
+# PDF and email buttons reuse the stored result instead of recomputing it;
+# form widgets keep their submitted values, so the key still matches.
+# Results are keyed by model version too: after publish_model(), the same
+# inputs are scored again by the new model.
+result = None
+if page == "Home":
+    result_store = get_session_store()
+    inputs = input_key(field_conditions)
+    
+    if submit_button:
+        # get_model() first, so model_version() names the live version
+        get_model()
+        result_key = (inputs, model_version())
+        result = result_store.get(result_key)
+        if result is None:
+            # Show a spinner while processing
+            with st.spinner("Analyzing your field conditions..."):
+                try:
+                    result = compute_recommendation(field_conditions)
+                except SchedulerBusy:
+                    st.warning("The server is busy with other requests. Please try again in a moment.")
+            if result is not None:
+                result_store.put(result_key, result)
+        else:
+            # Answered from the store, so predict_crop() never saw these
+            # inputs; the drift monitor still counts every request
+            observe_inputs(input_row(field_conditions))
+        submission = None
+        if result is not None:
+            # Queued for the background history writer; never waits for the disk.
+            # The receipt names the stored row, so "Fields Like Yours" can skip it.
+            submission = record_submission(field_conditions, result, field_id=field_id.strip(),
+                                           model_version=model_version())
+        st.session_state['submission'] = submission
+        st.session_state['active_result_key'] = result_key
+    else:
+        # Keep showing the submitted result, from the model that produced it
+        result_key = st.session_state.get('active_result_key')
+        if result_key is not None and result_key[0] == inputs:
+            result = result_store.get(result_key)
+
+# Main area for displaying results. The crop cards are drawn first; each
+# following section is an independently rerunnable fragment.
+if result is not None:
+    crop_cards(result)
+    input_range_warning(field_conditions)
+    visualization_section(result, field_conditions)
+    explanation_section(result, field_conditions)
+    what_if_section(result, field_conditions)
+    robustness_section(result, field_conditions)
+    similar_fields_section(result, field_conditions)
+    condition_analysis_section(result, field_conditions)
+    fertilizer_section(result, field_conditions)
+    rotation_section(result, field_conditions)
+    pdf_section(result, field_conditions)
+
+# Precomputed regional map
+elif page == "Suitability Map":
+    suitability_map_page()
+
 # Settings page
 elif page == "Settings":
     settings_page()
 
-# Display educational information when on Home page but no form submitted
-if page == "Home" and not submit_button:
+# Delivery status of emails queued by this session
+if page == "Home":
+    email_status_panel()
+
+# Display educational information when on Home page but no results to show
+if page == "Home" and result is None:
     st.header("How it works")
     st.write("""
     1. Enter your field's environmental conditions in the sidebar
@@ -480,6 +307,7 @@ if page == "Home" and not submit_button:
     st.header("Sample Crop Requirements")
     
     # Create a sample dataframe for display
+    import pandas as pd
     sample_data = pd.DataFrame([
         ["Rice", "20-30°C", "5.5-6.5", "High (150-300 mm)"],
         ["Wheat", "15-25°C", "6.0-7.0", "Moderate (75-100 mm)"],
@@ -0,0 +1,129 @@
+"""
+Measure the bytes the app sends to the browser per rerun in each chart mode.
+
+Runs app.py headlessly with Streamlit's AppTest once per CHART_MODE, submits
+the default field conditions, then triggers a plain rerun. For each run it
+sums the serialized size of the ForwardMsgs (the websocket payload), and
+separately the part carrying chart elements. Static images are sent as URLs
+over the websocket; their PNG bytes are fetched once over HTTP and cached by
+the browser, and are listed in their own column.
+
+Usage:
+    python benchmark_chart_payload.py [--modes full lite static native]
+"""
+import argparse
+import os
+
+from chart_payload import CHART_MODE_ENV_VAR, CHART_MODES
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(HERE, "app.py")
+
+# ForwardMsg element types that carry charts
+CHART_ELEMENTS = ('plotly_chart', 'arrow_vega_lite_chart', 'vega_lite_chart', 'imgs')
+
+
+def _record_forward_msgs(log):
+    """Wrap AppTest's script runner so every run appends its ForwardMsgs to log."""
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    original_run = LocalScriptRunner.run
+
+    def run(self, *args, **kwargs):
+        tree = original_run(self, *args, **kwargs)
+        log.append(list(self.forward_msgs()))
+        return tree
+
+    LocalScriptRunner.run = run
+    return lambda: setattr(LocalScriptRunner, 'run', original_run)
+
+
+def _payload(msgs):
+    """Return (total bytes, chart bytes) of one run's ForwardMsgs."""
+    total = chart = 0
+    for msg in msgs:
+        size = msg.ByteSize()
+        total += size
+        if msg.WhichOneof('type') == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+            if msg.delta.new_element.WhichOneof('type') in CHART_ELEMENTS:
+                chart += size
+    return total, chart
+
+
+def _image_bytes(mode, field_conditions, result):
+    """PNG bytes of the images a chart mode fetches over HTTP."""
+    from report_charts import condition_radar_png, confidence_chart_png, nutrient_chart_png
+
+    if mode == 'native':
+        # Native mode only falls back to an image for the radar chart
+        return len(condition_radar_png(field_conditions, compact=True))
+    if mode != 'static':
+        return 0
+    soil_analysis = {key: field_conditions[key] for key in ('n_value', 'p_value', 'k_value')}
+    return (len(confidence_chart_png(result['top_crops'], result['top_probs'], compact=True))
+            + len(condition_radar_png(field_conditions, compact=True))
+            + len(nutrient_chart_png(soil_analysis, result['optimal_levels'],
+                                     result['top_crops'][0], compact=True)))
+
+
+def measure_mode(mode):
+    """
+    Run the app in one chart mode.
+
+    Returns:
+        dict: websocket bytes for the submit run and a follow-up rerun, chart
+            bytes within them, and image bytes fetched over HTTP
+    """
+    from streamlit.testing.v1 import AppTest
+
+    os.environ[CHART_MODE_ENV_VAR] = mode
+    log = []
+    restore = _record_forward_msgs(log)
+    try:
+        at = AppTest.from_file(APP_PATH, default_timeout=120).run()
+        next(b for b in at.button if b.label == "Get Recommendations").click().run()
+        submit_total, _ = _payload(log[-1])
+        at.run()
+        rerun_total, rerun_chart = _payload(log[-1])
+        if at.exception:
+            raise RuntimeError(f"app raised in {mode} mode: {at.exception[0].message}")
+        result_key = at.session_state['active_result_key']
+        result = at.session_state['result_store'].get(result_key)
+    finally:
+        restore()
+
+    return {
+        'mode': mode,
+        'submit_bytes': submit_total,
+        'rerun_bytes': rerun_total,
+        'chart_bytes': rerun_chart,
+        'image_bytes': _image_bytes(mode, dict(result_key[0]), result),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--modes", nargs="+", default=list(CHART_MODES), choices=CHART_MODES,
+                        help="Chart modes to measure")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    results = [measure_mode(mode) for mode in args.modes]
+    print(f"{'mode':<8} {'submit B':>10} {'rerun B':>10} {'charts B':>10} {'images B (once)':>16}")
+    for row in results:
+        print(f"{row['mode']:<8} {row['submit_bytes']:>10} {row['rerun_bytes']:>10} "
+              f"{row['chart_bytes']:>10} {row['image_bytes']:>16}")
+
+    baseline = next((row for row in results if row['mode'] == 'full'), None)
+    if baseline:
+        print()
+        for row in results:
+            if row is not baseline:
+                saved = 100 * (1 - row['rerun_bytes'] / baseline['rerun_bytes'])
+                print(f"{row['mode']}: {saved:.0f}% fewer websocket bytes per rerun than full")
+
+
+if __name__ == "__main__":
+    main()
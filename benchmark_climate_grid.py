@@ -0,0 +1,153 @@
+"""
+Measure climate-grid conversion and location lookups (see climate_grid.py).
+
+Builds a synthetic grid the size of India at 30 arc-seconds (about 14
+million cells, with sea left empty) and reports conversion time, the size
+on disk against a dense float32 array, the time to open the grid, and
+lookup latency by coordinates and by district code. Loading the same
+values as a dense array, the way an unmapped lookup would, is timed for
+comparison. A small grid is also written as ESRI ASCII files, converted
+and checked cell by cell.
+
+Usage:
+    python benchmark_climate_grid.py [--lookups 20000] [--cell-size 0.008333]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import climate_grid
+from climate_grid import TILE, ClimateGrid, convert_ascii_grids, write_grid
+
+# Bounding box of the synthetic grid (degrees)
+SOUTH, NORTH, WEST, EAST = 6.0, 38.0, 68.0, 98.0
+
+
+def synthetic_band(top_row, n_rows, cols, cell_size):
+    """Smooth climate fields over a rough land mask, NaN over the sea."""
+    lat = NORTH - (top_row + np.arange(n_rows) + 0.5) * cell_size
+    lon = WEST + (np.arange(cols) + 0.5) * cell_size
+    lat, lon = np.meshgrid(lat, lon, indexing='ij')
+    temperature = 32 - 0.45 * (lat - SOUTH) + 2 * np.sin(lon / 3)
+    humidity = 55 + 25 * np.cos((lon - 75) / 6) * np.cos((lat - 20) / 8)
+    rainfall = 60 + 180 * (0.5 + 0.5 * np.sin(lon / 4 + lat / 5))
+    band = np.stack([temperature, humidity, rainfall], axis=-1)
+    # A wedge narrowing to the south stands in for the coastline
+    sea = np.abs(lon - 80) > (lat - SOUTH + 2) * 0.55
+    band[sea] = np.nan
+    return band
+
+
+def write_ascii(path, values, cell_size, nodata=-9999):
+    with open(path, "w") as f:
+        f.write(f"ncols {values.shape[1]}\nnrows {values.shape[0]}\nxllcorner {WEST}\n"
+                f"yllcorner {NORTH - values.shape[0] * cell_size}\ncellsize {cell_size}\nNODATA_value {nodata}\n")
+        np.savetxt(f, np.where(np.isnan(values), nodata, values), fmt="%.2f")
+
+
+def _latency_us(func, args):
+    timings = []
+    for a in args:
+        start = time.perf_counter()
+        func(*a)
+        timings.append(time.perf_counter() - start)
+    return np.percentile(timings, 50) * 1e6, np.percentile(timings, 99) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--cell-size", type=float, default=1 / 120, help="Degrees per cell")
+    args = parser.parse_args()
+
+    cell_size = args.cell_size
+    rows, cols = round((NORTH - SOUTH) / cell_size), round((EAST - WEST) / cell_size)
+    geometry = {'rows': rows, 'cols': cols, 'west': WEST, 'north': NORTH, 'cell_size': cell_size}
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "climate")
+        districts = {f"D{i:03d}": [f"District {i}", float(lat), float(lon)]
+                     for i, (lat, lon) in enumerate(zip(rng.uniform(10, 30, 600), rng.uniform(75, 85, 600)))}
+        bands = (synthetic_band(top, min(TILE, rows - top), cols, cell_size) for top in range(0, rows, TILE))
+        start = time.perf_counter()
+        stats = write_grid(output, geometry, bands, districts=districts)
+        elapsed = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(output, name)) for name in os.listdir(output))
+        print(f"Converted {stats['cells']:,} cells in {elapsed:.1f} s ({stats['cells'] / elapsed / 1e6:.1f} M cells/s)")
+        print(f"{stats['stored']:,} of {stats['tiles']:,} tiles stored: {size / 2 ** 20:.1f} MiB on disk, "
+              f"dense float32 would be {stats['cells'] * 12 / 2 ** 20:.1f} MiB")
+
+        start = time.perf_counter()
+        grid = ClimateGrid(output)
+        print(f"Open (map) the grid: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        # Dense alternative: the whole array read into memory
+        dense_path = os.path.join(directory, "dense.npy")
+        dense = np.lib.format.open_memmap(dense_path, mode="w+", dtype=np.float32, shape=(rows, cols, 3))
+        for top in range(0, rows, TILE):
+            dense[top:top + TILE] = synthetic_band(top, min(TILE, rows - top), cols, cell_size)
+        dense.flush()
+        del dense
+        start = time.perf_counter()
+        np.load(dense_path)
+        print(f"Load a dense float32 array instead: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        # Lookups, checked against the generating function
+        points = np.column_stack([rng.uniform(SOUTH, NORTH, args.lookups), rng.uniform(WEST, EAST, args.lookups)])
+        for lat, lon in points[:500]:
+            row, col = int((NORTH - lat) // cell_size), int((lon - WEST) // cell_size)
+            expected = synthetic_band(row, 1, cols, cell_size)[0, col]
+            found = grid.lookup(lat, lon)
+            if np.isnan(expected).all():
+                assert found is None
+            else:
+                assert np.allclose([found[name] for name in climate_grid.VARIABLES], expected, atol=0.51)
+        print(f"Lookups match the source values ({np.mean([grid.lookup(*p) is not None for p in points]):.0%} on land)")
+
+        os.environ[climate_grid.CLIMATE_GRID_ENV_VAR] = output
+        print()
+        print(f"{'per lookup':<34} {'p50 µs':>8} {'p99 µs':>8}")
+        p50, p99 = _latency_us(grid.lookup, points.tolist())
+        print(f"{'ClimateGrid.lookup':<34} {p50:>8.1f} {p99:>8.1f}")
+        texts = [(f"{lat:.4f}, {lon:.4f}",) for lat, lon in points]
+        p50, p99 = _latency_us(lambda text: _try(text), texts)
+        print(f"{'climate_for_location (lat, lon)':<34} {p50:>8.1f} {p99:>8.1f}")
+        codes = [(code,) for code in rng.choice(sorted(districts), args.lookups)]
+        p50, p99 = _latency_us(lambda text: _try(text), codes)
+        print(f"{'climate_for_location (district)':<34} {p50:>8.1f} {p99:>8.1f}")
+
+        # The ESRI ASCII path on a small grid
+        small = synthetic_band(0, 300, 400, cell_size)
+        paths = []
+        for j, name in enumerate(climate_grid.VARIABLES):
+            paths.append(os.path.join(directory, f"{name}.asc"))
+            write_ascii(paths[-1], small[:, :, j], cell_size)
+        small_output = os.path.join(directory, "small")
+        start = time.perf_counter()
+        convert_ascii_grids(small_output, *paths)
+        elapsed = time.perf_counter() - start
+        small_grid = ClimateGrid(small_output)
+        for row in range(0, 300, 7):
+            for col in range(0, 400, 11):
+                lat, lon = NORTH - (row + 0.5) * cell_size, WEST + (col + 0.5) * cell_size
+                found = small_grid.lookup(lat, lon)
+                if np.isnan(small[row, col]).all():
+                    assert found is None
+                else:
+                    assert np.allclose([found[name] for name in climate_grid.VARIABLES], small[row, col], atol=0.51)
+        print(f"\nESRI ASCII conversion of {small.shape[0] * small.shape[1]:,} cells: {elapsed:.2f} s, values match")
+
+
+def _try(text):
+    try:
+        return climate_grid.climate_for_location(text)
+    except ValueError:
+        return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Measure the input-drift monitor's cost and scores (see drift_monitor.py).
+
+Times predict_crop() on single rows with and without the monitor, and the
+monitor's own update for one row and for a large batch. Then streams
+training-like requests and shifted ones (rainfall and temperature raised)
+through fresh monitors, checks the running statistics against numpy, and
+prints the PSI and KS scores each stream gets.
+
+Usage:
+    python benchmark_drift.py [--calls 2000] [--stream 5000] [--shift 0.3]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from crop_data import get_dataset
+from drift_monitor import DriftMonitor, load_profile
+from field_history import INPUT_COLUMNS
+from model_inputs import FEATURE_RANGES
+
+
+def _per_call_us(func, calls):
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return np.percentile(timings, 50) * 1e6, np.percentile(timings, 99) * 1e6
+
+
+def training_like(n, rng):
+    """Requests resampled from the training data with a little noise."""
+    X = get_dataset().drop('label', axis=1).to_numpy(dtype=float)
+    rows = X[rng.integers(len(X), size=n)]
+    return rows + rng.normal(0, 0.02, rows.shape) * (FEATURE_RANGES[:, 1] - FEATURE_RANGES[:, 0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--stream", type=int, default=5000, help="Requests per drift stream")
+    parser.add_argument("--shift", type=float, default=0.3, help="Relative rise of rainfall and temperature")
+    args = parser.parse_args()
+
+    from crop_recommendation_model import get_model, predict_crop
+
+    rng = np.random.default_rng(0)
+    model, labels = get_model()
+    row = training_like(1, rng)
+    predict_crop(model, labels, row, lite=False)
+
+    print(f"{'per call':<34} {'p50 µs':>8} {'p99 µs':>8}")
+    timings = {
+        "predict_crop, no monitor": lambda: predict_crop(model, labels, row, lite=False, monitor=False),
+        "predict_crop, monitor": lambda: predict_crop(model, labels, row, lite=False),
+    }
+    monitor = DriftMonitor(load_profile())
+    timings["monitor update, 1 row"] = lambda: monitor.observe(row)
+    batch = training_like(10000, rng)
+    timings["monitor update, 10,000 rows"] = lambda: monitor.observe(batch)
+    timings["metrics()"] = monitor.metrics
+    for label, func in timings.items():
+        p50, p99 = _per_call_us(func, args.calls if "10,000" not in label else 50)
+        print(f"{label:<34} {p50:>8.1f} {p99:>8.1f}")
+
+    print()
+    shifted = training_like(args.stream, rng)
+    for key in ('rainfall', 'temperature'):
+        shifted[:, INPUT_COLUMNS.index(key)] *= 1 + args.shift
+    streams = {"training-like": training_like(args.stream, rng), f"+{args.shift:.0%} rain/temp": shifted}
+    print(f"{'stream':<18} {'input':<12} {'PSI':>6} {'KS':>6} {'shift sd':>8} {'outside':>8}  status")
+    for name, X in streams.items():
+        monitor = DriftMonitor(load_profile())
+        # Single requests, as the app sends them, then check against numpy
+        for x in X:
+            monitor.observe(x.reshape(1, -1))
+        metrics = monitor.metrics()
+        means = np.array([f['mean'] for f in metrics['features'].values()])
+        stds = np.array([f['std'] for f in metrics['features'].values()])
+        assert np.allclose(means, X.mean(axis=0)) and np.allclose(stds, X.std(axis=0))
+        for key, f in metrics['features'].items():
+            print(f"{name:<18} {key:<12} {f['psi']:>6.3f} {f['ks']:>6.3f} {f['mean_shift']:>+8.2f} "
+                  f"{f['out_of_range']:>8}  {f['status']}")
+        print(f"{name:<18} {'overall':<12} {metrics['flagged']:>31,} requests outside  {metrics['status']}")
+    print("\nRunning means and standard deviations match numpy")
+
+
+if __name__ == "__main__":
+    main()
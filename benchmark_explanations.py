@@ -0,0 +1,109 @@
+"""
+Measure tree-path explanation latency (see explanations.py).
+
+Times building the explainer for the served forest, explaining one field
+(uncached, and through the per-field cache the app uses), and explaining
+batches of random fields, next to predict_proba on the same rows. A plain
+Python walk of every tree is timed as well, as the per-request baseline
+the vectorized explainer replaces, and its attributions are checked against
+the vectorized ones. The additivity check confirms that each field's
+attributions add up to its predicted probability.
+
+Usage:
+    python benchmark_explanations.py [--batches 10 100 1000] [--runs 200]
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from crop_data import get_dataset
+from crop_recommendation_model import get_model
+from explanations import PathExplainer, explain_crop, explanation_cache_info
+from lite_model import distillation_samples
+from model_inputs import FEATURE_KEYS
+
+
+def _median_ms(func, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def loop_explain(explainer, x, column):
+    """Attributions of one row, walking the trees one node at a time."""
+    forest = explainer.forest
+    x = np.asarray(x, dtype=np.float32)
+
+    def value(node):
+        return explainer.node_values[node, column] if node >= 0 else explainer.leaf_values[-node - 1, column]
+
+    attributions = np.zeros(len(x))
+    for node in forest.roots.tolist():
+        while node >= 0:
+            feature = forest.feature[node]
+            child = int(forest.left[node] if x[feature] <= forest.threshold[node] else forest.right[node])
+            attributions[feature] += value(child) - value(node)
+            node = child
+    return attributions / forest.n_trees
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--batches", nargs="+", type=int, default=[10, 100, 1000], help="Rows per batch")
+    parser.add_argument("--runs", type=int, default=200, help="Timed single-row explanations")
+    args = parser.parse_args()
+
+    model, label_encoder = get_model()
+    background = get_dataset().drop('label', axis=1).to_numpy(dtype=float)
+    start = time.perf_counter()
+    explainer = PathExplainer(model, background)
+    print(f"Explainer for {model.n_trees} trees, {len(model.feature)} split nodes: "
+          f"built in {(time.perf_counter() - start) * 1000:.1f} ms over {len(background)} background rows")
+
+    X = distillation_samples(max(args.batches), seed=1)
+    classes = np.argmax(model.predict_proba(X), axis=1)
+
+    # Correctness: the loop agrees, and attributions add up to the probability
+    loop = np.array([loop_explain(explainer, x, c) for x, c in zip(X[:100], classes[:100])])
+    attributions, expected = explainer.explain(X[:100], classes[:100])
+    proba = model.predict_proba(X[:100])[np.arange(100), classes[:100]]
+    print(f"Max difference from the per-node loop: {np.abs(loop - attributions).max():.2e}")
+    print(f"Max additivity error: {np.abs(attributions.sum(axis=1) + expected - proba).max():.2e}")
+
+    # Single field, as one app request sees it
+    row, column = X[:1], classes[:1]
+    field = dict(zip(FEATURE_KEYS, X[0].tolist()))
+    crop = label_encoder.inverse_transform(column)[0]
+    print()
+    print(f"{'single field':<28} {'ms':>8}")
+    print(f"{'predict_proba':<28} {_median_ms(lambda: model.predict_proba(row), args.runs):>8.3f}")
+    print(f"{'per-node loop':<28} {_median_ms(lambda: loop_explain(explainer, row[0], column[0]), args.runs):>8.3f}")
+    print(f"{'vectorized explain':<28} {_median_ms(lambda: explainer.explain(row, column), args.runs):>8.3f}")
+    explain_crop(field, crop)
+    print(f"{'explain_crop (cached)':<28} {_median_ms(lambda: explain_crop(field, crop), args.runs):>8.3f}")
+    print(f"  cache: {explanation_cache_info()}")
+
+    print()
+    print(f"{'batch rows':>10} {'predict ms':>11} {'explain ms':>11} {'loop ms':>9} {'µs/row':>7}")
+    for size in args.batches:
+        batch, batch_classes = X[:size], classes[:size]
+        runs = max(3, args.runs // size)
+        predict_ms = _median_ms(lambda: model.predict_proba(batch), runs)
+        explain_ms = _median_ms(lambda: explainer.explain(batch, batch_classes), runs)
+        # The loop is slow; time it once on up to 100 rows and scale
+        loop_rows = min(size, 100)
+        start = time.perf_counter()
+        for x, c in zip(batch[:loop_rows], batch_classes[:loop_rows]):
+            loop_explain(explainer, x, c)
+        loop_ms = (time.perf_counter() - start) * 1000 * size / loop_rows
+        print(f"{size:>10} {predict_ms:>11.2f} {explain_ms:>11.2f} {loop_ms:>9.1f} "
+              f"{explain_ms * 1000 / size:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
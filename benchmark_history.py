@@ -0,0 +1,115 @@
+"""
+Measure field-history write throughput and query latency (see field_history.py).
+
+Records synthetic submissions into a temporary database through the
+batching writer and reports how long record() holds up the caller, how
+many submissions per second reach the disk, and how long the indexed
+queries (by time, crop and field ID) take once the table is filled. The
+same records are also written one transaction each, the way a naive
+synchronous store would, for comparison.
+
+Usage:
+    python benchmark_history.py [--records 20000] [--fields 500] [--unbatched 2000]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from crop_data import crop_info
+from field_history import (HistoryWriter, connect, crop_submissions, field_submissions,
+                           recent_submissions, submission_record, write_batch)
+from model_inputs import FEATURE_KEYS
+
+CROPS = sorted(crop_info)
+
+
+def synthetic_submissions(n, n_fields, seed=0):
+    """Submission records with random inputs, crops and field IDs."""
+    rng = np.random.default_rng(seed)
+    now = time.time()
+    records = []
+    for i in range(n):
+        field_conditions = dict(zip(FEATURE_KEYS, rng.uniform(0, 100, len(FEATURE_KEYS)).round(1).tolist()))
+        field_conditions['soil_type'] = "Loamy"
+        crops = rng.choice(CROPS, 3, replace=False).tolist()
+        probs = sorted(rng.dirichlet(np.ones(4))[:3] * 100, reverse=True)
+        result = {'top_crops': crops, 'top_probs': probs,
+                  'fertilizer_recs': [{'fertilizer': 'Urea'}, {'fertilizer': 'DAP'}]}
+        records.append(submission_record(field_conditions, result, field_id=f"field-{rng.integers(n_fields)}",
+                                         model_version="v1", created=now - (n - i)))
+    return records
+
+
+def _median_ms(func, runs=50):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--fields", type=int, default=500, help="Distinct field IDs")
+    parser.add_argument("--unbatched", type=int, default=2000, help="Records for the one-per-transaction run")
+    args = parser.parse_args()
+
+    records = synthetic_submissions(args.records, args.fields)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history.db")
+        writer = HistoryWriter(path, max_pending=args.records)
+
+        # Request-path cost: record() only enqueues
+        start = time.perf_counter()
+        calls = []
+        for row, top in records:
+            call_start = time.perf_counter()
+            writer.record(row, top)
+            calls.append(time.perf_counter() - call_start)
+        enqueued = time.perf_counter() - start
+        writer.flush()
+        total = time.perf_counter() - start
+        stats = writer.stats()
+        writer.close()
+
+        print(f"Batched writer, {args.records} submissions:")
+        print(f"  record() p50 {np.percentile(calls, 50) * 1e6:.1f} µs, p99 {np.percentile(calls, 99) * 1e6:.1f} µs "
+              f"({enqueued:.2f} s to enqueue all)")
+        print(f"  {stats['written']} written in {total:.2f} s: {stats['written'] / total:,.0f} submissions/s, "
+              f"{stats['batches']} transactions (avg {stats['avg_batch']:.0f} per batch), "
+              f"{stats['dropped']} dropped, {stats['errors']} errors")
+
+        # The naive alternative: one commit per submission, on the caller's thread
+        connection = connect(os.path.join(directory, "naive.db"))
+        subset = records[:args.unbatched]
+        start = time.perf_counter()
+        for record in subset:
+            write_batch(connection, [record])
+        elapsed = time.perf_counter() - start
+        connection.close()
+        print(f"One transaction per submission: {len(subset) / elapsed:,.0f} submissions/s "
+              f"({elapsed / len(subset) * 1000:.2f} ms each on the caller's thread)")
+
+        print()
+        print(f"Queries on {args.records} submissions ({'ms':>6}):")
+        cutoff = time.time() - args.records / 10
+        queries = {
+            "latest 50": lambda: recent_submissions(50, path=path),
+            "since a time, 50": lambda: recent_submissions(50, since=cutoff, path=path),
+            "one field ID, 50": lambda: field_submissions("field-7", path=path),
+            "top crop, 50": lambda: crop_submissions("rice", top_only=True, path=path),
+            "crop anywhere in top 3, 50": lambda: crop_submissions("rice", path=path),
+        }
+        for label, query in queries.items():
+            rows = query()
+            print(f"  {label:<28} {_median_ms(query):>6.2f}  ({len(rows)} rows)")
+
+
+if __name__ == "__main__":
+    main()
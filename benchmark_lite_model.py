@@ -0,0 +1,112 @@
+"""
+Compare the distilled lite models with the full forest.
+
+Distils each lite model kind from the compact forest and reports how often
+it agrees with the forest (top-1, and top-1 within the forest's top 3) on
+fresh samples across the slider ranges and on the training rows, together
+with single-row latency and model memory next to the compact and
+scikit-learn forests.
+
+Usage:
+    python benchmark_lite_model.py [--samples 5000] [--runs 500]
+"""
+import argparse
+import pickle
+import statistics
+import time
+import warnings
+
+import numpy as np
+
+from crop_recommendation_model import get_model, train_model
+from lite_model import LITE_KINDS, distil, distillation_samples
+
+
+def single_row_ms(model, row, runs):
+    """Median predict_proba latency for one input row, in milliseconds."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model.predict_proba(row)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def agreement(model, X, teacher_proba):
+    """Top-1 agreement and top-1-in-teacher-top-3 rate."""
+    predicted = np.argmax(model.predict_proba(X), axis=1)
+    top3 = np.argsort(teacher_proba, axis=1)[:, -3:]
+    return (float(np.mean(predicted == teacher_proba.argmax(axis=1))),
+            float(np.mean((top3 == predicted[:, None]).any(axis=1))))
+
+
+def run_benchmark(n_samples=5000, runs=500):
+    """
+    Distil and measure every lite model kind.
+
+    Returns:
+        tuple: (reference rows for the full models, rows for the lite models)
+    """
+    from crop_data import get_dataset
+
+    teacher, _ = get_model()
+    sklearn_model, _ = train_model()
+
+    # Held out from distillation by using a different seed
+    X_fresh = distillation_samples(n_samples, seed=12345)
+    X_rows = get_dataset().drop('label', axis=1).to_numpy(dtype=float)
+    fresh_proba = teacher.predict_proba(X_fresh)
+    rows_proba = teacher.predict_proba(X_rows)
+    row = X_fresh[:1]
+
+    reference = [
+        {'model': 'sklearn forest', 'kib': len(pickle.dumps(sklearn_model)) / 1024,
+         'latency_ms': single_row_ms(sklearn_model, row, max(1, runs // 25))},
+        {'model': 'compact forest', 'kib': teacher.nbytes / 1024,
+         'latency_ms': single_row_ms(teacher, row, runs)},
+    ]
+
+    results = []
+    for kind in LITE_KINDS:
+        start = time.perf_counter()
+        student = distil(teacher, kind)
+        distil_s = time.perf_counter() - start
+        fresh_top1, fresh_top3 = agreement(student, X_fresh, fresh_proba)
+        rows_top1, _ = agreement(student, X_rows, rows_proba)
+        results.append({
+            'model': f"lite {kind}",
+            'kib': student.nbytes / 1024,
+            'latency_ms': single_row_ms(student, row, runs),
+            'distil_s': distil_s,
+            'fresh_top1': fresh_top1,
+            'fresh_top3': fresh_top3,
+            'rows_top1': rows_top1,
+        })
+    return reference, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--samples", type=int, default=5000, help="Fresh samples for agreement")
+    parser.add_argument("--runs", type=int, default=500, help="Timed single-row predictions")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", category=UserWarning)
+    reference, results = run_benchmark(args.samples, args.runs)
+    compact = reference[1]
+
+    print(f"{'model':<16} {'KiB':>8} {'1-row ms':>9}")
+    for row in reference:
+        print(f"{row['model']:<16} {row['kib']:>8.1f} {row['latency_ms']:>9.3f}")
+
+    print(f"\n{'model':<16} {'KiB':>8} {'1-row ms':>9} {'distil s':>9} "
+          f"{'agree':>6} {'in top3':>8} {'agree (rows)':>13} {'memory':>8} {'speedup':>8}")
+    for row in results:
+        print(f"{row['model']:<16} {row['kib']:>8.1f} {row['latency_ms']:>9.3f} {row['distil_s']:>9.1f} "
+              f"{row['fresh_top1']:>6.3f} {row['fresh_top3']:>8.3f} {row['rows_top1']:>13.3f} "
+              f"{compact['kib'] / row['kib']:>7.1f}x {compact['latency_ms'] / row['latency_ms']:>7.1f}x")
+    print("\nAgreement is with the compact forest; memory and speedup are relative to it.")
+
+
+if __name__ == "__main__":
+    main()
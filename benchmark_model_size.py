@@ -0,0 +1,135 @@
+"""
+Accuracy-versus-size curves for the compact forest format.
+
+Trains the forest on a stratified split of the dataset for several depth
+limits, converts each one with several top-k leaf sizes, and prints the
+scikit-learn pickle size, the compact in-memory and on-disk size, load
+time, single-row latency, held-out accuracy and agreement with the
+unlimited scikit-learn forest. Use it to pick COMPACT_MAX_DEPTH and
+COMPACT_TOP_K in crop_recommendation_model.
+
+The scikit-learn load time assumes scikit-learn is already imported;
+loading a compact model needs only numpy.
+
+Usage:
+    python benchmark_model_size.py [--depths 0 10 8 6 4] [--top-k 0 3 2 1]
+    (0 means no limit)
+"""
+import argparse
+import os
+import pickle
+import statistics
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+from compact_forest import CompactForest
+
+# Fraction of the dataset held out for accuracy
+TEST_SIZE = 0.3
+
+
+def _timed(func, runs):
+    """Median wall time of func() in milliseconds, and its last result."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        value = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), value
+
+
+def split_dataset():
+    """Stratified train/test split of the crop dataset."""
+    from sklearn.model_selection import train_test_split
+    from crop_data import get_dataset
+
+    df = get_dataset()
+    X = df.drop('label', axis=1).to_numpy(dtype=float)
+    y = df['label'].astype('category').cat.codes.to_numpy()
+    return train_test_split(X, y, test_size=TEST_SIZE, stratify=y, random_state=0)
+
+
+def run_benchmark(depths, top_ks, runs=20):
+    """
+    Measure every (depth limit, top-k) combination.
+
+    Returns:
+        list: One dict per combination
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    X_train, X_test, y_train, y_test = split_dataset()
+    reference = None
+    rows = []
+    for depth in depths:
+        model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1,
+                                       max_depth=depth).fit(X_train, y_train)
+        if reference is None:
+            reference = model.predict(X_test)
+        pickled = pickle.dumps(model)
+        sklearn_load_ms, _ = _timed(lambda: pickle.loads(pickled), max(1, runs // 4))
+
+        for top_k in top_ks:
+            forest = CompactForest.from_sklearn(model, top_k=top_k)
+            fd, path = tempfile.mkstemp(suffix=".npz")
+            os.close(fd)
+            try:
+                forest.save(path)
+                file_bytes = os.path.getsize(path)
+                load_ms, _ = _timed(lambda: CompactForest.load(path), runs)
+            finally:
+                os.unlink(path)
+
+            predict_ms, _ = _timed(lambda: forest.predict_proba(X_test[:1]), runs)
+            predictions = forest.predict(X_test)
+            rows.append({
+                'depth': depth or 'none',
+                'top_k': top_k or 'all',
+                'sklearn_kib': len(pickled) / 1024,
+                'sklearn_load_ms': sklearn_load_ms,
+                'compact_kib': forest.nbytes / 1024,
+                'file_kib': file_bytes / 1024,
+                'load_ms': load_ms,
+                'predict_ms': predict_ms,
+                'accuracy': float(np.mean(predictions == y_test)),
+                'agreement': float(np.mean(predictions == reference)),
+            })
+    return rows
+
+
+def print_results(rows):
+    print(f"{'depth':>5} {'top-k':>5} {'sklearn KiB':>11} {'load ms':>8} {'compact KiB':>11} "
+          f"{'file KiB':>8} {'load ms':>8} {'1-row ms':>8} {'accuracy':>8} {'agree':>6}")
+    for row in rows:
+        print(f"{row['depth']:>5} {row['top_k']:>5} {row['sklearn_kib']:>11.0f} {row['sklearn_load_ms']:>8.1f} "
+              f"{row['compact_kib']:>11.1f} {row['file_kib']:>8.1f} {row['load_ms']:>8.2f} "
+              f"{row['predict_ms']:>8.2f} {row['accuracy']:>8.3f} {row['agreement']:>6.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 10, 8, 6, 4],
+                        help="Tree depth limits (0 = unlimited)")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[0, 3, 2, 1],
+                        help="Classes kept per leaf (0 = all)")
+    parser.add_argument("--runs", type=int, default=20, help="Timed repetitions")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", category=UserWarning)
+    rows = run_benchmark([d or None for d in args.depths], [k or None for k in args.top_k], args.runs)
+    print_results(rows)
+
+    # Smallest model that is at least as accurate as the unlimited forest
+    baseline = rows[0]['accuracy']
+    candidates = [row for row in rows if row['accuracy'] >= baseline]
+    best = min(candidates, key=lambda row: row['compact_kib'])
+    print(f"\nSmallest without accuracy loss: depth {best['depth']}, top-k {best['top_k']} "
+          f"({best['compact_kib']:.1f} KiB, {rows[0]['sklearn_kib'] / best['compact_kib']:.0f}x "
+          f"smaller than the unlimited scikit-learn forest)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare the estimators train_model() can fit (see model_zoo.py).
+
+Every candidate is cross-validated on the same stratified folds of the crop
+dataset. For each one the table shows mean fit time, single-row and batch
+prediction latency, pickled model size and cross-validated accuracy. Tree
+ensembles are also listed as compact forests (the format the app serves,
+see compact_forest.py), which changes latency and size but not fit time.
+
+Everything runs single-threaded, so the latencies are what one app session
+sees under the compute scheduler's default inference slot.
+
+Usage:
+    python benchmark_model_zoo.py [--estimators random_forest knn ...] [--folds 5]
+                                  [--batch 1000] [--runs 200]
+"""
+import argparse
+import pickle
+import statistics
+import time
+import warnings
+
+import numpy as np
+
+from compact_forest import CompactForest
+from crop_recommendation_model import COMPACT_TOP_K
+from lite_model import distillation_samples
+from model_tuning import load_dataset, stratified_folds
+from model_zoo import ESTIMATORS, TREE_ENSEMBLES, build_estimator
+
+
+def _median_ms(func, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def measure(name, X, y, folds, X_batch, runs):
+    """
+    Cross-validate one estimator.
+
+    Returns:
+        list: One row for the estimator, plus one for its compact form if it
+            is a tree ensemble
+    """
+    from threadpoolctl import threadpool_limits
+
+    n_classes = int(y.max()) + 1
+    fit_times, accuracy, compact_accuracy = [], [], []
+    with threadpool_limits(1):
+        for train, test in folds:
+            model = build_estimator(name, n_jobs=1)
+            start = time.perf_counter()
+            model.fit(X[train], y[train])
+            fit_times.append(time.perf_counter() - start)
+            accuracy.append(np.mean(model.predict(X[test]) == y[test]))
+            if name in TREE_ENSEMBLES:
+                compact = CompactForest.from_sklearn(model, top_k=COMPACT_TOP_K, n_classes=n_classes)
+                compact_accuracy.append(np.mean(compact.predict(X[test]) == y[test]))
+
+        # Latency and size of the model from the last fold
+        models = [(name, model, len(pickle.dumps(model)), accuracy)]
+        if name in TREE_ENSEMBLES:
+            models.append((f"{name} (compact)", compact, compact.nbytes, compact_accuracy))
+
+        rows = []
+        row = X_batch[:1]
+        for label, fitted, size, scores in models:
+            rows.append({
+                'model': label,
+                'fit_s': statistics.mean(fit_times),
+                'row_ms': _median_ms(lambda: fitted.predict_proba(row), runs),
+                'batch_ms': _median_ms(lambda: fitted.predict_proba(X_batch), max(3, runs // 20)),
+                'kib': size / 1024,
+                'accuracy': float(np.mean(scores)),
+                'accuracy_std': float(np.std(scores)),
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--estimators", nargs="+", default=list(ESTIMATORS), choices=list(ESTIMATORS))
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=1000, help="Rows per batch prediction")
+    parser.add_argument("--runs", type=int, default=200, help="Timed single-row predictions")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", category=UserWarning)
+    X, y = load_dataset()
+    folds = stratified_folds(y, args.folds)
+    X_batch = distillation_samples(args.batch, seed=1)
+
+    print(f"{'model':<28} {'fit s':>6} {'1-row ms':>9} {f'{args.batch}-row ms':>12} {'µs/row':>7} "
+          f"{'KiB':>8} {'accuracy':>8} {'±':>6}")
+    for name in args.estimators:
+        for row in measure(name, X, y, folds, X_batch, args.runs):
+            print(f"{row['model']:<28} {row['fit_s']:>6.2f} {row['row_ms']:>9.3f} {row['batch_ms']:>12.2f} "
+                  f"{row['batch_ms'] * 1000 / args.batch:>7.1f} {row['kib']:>8.1f} "
+                  f"{row['accuracy']:>8.4f} {row['accuracy_std']:>6.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark the PDF report backends.
+
+Renders the same report with every backend in report_renderers and prints
+render time, peak Python memory and output size, so REPORT_RENDERER can be
+set to the fastest backend for a given workload. With --compact, each
+backend is also rendered in compact mode and compared to its default output.
+
+Usage:
+    python benchmark_renderers.py [--runs 20] [--no-charts] [--compact]
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from crop_data import crop_info, recommend_fertilizer
+from report_renderers import RENDERERS
+
+
+def sample_report():
+    """Build a representative report payload."""
+    field_conditions = {
+        'soil_type': 'Loamy',
+        'n_value': 50,
+        'p_value': 50,
+        'k_value': 50,
+        'temperature': 25.0,
+        'humidity': 65.0,
+        'ph_value': 6.5,
+        'rainfall': 100.0
+    }
+    top_crops = ['rice', 'jute', 'maize']
+    return {
+        'field_conditions': field_conditions,
+        'top_crops': top_crops,
+        'top_probs': [54.0, 27.0, 9.0],
+        'fertilizer_recs': recommend_fertilizer(50, 50, 50, top_crops[0]),
+        'soil_analysis': {'n_value': 50, 'p_value': 50, 'k_value': 50},
+        'optimal_levels': {'N': 120, 'P': 60, 'K': 50},
+        'crop_info': crop_info
+    }
+
+
+def benchmark_renderer(renderer, report, runs):
+    """
+    Time one backend.
+
+    Returns:
+        dict: cold and warm render times (ms), peak memory (KiB) and size (bytes)
+    """
+    # The first render includes imports and chart rasterization
+    start = time.perf_counter()
+    pdf_bytes = renderer.render(**report)
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        renderer.render(**report)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    renderer.render(**report)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'backend': renderer.name,
+        'cold_ms': cold_ms,
+        'median_ms': statistics.median(timings),
+        'p95_ms': sorted(timings)[int(0.95 * (len(timings) - 1))],
+        'peak_kib': peak / 1024,
+        'size_bytes': len(pdf_bytes),
+    }
+
+
+def run_benchmark(runs=20, include_charts=True, compact=False):
+    """Benchmark every registered backend and return the result rows."""
+    report = sample_report()
+    report['include_charts'] = include_charts
+    report['compact'] = compact
+    return [benchmark_renderer(renderer, report, runs) for renderer in RENDERERS.values()]
+
+
+def print_results(results):
+    print(f"{'backend':<10} {'cold ms':>9} {'median ms':>10} {'p95 ms':>8} {'peak KiB':>9} {'size B':>8}")
+    for row in results:
+        print(f"{row['backend']:<10} {row['cold_ms']:>9.1f} {row['median_ms']:>10.1f} "
+              f"{row['p95_ms']:>8.1f} {row['peak_kib']:>9.0f} {row['size_bytes']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=20, help="Timed renders per backend")
+    parser.add_argument("--no-charts", action="store_true", help="Render without embedded charts")
+    parser.add_argument("--compact", action="store_true", help="Compare compact output with the default")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.runs, include_charts=not args.no_charts)
+    print_results(results)
+
+    if args.compact:
+        compact_results = run_benchmark(args.runs, include_charts=not args.no_charts, compact=True)
+        print("\nCompact mode:")
+        print_results(compact_results)
+
+        print(f"\n{'backend':<10} {'size change':>12} {'time change':>12} {'base64 saved B':>15}")
+        for default, compact in zip(results, compact_results):
+            size_change = 100 * (compact['size_bytes'] / default['size_bytes'] - 1)
+            time_change = 100 * (compact['median_ms'] / default['median_ms'] - 1)
+            # Skipping the base64 copy saves a string 4/3 the size of the PDF
+            base64_bytes = 4 * ((compact['size_bytes'] + 2) // 3)
+            print(f"{default['backend']:<10} {size_change:>11.1f}% {time_change:>11.1f}% {base64_bytes:>15}")
+
+    fastest = min(results, key=lambda row: row['median_ms'])
+    print(f"\nFastest backend: {fastest['backend']} (set REPORT_RENDERER={fastest['backend']})")
+
+
+if __name__ == "__main__":
+    main()
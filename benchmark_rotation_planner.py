@@ -0,0 +1,110 @@
+"""
+Measure crop-rotation planning (see rotation_planner.py).
+
+Plans 2 to 6 seasons for a few fields, with the rotation crops and with all
+22 crops, and reports the time and the number of distinct soil states the
+dynamic program solves against the number of crop sequences a brute-force
+search would score. Short plans are checked against that brute force.
+
+Usage:
+    python benchmark_rotation_planner.py [--max-seasons 6] [--check-seasons 3]
+"""
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+import rotation_planner
+from rotation_planner import MAX_SEASONS, NUTRIENT_COLUMNS, crop_nutrient_balance, plan_rotation, rotation_crops
+
+FIELDS = {
+    'balanced': dict(n_value=50, p_value=50, k_value=50, temperature=25.0, humidity=65.0, ph_value=6.5,
+                     rainfall=100.0),
+    'wet, rich in N': dict(n_value=100, p_value=50, k_value=30, temperature=25.0, humidity=80.0, ph_value=6.5,
+                           rainfall=180.0),
+    'hot, poor in N': dict(n_value=20, p_value=50, k_value=50, temperature=30.0, humidity=65.0, ph_value=6.5,
+                           rainfall=100.0),
+}
+
+
+def _brute_force(field_conditions, n_seasons, crops):
+    """Best objective over every crop sequence, scoring each season on its own."""
+    from crop_recommendation_model import get_model, predict_crop
+    from model_inputs import field_row
+
+    model, label_encoder = get_model()
+    classes = [str(crop) for crop in label_encoder.classes_]
+    columns = [classes.index(crop) for crop in crops]
+    uptake, fixation = (np.array(values) for values in zip(*(crop_nutrient_balance(crop) for crop in crops)))
+    row = np.array(field_row(field_conditions), dtype=float)
+    baseline = row[NUTRIENT_COLUMNS]
+
+    best = -np.inf
+    for sequence in itertools.product(range(len(crops)), repeat=n_seasons):
+        soil, total, previous = baseline, 0.0, None
+        for crop in sequence:
+            x = row.copy()
+            x[NUTRIENT_COLUMNS] = soil
+            _, probabilities = predict_crop(model, label_encoder, x[None, :], monitor=False)
+            score = probabilities[0, columns[crop]] * 100
+            if score < rotation_planner.MIN_PROBABILITY:
+                score -= rotation_planner._UNSUITABLE_PENALTY
+            if crop == previous:
+                score -= rotation_planner.REPEAT_PENALTY
+            total += score
+            soil = rotation_planner._next_soil(soil[None, :], uptake, fixation, baseline)[0, crop]
+            previous = crop
+        best = max(best, total)
+    return best
+
+
+def _objective(plan):
+    total, previous = 0.0, None
+    for season in plan['seasons']:
+        total += season['probability']
+        if season['probability'] < rotation_planner.MIN_PROBABILITY:
+            total -= rotation_planner._UNSUITABLE_PENALTY
+        if season['crop'] == previous:
+            total -= rotation_planner.REPEAT_PENALTY
+        previous = season['crop']
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--max-seasons", type=int, default=MAX_SEASONS)
+    parser.add_argument("--check-seasons", type=int, default=3, help="Longest plan checked by brute force")
+    args = parser.parse_args()
+
+    from crop_recommendation_model import get_model
+
+    _, label_encoder = get_model()
+    crop_sets = {'rotation crops': rotation_crops(), 'all crops': tuple(str(c) for c in label_encoder.classes_)}
+    # Warm up the model and the per-crop nutrient tables
+    plan_rotation(FIELDS['balanced'], 2)
+
+    print(f"{'field':<16} {'crops':<16} {'seasons':>7} {'ms':>7} {'states':>7} {'sequences':>12} "
+          f"{'plan':>6} {'repeat':>7}")
+    for name, field in FIELDS.items():
+        for label, crops in crop_sets.items():
+            for n_seasons in range(2, args.max_seasons + 1):
+                rotation_planner._plan.cache_clear()
+                start = time.perf_counter()
+                plan = plan_rotation(field, n_seasons, crops=crops)
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"{name:<16} {label:<16} {n_seasons:>7} {elapsed:>7.0f} {plan['states']:>7,} "
+                      f"{len(crops) ** n_seasons:>12,} {plan['average']:>5.1f}% {plan['repeat_average']:>6.1f}%")
+
+    print()
+    crops = rotation_crops()
+    for name, field in FIELDS.items():
+        for n_seasons in range(2, args.check_seasons + 1):
+            expected = _brute_force(field, n_seasons, crops)
+            found = _objective(plan_rotation(field, n_seasons))
+            assert abs(found - expected) < 1e-6, (name, n_seasons, found, expected)
+    print(f"Plans of up to {args.check_seasons} seasons match a brute-force search over every sequence")
+
+
+if __name__ == "__main__":
+    main()
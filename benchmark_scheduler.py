@@ -0,0 +1,140 @@
+"""
+Prediction latency under concurrent load, with and without the compute scheduler.
+
+Runs several simulated sessions, each making predictions back to back and
+generating a PDF report every few predictions, while the forest is
+retrained in the background. Modes:
+
+    unlimited  every task starts as soon as it arrives and training uses
+               every core (the old behaviour)
+    scheduled  tasks share the COMPUTE_THREADS budget (default: CPU count)
+
+Reports per-kind latency percentiles, scheduler waits and rejections.
+
+Usage:
+    python benchmark_scheduler.py [--sessions 1 4 16] [--seconds 10] [--modes unlimited scheduled]
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+import warnings
+
+import numpy as np
+
+import compute_scheduler
+from compute_scheduler import ComputeScheduler, SchedulerBusy
+
+MODES = ('unlimited', 'scheduled')
+
+# Each session renders a report after this many predictions
+PREDICTIONS_PER_REPORT = 20
+
+
+def _scheduler_for(mode):
+    if mode == 'scheduled':
+        return ComputeScheduler()
+    # A budget nothing can exhaust, with training asking for every core like n_jobs=-1
+    unlimited = {kind: {**spec, 'max_queue': 10 ** 6, 'timeout': None}
+                 for kind, spec in compute_scheduler.TASK_KINDS.items()}
+    unlimited['training']['threads'] = os.cpu_count() or 1
+    return ComputeScheduler(budget=10 ** 6, kinds=unlimited)
+
+
+def _percentiles(values):
+    if not values:
+        return 0.0, 0.0
+    ordered = sorted(values)
+    return statistics.median(ordered), ordered[int(0.95 * (len(ordered) - 1))]
+
+
+def run_load(mode, sessions, seconds):
+    """
+    Run the simulated load in one mode.
+
+    Returns:
+        dict: kind -> latencies in ms, plus the scheduler's stats()
+    """
+    from crop_data import crop_info
+    from crop_recommendation_model import get_model, predict_crop, train_model
+    from report_renderers import render_report
+
+    scheduler = _scheduler_for(mode)
+    compute_scheduler._scheduler = scheduler
+    model, labels = get_model()
+    latencies = {'inference': [], 'render': [], 'training': []}
+    rejected = {'inference': 0, 'render': 0}
+    stop = time.monotonic() + seconds
+    lock = threading.Lock()
+
+    def record(kind, started):
+        with lock:
+            latencies[kind].append((time.perf_counter() - started) * 1000)
+
+    def session(seed):
+        rng = np.random.default_rng(seed)
+        count = 0
+        while time.monotonic() < stop:
+            row = rng.uniform(0, 100, size=(1, 7))
+            started = time.perf_counter()
+            try:
+                _, probabilities = predict_crop(model, labels, row, lite=False)
+                record('inference', started)
+            except SchedulerBusy:
+                rejected['inference'] += 1
+                continue
+            count += 1
+            if count % PREDICTIONS_PER_REPORT == 0:
+                top = np.argsort(probabilities[0])[-3:][::-1]
+                crops = [labels.classes_[i] for i in top]
+                started = time.perf_counter()
+                try:
+                    render_report({'soil_type': 'Loamy', 'n_value': 50, 'p_value': 50, 'k_value': 50,
+                                   'temperature': 25.0, 'humidity': 65.0, 'ph_value': 6.5,
+                                   'rainfall': 100.0},
+                                  crops, [float(probabilities[0][i]) for i in top], {},
+                                  {'n_value': 50, 'p_value': 50, 'k_value': 50},
+                                  {'N': 80, 'P': 40, 'K': 40}, crop_info)
+                    record('render', started)
+                except SchedulerBusy:
+                    rejected['render'] += 1
+
+    def trainer():
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            train_model()
+            record('training', started)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    threads.append(threading.Thread(target=trainer))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    compute_scheduler._scheduler = None
+    return {'latencies': latencies, 'rejected': rejected, 'stats': scheduler.stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each run")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", category=UserWarning)
+    print(f"Thread budget in scheduled mode: {compute_scheduler.default_budget()}\n")
+    print(f"{'mode':<10} {'sessions':>8} {'kind':<10} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'wait p95':>9} {'rejected':>8}")
+    for mode in args.modes:
+        for sessions in args.sessions:
+            run = run_load(mode, sessions, args.seconds)
+            for kind, values in run['latencies'].items():
+                p50, p95 = _percentiles(values)
+                print(f"{mode:<10} {sessions:>8} {kind:<10} {len(values):>6} {p50:>8.1f} {p95:>8.1f} "
+                      f"{run['stats'][kind]['wait_p95_ms']:>9.1f} {run['rejected'].get(kind, 0):>8}")
+
+
+if __name__ == "__main__":
+    main()
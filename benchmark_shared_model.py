@@ -0,0 +1,106 @@
+"""
+Memory of several worker processes serving predictions.
+
+Starts N worker processes per mode, lets each one load a model and run
+predictions, then reads their memory from /proc while all of them are
+alive. Modes:
+
+    train    each worker trains its own scikit-learn forest (the old app)
+    private  each worker loads its own copy of the compact model
+    shared   each worker memory-maps the published model (get_model())
+
+RSS counts shared pages once per process; PSS splits them between the
+processes sharing them, so the PSS total is the memory actually used.
+Linux only (reads /proc/self/smaps_rollup).
+
+Usage:
+    python benchmark_shared_model.py [--workers 1 2 4 8] [--modes train private shared]
+"""
+import argparse
+import multiprocessing
+
+MODES = ('train', 'private', 'shared')
+
+# Predictions each worker runs before measuring
+PREDICTIONS = 200
+
+
+def _memory_kib():
+    """Return RSS, PSS and USS (private) of this process in KiB."""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+
+def _worker(mode, barrier, results):
+    import warnings
+    import numpy as np
+    from crop_recommendation_model import SHARED_MODEL_DIR, get_model, predict_crop, train_model
+
+    warnings.filterwarnings("ignore", category=UserWarning)
+    if mode == 'train':
+        model, labels = train_model()
+    elif mode == 'private':
+        from shared_model import attach
+        model, labels, _ = attach(SHARED_MODEL_DIR, mmap=False)
+    else:
+        model, labels = get_model()
+
+    rng = np.random.default_rng(0)
+    for _ in range(PREDICTIONS):
+        predict_crop(model, labels, rng.uniform(0, 100, size=(1, 7)), lite=False)
+
+    # Measure while every worker is alive, so shared pages are split between them
+    barrier.wait()
+    results.put(_memory_kib())
+    barrier.wait()
+
+
+def measure(mode, workers):
+    """
+    Run workers in one mode.
+
+    Returns:
+        dict: Total RSS, PSS and USS of the workers in MiB
+    """
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=_worker, args=(mode, barrier, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return {key: sum(sample[key] for sample in samples) / 1024 for key in ('rss', 'pss', 'uss')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    args = parser.parse_args()
+
+    # Publish the model up front so the workers only attach to it
+    from crop_recommendation_model import get_model
+    get_model()
+
+    print(f"{'mode':<8} {'workers':>7} {'RSS MiB':>8} {'PSS MiB':>8} {'USS MiB':>8} {'PSS/worker':>10}")
+    for mode in args.modes:
+        for workers in args.workers:
+            totals = measure(mode, workers)
+            print(f"{mode:<8} {workers:>7} {totals['rss']:>8.1f} {totals['pss']:>8.1f} "
+                  f"{totals['uss']:>8.1f} {totals['pss'] / workers:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
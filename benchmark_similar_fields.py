@@ -0,0 +1,122 @@
+"""
+Measure "fields like yours" lookups over a large history (see similar_fields.py).
+
+Fills a temporary history database with synthetic submissions, builds the
+nearest-neighbour index from it and reports load and build time, then the
+latency of single-field queries as new submissions arrive: against the
+main KD-tree alone, with a full delta of unindexed rows, with a recent
+tree as well, and end to end including fetching the neighbours' rows from
+SQLite. Neighbours are checked against a brute-force search.
+
+Usage:
+    python benchmark_similar_fields.py [--rows 1000000] [--queries 1000] [--k 10]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from crop_data import crop_info
+from field_history import connect, write_batch
+from model_inputs import FEATURE_RANGES
+from similar_fields import DELTA_LIMIT, FieldIndex, normalize, similar_fields
+import similar_fields as similar_fields_module
+
+CROPS = sorted(crop_info)
+CHUNK = 50000
+
+
+def fill_history(path, n_rows, first_id=0, seed=0):
+    """Write n_rows random submissions (inputs uniform over the slider ranges)."""
+    rng = np.random.default_rng(seed)
+    connection = connect(path)
+    now = time.time()
+    for start in range(0, n_rows, CHUNK):
+        size = min(CHUNK, n_rows - start)
+        inputs = rng.uniform(FEATURE_RANGES[:, 0], FEATURE_RANGES[:, 1], (size, len(FEATURE_RANGES))).round(2)
+        crops = rng.choice(CROPS, size)
+        batch = [
+            ((now, f"field-{(first_id + start + i) % 5000}", "Loamy", *row, "v1", crop, 0.8, '["Urea"]'),
+             ((crop, 0.8),))
+            for i, (row, crop) in enumerate(zip(inputs.tolist(), crops.tolist()))
+        ]
+        write_batch(connection, batch)
+    connection.close()
+
+
+def _latency(func, queries):
+    timings = []
+    for x in queries:
+        start = time.perf_counter()
+        func(x)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    queries = rng.uniform(FEATURE_RANGES[:, 0], FEATURE_RANGES[:, 1], (args.queries, len(FEATURE_RANGES)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history.db")
+        start = time.perf_counter()
+        fill_history(path, args.rows)
+        print(f"Wrote {args.rows:,} submissions in {time.perf_counter() - start:.1f} s")
+
+        index = FieldIndex(path)
+        start = time.perf_counter()
+        index.refresh()
+        total = time.perf_counter() - start
+        print(f"Initial index: {total:.1f} s ({total - index.build_seconds:.1f} s loading, "
+              f"{index.build_seconds:.1f} s building the tree)")
+
+        # Brute-force check on a few queries
+        main = index._snapshot[0]
+        tree_vectors, tree_ids = np.asarray(main[0].data), main[1]
+        for x in queries[:20]:
+            exact = np.argsort(np.sqrt(((tree_vectors - normalize(x)) ** 2).sum(axis=1)))[:args.k]
+            assert set(tree_ids[exact].tolist()) == set(index.query(x, args.k)[0].tolist())
+        print("Neighbours match a brute-force search")
+
+        print()
+        print(f"{'query':<36} {'p50 ms':>7} {'p99 ms':>7}")
+        p50, p99 = _latency(lambda x: index.query(x, args.k), queries)
+        print(f"{'main KD-tree':<36} {p50:>7.3f} {p99:>7.3f}")
+
+        # New submissions arrive: first into the delta, then a recent tree
+        fill_history(path, DELTA_LIMIT, first_id=args.rows, seed=2)
+        index.refresh()
+        p50, p99 = _latency(lambda x: index.query(x, args.k), queries)
+        print(f"{f'+ {len(index._snapshot[3]):,} delta':<36} {p50:>7.3f} {p99:>7.3f}")
+
+        fill_history(path, args.rows // 20, first_id=args.rows + DELTA_LIMIT, seed=3)
+        index.refresh()
+        recent_seconds = index.build_seconds
+        fill_history(path, DELTA_LIMIT, first_id=args.rows * 2, seed=4)
+        index.refresh()
+        _, recent, _, delta_ids, _ = index._snapshot
+        p50, p99 = _latency(lambda x: index.query(x, args.k), queries)
+        label = f"+ {len(recent[1]):,} recent + {len(delta_ids):,} delta"
+        print(f"{label:<36} {p50:>7.3f} {p99:>7.3f}")
+
+        # Route similar_fields() to this index and database
+        similar_fields_module._index = index
+        os.environ["HISTORY_DB"] = path
+        fields = [dict(zip(('n_value', 'p_value', 'k_value', 'temperature', 'humidity', 'ph_value', 'rainfall'), x))
+                  for x in queries]
+        p50, p99 = _latency(lambda fc: similar_fields(fc, args.k), fields)
+        print(f"{'similar_fields (with row fetch)':<36} {p50:>7.3f} {p99:>7.3f}")
+
+        print(f"\nRecent tree build: {recent_seconds:.2f} s; {index.builds} builds for {index.size:,} rows")
+
+
+if __name__ == "__main__":
+    main()
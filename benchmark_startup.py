@@ -0,0 +1,142 @@
+"""
+Cold-start budget check and import-time profile.
+
+Each entry point is imported in a fresh interpreter several times. The
+median wall time is compared against its budget, and the script also checks
+that the heavy libraries an entry point must not pull in (charting, PDF,
+scikit-learn) were not loaded. It exits non-zero if any budget is exceeded,
+so it can gate CI or container builds.
+
+An entry point may name baseline modules it cannot avoid (the app needs
+streamlit and pandas). Those are imported first in the same interpreter and
+only the time on top of them counts against the budget, so the check
+follows the app's own startup cost rather than noise in the big libraries.
+
+With --profile MODULE it instead prints the per-package cumulative import
+cost reported by `python -X importtime`.
+
+Usage:
+    python benchmark_startup.py [--runs 5]
+    python benchmark_startup.py --profile app [--top 20]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# entry point -> (cold import budget in ms, modules that must stay unloaded,
+#                 baseline modules imported first and not counted)
+BUDGETS = {
+    'crop_data': (200, ['pandas', 'sklearn'], []),
+    'crop_recommendation_model': (200, ['pandas', 'sklearn'], []),
+    'report_renderers': (100, ['reportlab', 'fpdf', 'matplotlib'], []),
+    'settings': (100, ['streamlit'], []),
+    'bulk_mailer': (150, ['streamlit', 'reportlab', 'matplotlib', 'pandas', 'sklearn'], []),
+    # Bare import of the Streamlit script: renders the Home page without a
+    # submit. streamlit and pandas alone take ~1 s and vary by several
+    # hundred ms between runs, so only the app's own cost is budgeted.
+    'app': (600, ['sklearn', 'plotly.express', 'matplotlib', 'reportlab', 'fpdf'], ['streamlit', 'pandas']),
+}
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+_PROBE = """
+import sys, time, logging
+logging.disable(logging.WARNING)
+{baseline}
+start = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - start) * 1000
+loaded = [name for name in {forbidden!r} if name in sys.modules]
+print(elapsed, ",".join(loaded))
+"""
+
+
+def measure(module, forbidden, runs, baseline=()):
+    """
+    Import a module in fresh interpreters, after its baseline modules.
+
+    Returns:
+        tuple: (median import time in ms, forbidden modules that were loaded)
+    """
+    probe = _PROBE.format(module=module, forbidden=forbidden,
+                          baseline="".join(f"import {name}\n" for name in baseline))
+    timings, loaded = [], set()
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", probe],
+            cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        elapsed, names = out.split(" ", 1) if " " in out else (out, "")
+        timings.append(float(elapsed))
+        loaded.update(filter(None, names.split(",")))
+    return statistics.median(timings), sorted(loaded)
+
+
+def import_profile(module):
+    """
+    Cumulative import cost per top-level package, from `python -X importtime`.
+
+    A package's cost is the cumulative time of each import that enters it
+    from a different package, so its own internal imports aren't counted twice.
+
+    Returns:
+        list: (package, cumulative ms) sorted by cost, most expensive first
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-W", "ignore", "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE, capture_output=True, text=True
+    ).stderr
+
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name_field = line.split("|")
+        name = name_field[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((depth, name.strip().split(".")[0], int(cumulative_us) / 1000))
+
+    # importtime prints children before parents; walk it backwards as a tree
+    totals, stack = {}, []
+    for depth, package, cumulative_ms in reversed(entries):
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        if not stack or stack[-1][1] != package:
+            totals[package] = totals.get(package, 0) + cumulative_ms
+        stack.append((depth, package))
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per entry point")
+    parser.add_argument("--profile", metavar="MODULE", help="Print an import-time profile instead")
+    parser.add_argument("--top", type=int, default=20, help="Packages shown by --profile")
+    args = parser.parse_args()
+
+    if args.profile:
+        print(f"{'package':<30} {'cumulative ms':>14}")
+        for package, ms in import_profile(args.profile)[:args.top]:
+            print(f"{package:<30} {ms:>14.1f}")
+        return
+
+    failures = 0
+    print(f"{'entry point':<28} {'median ms':>10} {'budget ms':>10}  status")
+    for module, (budget_ms, forbidden, baseline) in BUDGETS.items():
+        median_ms, loaded = measure(module, forbidden, args.runs, baseline)
+        problems = []
+        if median_ms > budget_ms:
+            problems.append("over budget")
+        if loaded:
+            problems.append("loaded " + ", ".join(loaded))
+        failures += bool(problems)
+        name = f"{module} (over {', '.join(baseline)})" if baseline else module
+        print(f"{name:<28} {median_ms:>10.0f} {budget_ms:>10}  {'; '.join(problems) or 'ok'}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
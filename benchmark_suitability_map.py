@@ -0,0 +1,93 @@
+"""
+Measure suitability-map precomputation and lookups (see suitability_map.py).
+
+Builds a synthetic climate grid (see benchmark_climate_grid.py), scores it
+with one worker process and with a pool, and reports cells per second
+against scoring cells one at a time. Half of the tiles are then marked
+undone to check that a resumed build only rescores those and produces the
+same map. Finally, single-cell lookups are timed.
+
+Usage:
+    python benchmark_suitability_map.py [--cell-size 0.0333] [--workers 4] [--lookups 20000]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark_climate_grid import EAST, NORTH, SOUTH, WEST, synthetic_band
+from climate_grid import CLIMATE_GRID_ENV_VAR, TILE, ClimateGrid, write_grid
+from model_inputs import FEATURE_KEYS
+import suitability_map
+from suitability_map import DEFAULT_SOIL, SuitabilityMap, build_map
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cell-size", type=float, default=1 / 30, help="Degrees per cell")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    from crop_recommendation_model import get_model
+
+    model, _ = get_model()
+    cell_size = args.cell_size
+    rows, cols = round((NORTH - SOUTH) / cell_size), round((EAST - WEST) / cell_size)
+
+    with tempfile.TemporaryDirectory() as directory:
+        climate = os.path.join(directory, "climate")
+        bands = (synthetic_band(top, min(TILE, rows - top), cols, cell_size) for top in range(0, rows, TILE))
+        write_grid(climate, {'rows': rows, 'cols': cols, 'west': WEST, 'north': NORTH, 'cell_size': cell_size},
+                   bands)
+        os.environ[CLIMATE_GRID_ENV_VAR] = climate
+        output = os.path.join(directory, "suitability")
+        print(f"Grid: {rows:,} x {cols:,} = {rows * cols:,} cells")
+
+        # Reference: cells scored one predict_proba call at a time
+        grid = ClimateGrid(climate)
+        sample = grid.window(rows // 2, cols // 2, 20, 50).reshape(-1, 3)
+        sample = sample[~np.isnan(sample).any(axis=1)]
+        X = np.empty((len(sample), len(FEATURE_KEYS)))
+        X[:, suitability_map._SOIL_COLUMNS] = DEFAULT_SOIL
+        X[:, suitability_map._CLIMATE_COLUMNS] = sample
+        start = time.perf_counter()
+        for x in X:
+            model.predict_proba(x.reshape(1, -1))
+        one_at_a_time = len(X) / (time.perf_counter() - start)
+
+        print()
+        print(f"{'build':<28} {'seconds':>8} {'cells/s':>10}")
+        print(f"{'one cell per call':<28} {'':>8} {one_at_a_time:>10,.0f}")
+        for workers in sorted({1, args.workers}):
+            run = build_map(output, workers=workers, restart=True, progress=lambda line: None)
+            print(f"{f'tiles, {workers} worker(s)':<28} {run['seconds']:>8.1f} {run['cells_per_second']:>10,.0f}")
+
+        # Resume: forget half of the tiles and build again
+        reference = SuitabilityMap(output)
+        expected = (reference.crop.copy(), reference.probability.copy())
+        done = np.load(os.path.join(output, "done.npy"), mmap_mode='r+')
+        done.ravel()[::2] = 0
+        undone = int((done == 0).sum())
+        done.flush()
+        del done
+        run = build_map(output, workers=args.workers, progress=lambda line: None)
+        resumed = SuitabilityMap(output)
+        assert run['scored'] == undone and run['resumed'] == run['tiles'] - undone
+        assert np.array_equal(resumed.crop, expected[0]) and np.array_equal(resumed.probability, expected[1])
+        print(f"\nResumed build rescored {run['scored']} of {run['tiles']} tiles; the map is unchanged")
+
+        rng = np.random.default_rng(0)
+        points = np.column_stack([rng.uniform(SOUTH, NORTH, args.lookups), rng.uniform(WEST, EAST, args.lookups)])
+        timings = []
+        for lat, lon in points:
+            start = time.perf_counter()
+            resumed.lookup(lat, lon)
+            timings.append(time.perf_counter() - start)
+        print(f"Lookup: p50 {np.percentile(timings, 50) * 1e6:.1f} µs, p99 {np.percentile(timings, 99) * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
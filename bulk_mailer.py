@@ -0,0 +1,275 @@
+"""
+Bulk mailing of personalised reports over a few long-lived SMTP sessions.
+
+Each worker thread owns one authenticated SMTP connection and sends many
+messages through it, so a run of hundreds of reports pays for a handful
+of connect/STARTTLS/login handshakes instead of one per recipient. Sent
+messages are appended to a journal file, and rerunning with the same
+journal skips them, so an interrupted run can be resumed.
+
+Usage:
+    python bulk_mailer.py manifest.csv [--journal sent.jsonl] [--sessions 2]
+
+The manifest is a CSV with "recipient" and "pdf_path" columns and optional
+"subject" and "body" columns.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+from email_outbox import SMTPConnection, build_message, is_transient, smtp_config
+
+# Default concurrency: number of parallel SMTP sessions
+DEFAULT_SESSIONS = 2
+
+# Many providers cap messages per connection; reconnect before hitting it
+MAX_MESSAGES_PER_SESSION = 100
+
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 1.0
+
+DEFAULT_SUBJECT = "Your Crop & Fertilizer Recommendation Report"
+DEFAULT_BODY = """
+Hello,
+
+Attached is your personalized Crop & Fertilizer Recommendation report.
+
+Regards,
+Crop & Fertilizer Recommendation System
+"""
+
+
+def job_key(recipient, pdf_bytes):
+    """Stable identity of a (recipient, PDF) pair, used by the resume journal."""
+    return f"{recipient.lower()}:{hashlib.sha1(pdf_bytes).hexdigest()}"
+
+
+def load_journal(journal_path):
+    """Return the set of job keys already delivered according to the journal."""
+    sent = set()
+    if not journal_path or not os.path.exists(journal_path):
+        return sent
+    with open(journal_path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # A torn last line from an interrupted run
+            if entry.get('status') == 'sent':
+                sent.add(entry['key'])
+    return sent
+
+
+def _torn(journal_path):
+    """Whether a journal ends mid-line (a run was killed while writing)."""
+    with open(journal_path, 'rb') as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            return False
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+class _Journal:
+    """Append-only, thread-safe JSON-lines log of delivered messages."""
+
+    def __init__(self, journal_path):
+        self._file = open(journal_path, 'a') if journal_path else None
+        self._lock = threading.Lock()
+        if self._file is not None and _torn(journal_path):
+            # Terminate the torn line, or the first new entry would be glued
+            # onto it and lost on the next resume
+            self._file.write("\n")
+
+    def record(self, entry):
+        if self._file is None:
+            return
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def send_bulk(jobs, config=None, sessions=DEFAULT_SESSIONS, journal_path=None,
+              max_per_session=MAX_MESSAGES_PER_SESSION, max_attempts=MAX_ATTEMPTS,
+              backoff_base=BACKOFF_BASE, smtp_factory=None, starttls=True):
+    """
+    Send many (recipient, PDF) pairs through a few shared SMTP sessions.
+
+    Args:
+        jobs: Iterable of dicts with "recipient" and "pdf_bytes", and
+            optionally "subject", "body" and "filename"
+        config: SMTP settings dict (see email_outbox.smtp_config)
+        sessions: Number of concurrent SMTP sessions
+        journal_path: JSON-lines file used to skip already-sent jobs and
+            record new deliveries; None disables resuming
+        max_per_session: Reconnect after this many messages on one session
+        max_attempts: Attempts per message for transient failures
+        smtp_factory: Replacement for smtplib.SMTP (e.g. a local stand-in)
+        starttls: Upgrade the connection with STARTTLS
+
+    Returns:
+        dict: "results" (one entry per job, in input order) and "metrics"
+    """
+    config = config or smtp_config()
+    already_sent = load_journal(journal_path)
+    journal = _Journal(journal_path)
+
+    jobs = list(jobs)
+    results = [None] * len(jobs)
+    work = queue.Queue()
+    for index, job in enumerate(jobs):
+        try:
+            key = job_key(job['recipient'], job['pdf_bytes'])
+        except (KeyError, TypeError, AttributeError) as e:
+            # A malformed job fails on its own; the rest of the batch still goes out
+            recipient = job.get('recipient') if isinstance(job, dict) else None
+            results[index] = {'recipient': recipient, 'status': 'failed', 'attempts': 0,
+                              'error': f"Invalid job: {e!r}"}
+            journal.record({'key': None, 'recipient': recipient, 'status': 'failed',
+                            'error': results[index]['error'], 'time': time.time()})
+            continue
+        if key in already_sent:
+            results[index] = {'recipient': job['recipient'], 'status': 'skipped',
+                              'attempts': 0, 'error': None}
+        else:
+            work.put((index, key, job))
+
+    connections = []
+    bytes_sent = [0]
+    bytes_lock = threading.Lock()
+
+    def worker():
+        connection_kwargs = {'starttls': starttls}
+        if smtp_factory is not None:
+            connection_kwargs['smtp_factory'] = smtp_factory
+        connection = SMTPConnection(config['host'], config['port'], config['user'],
+                                    config['password'], **connection_kwargs)
+        connections.append(connection)
+        sent_on_session = 0
+        try:
+            while True:
+                try:
+                    index, key, job = work.get_nowait()
+                except queue.Empty:
+                    return
+
+                if sent_on_session >= max_per_session:
+                    connection.close()
+                    sent_on_session = 0
+
+                result = {'recipient': job['recipient'], 'status': 'failed',
+                          'attempts': 0, 'error': None}
+                try:
+                    msg = build_message(
+                        sender=config['user'],
+                        recipient=job['recipient'],
+                        subject=job.get('subject', DEFAULT_SUBJECT),
+                        body=job.get('body', DEFAULT_BODY),
+                        attachment=job['pdf_bytes'],
+                        attachment_name=job.get('filename', "crop_fertilizer_report.pdf")
+                    )
+                    message_text = msg.as_string()
+
+                    for attempt in range(1, max_attempts + 1):
+                        result['attempts'] = attempt
+                        try:
+                            connection.send(config['user'], [job['recipient']], message_text)
+                        except Exception as e:
+                            connection.close()
+                            sent_on_session = 0
+                            result['error'] = str(e)
+                            if not is_transient(e) or attempt == max_attempts:
+                                break
+                            time.sleep(backoff_base * 2 ** (attempt - 1))
+                        else:
+                            result.update(status='sent', error=None)
+                            sent_on_session += 1
+                            with bytes_lock:
+                                bytes_sent[0] += len(message_text)
+                            break
+                except Exception as e:
+                    # A job that cannot even be built (bad subject, unencodable
+                    # body) fails on its own instead of killing this session
+                    result.update(status='failed', error=str(e))
+
+                results[index] = result
+                journal.record({'key': key, 'recipient': job['recipient'],
+                                'status': result['status'], 'error': result['error'],
+                                'time': time.time()})
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, name=f"bulk-mailer-{i}")
+               for i in range(max(1, min(sessions, work.qsize())))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    journal.close()
+
+    sent = sum(1 for r in results if r['status'] == 'sent')
+    metrics = {
+        'total': len(jobs),
+        'sent': sent,
+        'failed': sum(1 for r in results if r['status'] == 'failed'),
+        'skipped': sum(1 for r in results if r['status'] == 'skipped'),
+        'sessions': len(threads),
+        'connections_opened': sum(c.connects for c in connections),
+        'elapsed_s': elapsed,
+        'messages_per_s': sent / elapsed if elapsed > 0 else 0.0,
+        'megabytes_per_s': bytes_sent[0] / 1e6 / elapsed if elapsed > 0 else 0.0,
+    }
+    return {'results': results, 'metrics': metrics}
+
+
+def load_manifest(manifest_path):
+    """Read a CSV manifest into send_bulk() jobs."""
+    jobs = []
+    with open(manifest_path, newline='') as f:
+        for row in csv.DictReader(f):
+            with open(row['pdf_path'], 'rb') as pdf:
+                job = {'recipient': row['recipient'], 'pdf_bytes': pdf.read(),
+                       'filename': os.path.basename(row['pdf_path'])}
+            if row.get('subject'):
+                job['subject'] = row['subject']
+            if row.get('body'):
+                job['body'] = row['body']
+            jobs.append(job)
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("manifest", help="CSV with recipient,pdf_path[,subject,body] columns")
+    parser.add_argument("--journal", default="bulk_mail_journal.jsonl",
+                        help="Resume journal (default: %(default)s)")
+    parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS,
+                        help="Concurrent SMTP sessions (default: %(default)s)")
+    parser.add_argument("--no-starttls", action="store_true",
+                        help="Plain SMTP, e.g. for a local test server")
+    args = parser.parse_args()
+
+    outcome = send_bulk(load_manifest(args.manifest), sessions=args.sessions,
+                        journal_path=args.journal, starttls=not args.no_starttls)
+
+    for result in outcome['results']:
+        if result['status'] == 'failed':
+            print(f"FAILED {result['recipient']}: {result['error']}")
+    m = outcome['metrics']
+    print(f"sent {m['sent']}/{m['total']} (skipped {m['skipped']}, failed {m['failed']}) "
+          f"in {m['elapsed_s']:.1f}s over {m['sessions']} sessions, "
+          f"{m['connections_opened']} connections, {m['messages_per_s']:.1f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
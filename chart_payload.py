@@ -0,0 +1,289 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+import streamlit as st
+
+from report_content import RADAR_CATEGORIES, radar_values
+
+# Environment variable selecting how result charts are sent to the browser:
+#   full   - plotly figures exactly as plotly express builds them
+#   lite   - the same figures without the embedded plotly template, which
+#            Streamlit's own chart theme replaces in the browser anyway
+#   static - small palette PNGs from report_charts; fetched once over HTTP
+#            and cached by the browser instead of resent on every rerun
+#   native - Streamlit's built-in bar charts, falling back to static images
+#            for charts it has no equivalent for (radar)
+CHART_MODE_ENV_VAR = "CHART_MODE"
+CHART_MODES = ('full', 'lite', 'static', 'native')
+DEFAULT_CHART_MODE = "lite"
+
+# Maximum number of built figures kept in memory per chart type
+FIGURE_CACHE_SIZE = 128
+
+NUTRIENT_LABELS = ["Nitrogen (N)", "Phosphorus (P)", "Potassium (K)"]
+
+
+def chart_mode():
+    """Return the configured chart mode, or the default if it is unset or unknown."""
+    mode = os.environ.get(CHART_MODE_ENV_VAR, DEFAULT_CHART_MODE).strip().lower()
+    return mode if mode in CHART_MODES else DEFAULT_CHART_MODE
+
+
+def _strip(fig, lite):
+    # An empty template stops plotly from inlining its default one (~3-6 KB
+    # per figure); with theme="streamlit" the browser styles the chart itself
+    if lite:
+        fig.layout.template = {}
+    return fig
+
+
+# The figure builders below are memoized by their (hashable) inputs. The
+# returned figures are shared between reruns and sessions: don't mutate them.
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def confidence_figure(top_crops, top_probs, lite=True):
+    import plotly.express as px
+
+    fig = px.bar(
+        x=list(top_crops),
+        y=list(top_probs),
+        labels={'x': 'Crop', 'y': 'Confidence (%)'},
+        title='Top Crop Recommendations',
+        color=list(top_probs),
+        color_continuous_scale='Viridis',
+    )
+    return _strip(fig, lite)
+
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def radar_figure(normalized_values, lite=True):
+    import plotly.express as px
+
+    fig = px.line_polar(
+        r=list(normalized_values),
+        theta=RADAR_CATEGORIES,
+        line_close=True,
+        title="Your Field Conditions",
+    )
+    fig.update_traces(fill='toself')
+    return _strip(fig, lite)
+
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def nutrient_figure(crop, current, optimal, lite=True):
+    import plotly.express as px
+
+    fig = px.bar(
+        {"Nutrient": NUTRIENT_LABELS, "Current Level": list(current), "Optimal Level": list(optimal)},
+        x="Nutrient",
+        y=["Current Level", "Optimal Level"],
+        barmode="group",
+        title=f"Soil Nutrient Levels for {crop}",
+        color_discrete_sequence=["#1E88E5", "#FFC107"]
+    )
+    return _strip(fig, lite)
+
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def deficiency_figure(labels, values, lite=True):
+    import plotly.express as px
+
+    fig = px.pie(
+        values=list(values),
+        names=list(labels),
+        title="Nutrient Deficiency Distribution",
+        color_discrete_sequence=px.colors.sequential.Viridis
+    )
+    return _strip(fig, lite)
+
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def sweep_line_figure(label, axis, crops, probs, current, lite=True):
+    import plotly.graph_objects as go
+
+    fig = go.Figure([go.Scatter(x=list(axis), y=list(values), mode='lines', name=crop)
+                     for crop, values in zip(crops, probs)])
+    fig.add_vline(x=current, line_dash='dash', annotation_text="Your field")
+    fig.update_layout(title=f"Top crops as {label} changes", xaxis_title=label,
+                      yaxis_title="Probability (%)")
+    return _strip(fig, lite)
+
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def sweep_heatmap_figure(labels, axes, crop, probs, current, lite=True):
+    import plotly.graph_objects as go
+
+    # probs is indexed (first input, second input); plotly wants rows = y
+    fig = go.Figure(go.Heatmap(x=list(axes[1]), y=list(axes[0]), z=[list(row) for row in probs],
+                               colorscale='Viridis', zmin=0, colorbar={'title': "%"}))
+    fig.add_trace(go.Scatter(x=[current[1]], y=[current[0]], mode='markers', name="Your field",
+                             marker={'symbol': 'x', 'size': 12, 'color': 'red'}))
+    fig.update_layout(title=f"Probability of {crop}", xaxis_title=labels[1], yaxis_title=labels[0])
+    return _strip(fig, lite)
+
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def attribution_figure(crop, labels, values, lite=True):
+    import plotly.graph_objects as go
+
+    # Largest effect on top; green raised the crop's confidence, red lowered it
+    fig = go.Figure(go.Bar(x=list(values)[::-1], y=list(labels)[::-1], orientation='h',
+                           marker_color=['#43A047' if v >= 0 else '#E53935' for v in values[::-1]]))
+    fig.update_layout(title=f"What drove {crop}", xaxis_title="Effect on confidence (percentage points)")
+    return _strip(fig, lite)
+
+
+def figure_cache_info():
+    """Return hit/miss statistics for each figure cache."""
+    return {
+        'confidence': confidence_figure.cache_info(),
+        'radar': radar_figure.cache_info(),
+        'nutrient': nutrient_figure.cache_info(),
+        'deficiency': deficiency_figure.cache_info(),
+        'sweep_line': sweep_line_figure.cache_info(),
+        'sweep_heatmap': sweep_heatmap_figure.cache_info(),
+        'attribution': attribution_figure.cache_info(),
+    }
+
+
+def _bar_chart(data, index, **kwargs):
+    import pandas as pd
+    st.bar_chart(pd.DataFrame(data, index=index), **kwargs)
+
+
+def show_confidence_chart(top_crops, top_probs, mode=None):
+    """
+    Display the crop confidence chart.
+
+    Args:
+        top_crops: List of recommended crops
+        top_probs: List of confidence scores (percent) for the crops
+        mode: One of CHART_MODES; defaults to chart_mode()
+    """
+    mode = mode or chart_mode()
+    probs = tuple(round(float(p), 1) for p in top_probs)
+    if mode == 'static':
+        from report_charts import confidence_chart_png
+        st.image(confidence_chart_png(top_crops, probs, compact=True))
+    elif mode == 'native':
+        st.caption("Top Crop Recommendations")
+        _bar_chart({'Confidence (%)': probs}, list(top_crops))
+    else:
+        st.plotly_chart(confidence_figure(tuple(top_crops), probs, lite=mode == 'lite'))
+
+
+def show_radar_chart(field_conditions, mode=None):
+    """
+    Display the normalized field condition radar chart.
+
+    Args:
+        field_conditions: Dictionary with field input values
+        mode: One of CHART_MODES; defaults to chart_mode()
+    """
+    mode = mode or chart_mode()
+    if mode in ('static', 'native'):
+        # Streamlit has no native polar chart
+        from report_charts import condition_radar_png
+        st.image(condition_radar_png(field_conditions, compact=True))
+        return
+
+    st.plotly_chart(radar_figure(radar_values(field_conditions), lite=mode == 'lite'))
+
+
+def show_nutrient_chart(crop, soil_analysis, optimal_levels, mode=None):
+    """
+    Display the current vs optimal N/P/K comparison chart.
+
+    Args:
+        crop: Crop the optimal levels refer to
+        soil_analysis: Dictionary with n_value, p_value and k_value
+        optimal_levels: Dictionary with optimal N, P and K levels
+        mode: One of CHART_MODES; defaults to chart_mode()
+    """
+    mode = mode or chart_mode()
+    current = tuple(soil_analysis[key] for key in ('n_value', 'p_value', 'k_value'))
+    optimal = tuple(optimal_levels[key] for key in ('N', 'P', 'K'))
+    if mode == 'static':
+        from report_charts import nutrient_chart_png
+        st.image(nutrient_chart_png(soil_analysis, optimal_levels, crop, compact=True))
+    elif mode == 'native':
+        st.caption(f"Soil Nutrient Levels for {crop}")
+        _bar_chart({"Current Level": current, "Optimal Level": optimal}, NUTRIENT_LABELS,
+                   stack=False, color=["#1E88E5", "#FFC107"])
+    else:
+        st.plotly_chart(nutrient_figure(crop, current, optimal, lite=mode == 'lite'))
+
+
+def show_deficiency_chart(labels, values, mode=None):
+    """
+    Display the share of each deficient nutrient.
+
+    Args:
+        labels: Names of the deficient nutrients
+        values: Deficiency percentage for each nutrient
+        mode: One of CHART_MODES; defaults to chart_mode()
+    """
+    mode = mode or chart_mode()
+    values = tuple(round(float(v), 1) for v in values)
+    if mode in ('static', 'native'):
+        # A bar of deficiency percentages carries the same information as the pie
+        st.caption("Nutrient Deficiency (%)")
+        _bar_chart({"Deficiency (%)": values}, list(labels))
+    else:
+        st.plotly_chart(deficiency_figure(tuple(labels), values, lite=mode == 'lite'))
+
+
+def _rounded(values):
+    """Nested tuples of probabilities rounded to 0.1%, as figure cache keys."""
+    return tuple(_rounded(v) if np.ndim(v) > 1 else tuple(np.round(v, 1).tolist()) for v in values)
+
+
+def show_sweep_chart(sweep, crop=None, mode=None):
+    """
+    Display a what-if sweep from sensitivity.sensitivity_sweep().
+
+    One swept input is drawn as a line per tracked crop; two inputs as a
+    heatmap of one crop's probability.
+
+    Args:
+        sweep: Result of sensitivity_sweep()
+        crop: Crop shown on a heatmap; defaults to the top crop
+        mode: One of CHART_MODES; defaults to chart_mode()
+    """
+    mode = mode or chart_mode()
+    axes = tuple(tuple(np.round(axis, 3).tolist()) for axis in sweep['axes'])
+    if len(sweep['features']) == 1:
+        if mode in ('static', 'native'):
+            import pandas as pd
+            st.caption(f"Top crops as {sweep['labels'][0]} changes (probability %)")
+            st.line_chart(pd.DataFrame(dict(zip(sweep['crops'], sweep['probs'])), index=axes[0]))
+        else:
+            st.plotly_chart(sweep_line_figure(sweep['labels'][0], axes[0], tuple(sweep['crops']),
+                                              _rounded(sweep['probs']), sweep['current'][0],
+                                              lite=mode == 'lite'))
+        return
+
+    # Streamlit has no native heatmap; the other modes send the lite figure
+    crop = crop if crop in sweep['crops'] else sweep['crops'][0]
+    probs = sweep['probs'][sweep['crops'].index(crop)]
+    st.plotly_chart(sweep_heatmap_figure(tuple(sweep['labels']), axes, crop, _rounded(probs),
+                                         tuple(sweep['current']), lite=mode != 'full'))
+
+
+def show_attribution_chart(explanation, mode=None):
+    """
+    Display how much each input moved a crop's confidence.
+
+    Args:
+        explanation: Result of explanations.explain_crop()
+        mode: One of CHART_MODES; defaults to chart_mode()
+    """
+    mode = mode or chart_mode()
+    labels = tuple(label for label, _ in explanation['contributions'])
+    values = tuple(round(value, 1) for _, value in explanation['contributions'])
+    if mode in ('static', 'native'):
+        st.caption(f"What drove {explanation['crop']} (percentage points)")
+        _bar_chart({"Effect": values}, list(labels), horizontal=True, sort=False)
+    else:
+        st.plotly_chart(attribution_figure(explanation['crop'], labels, values, lite=mode == 'lite'))
@@ -0,0 +1,447 @@
+"""
+Convert local gridded climate files into the memory-mapped grid used for location prefill.
+
+With a grid in place, the sidebar takes an optional location (latitude and
+longitude, or a district code) and prefills temperature, humidity and
+rainfall from it. The sources are ESRI ASCII grids (.asc), one per
+variable on the same geometry: mean temperature in °C, relative humidity
+in % and rainfall in mm, the units of the sliders. Most GIS tools export
+them, e.g. `gdal_translate -of AAIGrid`. An optional CSV (code, name, lat,
+lon) adds district codes.
+
+Conversion streams the sources in bands of TILE rows and writes:
+
+    index.npy   (tile rows, tile columns) position of each tile in tiles.npy,
+                -1 where a tile has no data (sea, areas outside the source)
+    tiles.npy   (tiles with data, TILE, TILE, 3) int16 values
+    grid.json   geometry, value scales and the district table
+
+A lookup computes the cell from the coordinates, reads one index entry
+and the six bytes of that cell: a page or two of the mapped files, however
+large the grid is. Everything is read from disk; nothing is downloaded.
+
+Usage:
+    python climate_grid.py convert --temperature t.asc --humidity h.asc --rainfall r.asc \\
+        [--districts districts.csv] [--output data/climate]
+    python climate_grid.py lookup "12.97, 77.59"
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+from model_inputs import SLIDER_RANGES
+
+# Environment variable with the grid directory. Without a grid there, the
+# location input is not shown.
+CLIMATE_GRID_ENV_VAR = "CLIMATE_GRID"
+DEFAULT_CLIMATE_GRID = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "climate")
+
+# Grid variables, in storage order (model input keys)
+VARIABLES = ('temperature', 'humidity', 'rainfall')
+
+# Values are stored as int16 multiples of these steps: 0.01 °C, 0.01 % and
+# 1 mm, finer than the sliders and half the size of float32
+SCALES = (0.01, 0.01, 1.0)
+NODATA = -32768
+
+# Cells per tile side. A 64 x 64 tile of three int16 values is 24 KiB; sea
+# and other empty tiles are not stored at all.
+TILE = 64
+
+# Tiles copied per chunk when finishing the tile file
+_COPY_CHUNK = 1024
+
+_COORDINATES = re.compile(r"^\s*([-+]?\d+(?:\.\d*)?)\s*[,;\s]\s*([-+]?\d+(?:\.\d*)?)\s*$")
+
+
+def read_ascii_grid(path):
+    """
+    Open an ESRI ASCII grid for streaming.
+
+    Returns:
+        tuple: (geometry dict with 'rows', 'cols', 'west', 'north' and
+            'cell_size'; iterator of float64 bands of TILE rows, the last
+            one shorter, with NaN for no data)
+
+    Raises:
+        ValueError: The header is incomplete
+    """
+    f = open(path)
+    header = {}
+    while True:
+        position = f.tell()
+        line = f.readline()
+        if not line or not line[:1].isalpha():
+            f.seek(position)
+            break
+        key, value = line.split()[:2]
+        header[key.lower()] = float(value)
+
+    try:
+        rows, cols, cell_size = int(header['nrows']), int(header['ncols']), header['cellsize']
+        if 'xllcorner' in header:
+            west, south = header['xllcorner'], header['yllcorner']
+        else:
+            west, south = header['xllcenter'] - cell_size / 2, header['yllcenter'] - cell_size / 2
+    except KeyError as e:
+        f.close()
+        raise ValueError(f"{path} is not an ESRI ASCII grid (no {e.args[0]} in the header)")
+    nodata = header.get('nodata_value')
+
+    def bands():
+        with f:
+            pending, buffered, left = [], 0, rows
+            for line in f:
+                values = np.array(line.split(), dtype=np.float64)
+                pending.append(values)
+                buffered += len(values)
+                # Rows may be split over lines; cut bands from the token stream
+                while left and buffered >= min(TILE, left) * cols:
+                    band_rows = min(TILE, left)
+                    flat = np.concatenate(pending)
+                    band = flat[:band_rows * cols].reshape(band_rows, cols)
+                    if nodata is not None:
+                        band[band == nodata] = np.nan
+                    yield band
+                    left -= band_rows
+                    pending = [flat[band_rows * cols:]]
+                    buffered = len(pending[0])
+            if left:
+                raise ValueError(f"{path} ends {left} rows short of its {rows} rows")
+
+    geometry = {'rows': rows, 'cols': cols, 'west': west, 'north': south + rows * cell_size,
+                'cell_size': cell_size}
+    return geometry, bands()
+
+
+def read_districts(path):
+    """
+    Read a district table: a CSV with code, name, lat and lon columns.
+
+    Returns:
+        dict: Upper-case code -> [name, lat, lon]
+    """
+    with open(path, newline="") as f:
+        return {row['code'].strip().upper(): [row['name'].strip(), float(row['lat']), float(row['lon'])]
+                for row in csv.DictReader(f)}
+
+
+def _encode(values):
+    """float values (NaN for no data) -> int16 in SCALES steps."""
+    scaled = np.rint(values / np.asarray(SCALES))
+    scaled = np.clip(scaled, NODATA + 1, np.iinfo(np.int16).max)
+    return np.where(np.isnan(values), NODATA, scaled).astype(np.int16)
+
+
+def write_grid(output, geometry, bands, districts=None, source=None):
+    """
+    Write a climate grid directory, replacing any grid already there.
+
+    Args:
+        output: Grid directory
+        geometry: dict with 'rows', 'cols', 'west', 'north', 'cell_size'
+            (degrees)
+        bands: Iterator of (TILE rows, cols, 3) float arrays, north to
+            south, in VARIABLES order with NaN for no data; the last band
+            may be shorter
+        districts: Optional dict of code -> [name, lat, lon]
+        source: Optional description stored in grid.json
+
+    Returns:
+        dict: 'cells', 'tiles' (in the grid) and 'stored' (with data)
+
+    Raises:
+        ValueError: No cell has data
+    """
+    rows, cols = geometry['rows'], geometry['cols']
+    tile_rows, tile_cols = -(-rows // TILE), -(-cols // TILE)
+    parent = os.path.dirname(os.path.abspath(output))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix=".climate-")
+    try:
+        index = np.full((tile_rows, tile_cols), -1, dtype=np.int32)
+        stored = 0
+        raw_path = os.path.join(staging, "tiles.raw")
+        # Tiles with data are appended as they come; the count is only
+        # known at the end, when they are copied into tiles.npy
+        with open(raw_path, "wb") as raw:
+            for band_number, band in enumerate(bands):
+                padded = np.full((TILE, tile_cols * TILE, len(VARIABLES)), np.nan)
+                padded[:len(band), :cols] = band
+                tiles = padded.reshape(TILE, tile_cols, TILE, len(VARIABLES)).swapaxes(0, 1)
+                has_data = ~np.isnan(tiles).all(axis=(1, 2, 3))
+                kept = np.flatnonzero(has_data)
+                index[band_number, kept] = stored + np.arange(len(kept))
+                raw.write(_encode(tiles[kept]).tobytes())
+                stored += len(kept)
+        if not stored:
+            raise ValueError("The climate grids have no data")
+
+        tiles = np.lib.format.open_memmap(os.path.join(staging, "tiles.npy"), mode="w+", dtype=np.int16,
+                                          shape=(stored, TILE, TILE, len(VARIABLES)))
+        source_tiles = np.memmap(raw_path, dtype=np.int16, mode="r", shape=tiles.shape)
+        for start in range(0, stored, _COPY_CHUNK):
+            tiles[start:start + _COPY_CHUNK] = source_tiles[start:start + _COPY_CHUNK]
+        tiles.flush()
+        del tiles, source_tiles
+        os.unlink(raw_path)
+        np.save(os.path.join(staging, "index.npy"), index)
+        with open(os.path.join(staging, "grid.json"), "w") as f:
+            json.dump({**geometry, 'tile': TILE, 'variables': VARIABLES, 'scales': SCALES, 'nodata': NODATA,
+                       'districts': districts or {}, 'source': source}, f)
+
+        # Swap directories; processes still mapping the old files keep
+        # reading them (POSIX) until they notice the new grid.json
+        previous = None
+        if os.path.exists(output):
+            previous = tempfile.mkdtemp(dir=parent, prefix=".climate-old-")
+            os.rename(output, os.path.join(previous, "grid"))
+        os.rename(staging, output)
+        if previous:
+            shutil.rmtree(previous, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return {'cells': rows * cols, 'tiles': tile_rows * tile_cols, 'stored': stored}
+
+
+def convert_ascii_grids(output, temperature, humidity, rainfall, districts=None):
+    """
+    Convert three ESRI ASCII grids (see the module docstring) into a climate grid.
+
+    Returns:
+        dict: See write_grid()
+
+    Raises:
+        ValueError: The grids don't share one geometry
+    """
+    opened = [read_ascii_grid(path) for path in (temperature, humidity, rainfall)]
+    geometry = opened[0][0]
+    for (other, _), path in zip(opened[1:], (humidity, rainfall)):
+        if any(not math.isclose(other[key], geometry[key], abs_tol=1e-9) for key in geometry):
+            raise ValueError(f"{path} does not have the same rows, columns and corner as {temperature}")
+    bands = (np.stack(band, axis=-1) for band in zip(*(stream for _, stream in opened)))
+    return write_grid(output, geometry, bands, districts=read_districts(districts) if districts else None,
+                      source=", ".join(os.path.basename(path) for path in (temperature, humidity, rainfall)))
+
+
+class ClimateGrid:
+    """Read-only view of a converted climate grid, memory-mapped."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "grid.json")) as f:
+            meta = json.load(f)
+        self.rows, self.cols = meta['rows'], meta['cols']
+        self.west, self.north, self.cell_size = meta['west'], meta['north'], meta['cell_size']
+        self.tile = meta['tile']
+        self.scales = meta['scales']
+        self.nodata = meta['nodata']
+        self.districts = meta['districts']
+        self.source = meta.get('source')
+        # Plain ndarray views of the mappings (see shared_model.attach)
+        self.index = np.load(os.path.join(directory, "index.npy"), mmap_mode='r').view(np.ndarray)
+        self.tiles = np.load(os.path.join(directory, "tiles.npy"), mmap_mode='r').view(np.ndarray)
+
+    def lookup(self, lat, lon):
+        """
+        Climate values of the cell containing a point.
+
+        Returns:
+            dict or None: VARIABLES -> value (None where the cell has no
+                data for it); None outside the grid or where no variable
+                has data
+        """
+        cell = self.cell(lat, lon)
+        if cell is None:
+            return None
+        row, col = cell
+        position = int(self.index[row // self.tile, col // self.tile])
+        if position < 0:
+            return None
+        cell = self.tiles[position, row % self.tile, col % self.tile].tolist()
+        if all(value == self.nodata for value in cell):
+            return None
+        return {name: None if value == self.nodata else round(value * scale, 2)
+                for name, value, scale in zip(VARIABLES, cell, self.scales)}
+
+    def window(self, row, col, n_rows, n_cols):
+        """
+        Values of a block of cells, e.g. for scoring the grid in tiles.
+
+        Returns:
+            ndarray: (n_rows, n_cols, 3) float64 in VARIABLES order, NaN
+                where there is no data or the block runs off the grid
+        """
+        block = np.full((n_rows, n_cols, len(VARIABLES)), np.nan)
+        first_tile_row, first_tile_col = max(row, 0) // self.tile, max(col, 0) // self.tile
+        last_tile_row = min(row + n_rows - 1, self.rows - 1) // self.tile
+        last_tile_col = min(col + n_cols - 1, self.cols - 1) // self.tile
+        for tile_row in range(first_tile_row, last_tile_row + 1):
+            for tile_col in range(first_tile_col, last_tile_col + 1):
+                position = int(self.index[tile_row, tile_col])
+                if position < 0:
+                    continue
+                # Overlap of this tile with the block, in grid cells
+                top, left = tile_row * self.tile, tile_col * self.tile
+                r0, r1 = max(row, top), min(row + n_rows, top + self.tile)
+                c0, c1 = max(col, left), min(col + n_cols, left + self.tile)
+                values = self.tiles[position, r0 - top:r1 - top, c0 - left:c1 - left].astype(np.float64)
+                values[values == self.nodata] = np.nan
+                block[r0 - row:r1 - row, c0 - col:c1 - col] = values * self.scales
+        return block
+
+    def cell(self, lat, lon):
+        """(row, col) of the cell containing a point, or None outside the grid."""
+        row = math.floor((self.north - lat) / self.cell_size)
+        col = math.floor((lon - self.west) / self.cell_size)
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return None
+        return row, col
+
+    def district(self, code):
+        """[name, lat, lon] of a district code, or None."""
+        return self.districts.get(code.strip().upper())
+
+
+def climate_grid_path():
+    return os.environ.get(CLIMATE_GRID_ENV_VAR, "").strip() or DEFAULT_CLIMATE_GRID
+
+
+_grid = None
+_grid_signature = None
+_grid_lock = threading.Lock()
+
+
+def get_climate_grid():
+    """
+    Return the configured climate grid, or None if there is none.
+
+    Costs one stat() per call once open; a grid converted again in place
+    is picked up on the next call.
+    """
+    global _grid, _grid_signature
+    directory = climate_grid_path()
+    try:
+        stat = os.stat(os.path.join(directory, "grid.json"))
+    except FileNotFoundError:
+        return None
+    signature = (directory, stat.st_ino, stat.st_mtime_ns)
+    if signature != _grid_signature:
+        with _grid_lock:
+            if signature != _grid_signature:
+                _grid = ClimateGrid(directory)
+                _grid_signature = signature
+    return _grid
+
+
+def parse_location(text, grid):
+    """
+    Resolve a location typed by the user.
+
+    Args:
+        text: "lat, lon" in decimal degrees, or a district code
+        grid: ClimateGrid whose district table resolves codes, or None
+
+    Returns:
+        tuple: (label as shown to the user, lat, lon)
+
+    Raises:
+        ValueError: Unknown district or invalid coordinates; the message
+            is meant for the user
+    """
+    match = _COORDINATES.match(text)
+    if match:
+        lat, lon = float(match.group(1)), float(match.group(2))
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f"{text.strip()} is not a valid latitude, longitude")
+        label = f"{lat:.3f}, {lon:.3f}"
+    else:
+        district = grid.district(text) if grid is not None else None
+        if district is None:
+            raise ValueError(f"Unknown location {text.strip()!r}: enter a latitude and longitude "
+                             f"(e.g. 12.97, 77.59) or a district code")
+        name, lat, lon = district
+        label = f"{name} ({text.strip().upper()})"
+    return label, lat, lon
+
+
+def climate_for_location(text):
+    """
+    Look up the climate of a location typed by the user.
+
+    Args:
+        text: "lat, lon" in decimal degrees, or a district code
+
+    Returns:
+        dict or None: None without a climate grid; otherwise 'label' (the
+            place as shown to the user), 'lat', 'lon' and the VARIABLES
+            values (None where the grid has no data for one)
+
+    Raises:
+        ValueError: Unknown district, invalid coordinates or no climate
+            data there; the message is meant for the user
+    """
+    grid = get_climate_grid()
+    if grid is None:
+        return None
+    label, lat, lon = parse_location(text, grid)
+    values = grid.lookup(lat, lon)
+    if values is None:
+        raise ValueError(f"No climate data for {label}")
+    return {'label': label, 'lat': lat, 'lon': lon, **values}
+
+
+def slider_values(climate):
+    """
+    Climate values limited to the sidebar slider ranges.
+
+    Returns:
+        dict: VARIABLES -> value rounded to 0.1, for the variables with data
+    """
+    values = {}
+    for name in VARIABLES:
+        if climate.get(name) is not None:
+            low, high = SLIDER_RANGES[name]
+            values[name] = round(min(max(float(climate[name]), float(low)), float(high)), 1)
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser("convert", help="Convert ESRI ASCII grids")
+    for name in VARIABLES:
+        convert.add_argument(f"--{name}", required=True, help=f"{name} grid (.asc)")
+    convert.add_argument("--districts", help="CSV with code, name, lat, lon columns")
+    convert.add_argument("--output", default=climate_grid_path(), help="Grid directory")
+    lookup = commands.add_parser("lookup", help="Look up a location in the configured grid")
+    lookup.add_argument("location", help='"lat, lon" or a district code')
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        stats = convert_ascii_grids(args.output, args.temperature, args.humidity, args.rainfall, args.districts)
+        size = sum(os.path.getsize(os.path.join(args.output, name)) for name in os.listdir(args.output))
+        print(f"Converted {stats['cells']:,} cells into {args.output}: {stats['stored']:,} of "
+              f"{stats['tiles']:,} tiles have data, {size / 2 ** 20:.1f} MiB")
+        return
+
+    try:
+        climate = climate_for_location(args.location)
+    except ValueError as e:
+        parser.error(str(e))
+    if climate is None:
+        parser.error(f"No climate grid in {climate_grid_path()} (set {CLIMATE_GRID_ENV_VAR})")
+    print(f"{climate['label']}: " + ", ".join(f"{name} {climate[name]}" for name in VARIABLES))
+
+
+if __name__ == "__main__":
+    main()
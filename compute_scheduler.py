@@ -0,0 +1,227 @@
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Environment variable overriding the process-wide thread budget
+THREADS_ENV_VAR = "COMPUTE_THREADS"
+
+# Kinds of work sharing the budget. Lower priority values are served first;
+# threads is what one task of the kind asks for (capped at the budget, and
+# used as n_jobs by the scikit-learn callers); max_queue bounds how many
+# tasks may wait before new ones are turned away.
+TASK_KINDS = {
+    'inference': {'priority': 0, 'threads': 1, 'max_queue': 64, 'timeout': 30.0},
+    'render': {'priority': 1, 'threads': 1, 'max_queue': 16, 'timeout': 60.0},
+    'training': {'priority': 2, 'threads': None, 'max_queue': 2, 'timeout': None},
+    'batch': {'priority': 3, 'threads': None, 'max_queue': 4, 'timeout': None},
+}
+
+# Seconds of waiting that raise a task by one priority level, so training
+# and batch jobs still run under a constant stream of predictions
+PRIORITY_AGING = 2.0
+
+# Recent waits and run times kept per kind for the percentiles in stats()
+STATS_WINDOW = 1000
+
+
+class SchedulerBusy(RuntimeError):
+    """Raised when a task is turned away because its queue is full or it waited too long."""
+
+
+def default_budget():
+    """Threads available to the process: COMPUTE_THREADS, or the CPU count."""
+    value = os.environ.get(THREADS_ENV_VAR, "").strip()
+    if value.isdigit() and int(value) > 0:
+        return int(value)
+    return os.cpu_count() or 1
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[int(fraction * (len(ordered) - 1))]
+
+
+class ComputeScheduler:
+    """
+    Shares a fixed number of CPU threads between all compute in the process.
+
+    Each task reserves threads through slot() before it runs and gives them
+    back afterwards, so concurrent sessions queue for CPU instead of each
+    starting a full set of threads. Waiting tasks are served by priority
+    (inference first, with PRIORITY_AGING lifting tasks that have waited
+    long), then in arrival order. A task at the head of the queue holds
+    back later ones until enough threads are free for it. When a kind's queue is full
+    or a task waits past its timeout, SchedulerBusy is raised, so callers
+    can tell users to retry instead of piling up more work.
+
+    A slot taken while the same thread already holds one runs inside the
+    outer reservation, so nested calls (e.g. training a model on first use
+    during inference) cannot deadlock.
+    """
+
+    def __init__(self, budget=None, kinds=None):
+        self.budget = budget or default_budget()
+        self.kinds = {**TASK_KINDS, **(kinds or {})}
+        self._available = self.budget
+        # ticket -> (priority, enqueued time)
+        self._waiting = {}
+        self._tickets = itertools.count()
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._stats = {
+            kind: {'running': 0, 'queued': 0, 'completed': 0, 'rejected': 0,
+                   'waits': deque(maxlen=STATS_WINDOW), 'runs': deque(maxlen=STATS_WINDOW)}
+            for kind in self.kinds
+        }
+
+    def _next_ticket(self):
+        """The waiting ticket to serve next: best aged priority, then oldest."""
+        now = time.monotonic()
+        return min(self._waiting, key=lambda ticket: (
+            self._waiting[ticket][0] - (now - self._waiting[ticket][1]) / PRIORITY_AGING, ticket))
+
+    def threads_for(self, kind, threads=None):
+        """Threads a task of this kind gets: the request, or the kind's default, capped at the budget."""
+        requested = threads or self.kinds[kind]['threads'] or self.budget
+        return max(1, min(requested, self.budget))
+
+    @contextmanager
+    def slot(self, kind, threads=None, timeout=None):
+        """
+        Reserve threads for one task.
+
+        Args:
+            kind: Key of TASK_KINDS
+            threads: Threads to reserve; defaults to the kind's setting
+            timeout: Seconds to wait before giving up; defaults to the kind's setting
+
+        Yields:
+            int: Number of threads reserved (use it as n_jobs)
+
+        Raises:
+            SchedulerBusy: The queue for this kind is full, or the wait timed out
+        """
+        held = getattr(self._local, 'threads', 0)
+        if held:
+            yield held
+            return
+
+        spec = self.kinds[kind]
+        threads = self.threads_for(kind, threads)
+        timeout = spec['timeout'] if timeout is None else timeout
+        stats = self._stats[kind]
+        enqueued = time.monotonic()
+
+        with self._cond:
+            if stats['queued'] >= spec['max_queue']:
+                stats['rejected'] += 1
+                raise SchedulerBusy(f"Too many {kind} tasks waiting ({stats['queued']})")
+            ticket = next(self._tickets)
+            self._waiting[ticket] = (spec['priority'], enqueued)
+            stats['queued'] += 1
+            try:
+                while self._next_ticket() != ticket or self._available < threads:
+                    remaining = None if timeout is None else enqueued + timeout - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        stats['rejected'] += 1
+                        raise SchedulerBusy(f"{kind} task waited more than {timeout:g}s")
+                    # Wake up periodically: aging can change the head of the queue
+                    self._cond.wait(PRIORITY_AGING if remaining is None else min(remaining, PRIORITY_AGING))
+            except BaseException:
+                del self._waiting[ticket]
+                stats['queued'] -= 1
+                self._cond.notify_all()
+                raise
+            del self._waiting[ticket]
+            stats['queued'] -= 1
+            stats['running'] += 1
+            self._available -= threads
+            stats['waits'].append(time.monotonic() - enqueued)
+            # The next waiter may fit in what is left
+            self._cond.notify_all()
+
+        started = time.monotonic()
+        self._local.threads = threads
+        try:
+            yield threads
+        finally:
+            self._local.threads = 0
+            with self._cond:
+                self._available += threads
+                stats['running'] -= 1
+                stats['completed'] += 1
+                stats['runs'].append(time.monotonic() - started)
+                self._cond.notify_all()
+
+    def stats(self):
+        """
+        Queue and latency statistics per task kind.
+
+        Returns:
+            dict: kind -> running, queued, completed, rejected, and wait/run
+                time percentiles in milliseconds over the last STATS_WINDOW tasks
+        """
+        with self._cond:
+            report = {}
+            for kind, stats in self._stats.items():
+                waits, runs = list(stats['waits']), list(stats['runs'])
+                report[kind] = {
+                    'running': stats['running'],
+                    'queued': stats['queued'],
+                    'completed': stats['completed'],
+                    'rejected': stats['rejected'],
+                    'wait_p50_ms': _percentile(waits, 0.5) * 1000,
+                    'wait_p95_ms': _percentile(waits, 0.95) * 1000,
+                    'run_p50_ms': _percentile(runs, 0.5) * 1000,
+                    'run_p95_ms': _percentile(runs, 0.95) * 1000,
+                }
+            report['threads'] = {'budget': self.budget, 'available': self._available}
+            return report
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide scheduler, created on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = ComputeScheduler()
+    return _scheduler
+
+
+def compute_slot(kind, threads=None, timeout=None):
+    """Shortcut for get_scheduler().slot(...)."""
+    return get_scheduler().slot(kind, threads, timeout)
+
+
+def scheduler_status_panel():
+    """Show the scheduler's queue depth and wait times."""
+    import streamlit as st
+
+    report = get_scheduler().stats()
+    threads = report.pop('threads')
+    st.subheader("Compute Scheduler")
+    st.write(f"Thread budget: {threads['budget']} ({threads['available']} free). "
+             f"Set {THREADS_ENV_VAR} to change it.")
+    st.table([
+        {
+            "Task": kind,
+            "Running": row['running'],
+            "Queued": row['queued'],
+            "Completed": row['completed'],
+            "Rejected": row['rejected'],
+            "Wait p50 (ms)": f"{row['wait_p50_ms']:.1f}",
+            "Wait p95 (ms)": f"{row['wait_p95_ms']:.1f}",
+            "Run p95 (ms)": f"{row['run_p95_ms']:.1f}",
+        }
+        for kind, row in report.items()
+    ])
@@ -1,4 +1,3 @@
-import pandas as pd
 import numpy as np
 
 def get_dataset():
@@ -104,7 +103,8 @@ def get_dataset():
             
             expanded_data.append([crop] + noisy_features.tolist())
     
-    # Create DataFrame
+    # Create DataFrame (pandas is imported here so crop_info lookups stay cheap)
+    import pandas as pd
     columns = ['label', 'N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
     df = pd.DataFrame(expanded_data, columns=columns)
     
@@ -345,6 +345,22 @@ fertilizer_info = {
     }
 }
 
+def optimal_levels_for(crop):
+    """
+    Optimal soil N/P/K levels (kg/ha) used for the nutrient charts and reports.
+    
+    Args:
+        crop: Crop name
+        
+    Returns:
+        dict: Optimal levels keyed by "N", "P" and "K"
+    """
+    if crop in ["rice", "maize", "wheat"]:
+        return {"N": 120, "P": 60, "K": 50}
+    elif crop in ["vegetables", "tomato", "potato", "cabbage"]:
+        return {"N": 100, "P": 80, "K": 80}
+    return {"N": 80, "P": 40, "K": 40}
+
 def recommend_fertilizer(n_value, p_value, k_value, crop=None):
     """
     Recommends appropriate fertilizers based on soil NPK values and optionally for a specific crop.
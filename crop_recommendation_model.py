@@ -1,17 +1,59 @@
-import pandas as pd
+import os
+import threading
+
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder
+
+from compact_forest import CompactForest, LabelDecoder
+from compute_scheduler import compute_slot
 from crop_data import get_dataset
+from drift_monitor import observe_inputs
+from shared_model import SharedModel, publish
+
+# Compact model used by the app. Depth 8 with the top 3 classes per leaf
+# matches the held-out accuracy of the unlimited forest at ~1/40 of its
+# size (see benchmark_model_size.py); shallower trees score the same on the
+# small test split but flatten the confidences shown to users.
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+COMPACT_MAX_DEPTH = 8
+COMPACT_TOP_K = 3
+
+# Lite mode for kiosk and low-end deployments: predict_crop() uses a small
+# student distilled from the compact forest (see lite_model.py and
+# benchmark_lite_model.py). Enabled per call or with LITE_MODEL=true.
+LITE_MODEL_ENV_VAR = "LITE_MODEL"
+LITE_MODEL_KIND = "tree"
+
+# Versioned store of the compact model, memory-mapped by every app process
+# on the host (see shared_model.py). Run `python shared_model.py publish`
+# after changing the dataset; running workers switch to the new version.
+SHARED_MODEL_DIR = os.environ.get("SHARED_MODEL_DIR", os.path.join(MODEL_DIR, "forest"))
+
+_model_cache = {}
+_model_lock = threading.Lock()
 
-def train_model():
+def train_model(max_depth=None, max_leaf_nodes=None, n_estimators=100, min_samples_leaf=1,
+                max_features='sqrt', estimator=None):
     """
     Trains a machine learning model for crop recommendation.
     
+    Args:
+        max_depth: Optional depth limit for each tree
+        max_leaf_nodes: Optional leaf count limit for each tree
+        n_estimators: Number of trees
+        min_samples_leaf: Minimum training rows per leaf
+        max_features: Features considered per split ("sqrt", "log2" or None for all);
+            see model_tuning.py for cross-validated choices
+        estimator: Optional estimator spec (see model_zoo.py) to train instead
+            of the random forest; the forest arguments above are then ignored
+    
     Returns:
         tuple: (trained model, label encoder)
     """
+    # scikit-learn takes over a second to import; only pay for it when training
+    from sklearn.preprocessing import LabelEncoder
+    from threadpoolctl import threadpool_limits
+    from model_zoo import build_estimator
+    
     # Get the dataset
     df = get_dataset()
     
@@ -26,19 +68,110 @@ def train_model():
     label_encoder = LabelEncoder()
     y_encoded = label_encoder.fit_transform(y)
     
-    # Train a Random Forest classifier
-    model = RandomForestClassifier(
-        n_estimators=100,
-        random_state=42,
-        n_jobs=-1
-    )
+    if estimator is None:
+        estimator = {
+            'name': 'random_forest',
+            'n_estimators': n_estimators,
+            'max_depth': max_depth,
+            'max_leaf_nodes': max_leaf_nodes,
+            'min_samples_leaf': min_samples_leaf,
+            'max_features': max_features
+        }
     
-    # Train on the entire dataset for deployment
-    model.fit(X, y_encoded)
+    # Train on the entire dataset for deployment, with the threads the
+    # compute scheduler grants rather than every core on the host. The
+    # limit also covers OpenMP and BLAS threads, which ignore n_jobs.
+    with compute_slot('training') as threads, threadpool_limits(threads):
+        model = build_estimator(estimator, n_jobs=threads)
+        model.fit(X, y_encoded)
     
     return model, label_encoder
 
-def predict_crop(model, label_encoder, input_data):
+def build_compact_model():
+    """
+    Train the forest and convert it to a CompactForest.
+    
+    Returns:
+        tuple: (CompactForest, LabelDecoder)
+    """
+    model, label_encoder = train_model(max_depth=COMPACT_MAX_DEPTH)
+    forest = CompactForest.from_sklearn(model, top_k=COMPACT_TOP_K)
+    return forest, LabelDecoder(label_encoder.classes_)
+
+_shared_model = SharedModel(SHARED_MODEL_DIR, build=build_compact_model)
+
+def _cached_model(path, load, build):
+    """Return the process-wide model stored at path, loading or building it once."""
+    cached = _model_cache.get(path)
+    if cached is not None:
+        return cached
+    with _model_lock:
+        if path not in _model_cache:
+            _model_cache[path] = load() if os.path.exists(path) else build()
+        return _model_cache[path]
+
+def get_model():
+    """
+    Return the live compact model from the shared store.
+    
+    The arrays are memory-mapped, so all processes on the host share one
+    copy. If nothing has been published yet, the first caller trains and
+    publishes it. A newly published version is picked up on the next call.
+    
+    Returns:
+        tuple: (CompactForest, LabelDecoder)
+    """
+    return _shared_model.get()
+
+def model_version():
+    """Version name of the model get_model() returned last (None before the first call)."""
+    return _shared_model.version
+
+def publish_model():
+    """
+    Retrain and publish a new model version for every process on the host.
+    
+    Returns:
+        str: The new version name
+    """
+    forest, labels = build_compact_model()
+    return publish(forest, labels.classes_, SHARED_MODEL_DIR)
+
+def lite_model_path(kind=LITE_MODEL_KIND, version=None):
+    return os.path.join(MODEL_DIR, f"crop_lite_{kind}_{version}.npz")
+
+def lite_mode_by_default():
+    """Whether LITE_MODEL asks for the lite model."""
+    return os.environ.get(LITE_MODEL_ENV_VAR, "").strip().lower() in ("1", "true", "yes")
+
+def get_lite_model(kind=LITE_MODEL_KIND):
+    """
+    Return the distilled lite model shared by all sessions of this process.
+    
+    It is loaded from its file, or distilled from the compact model and
+    saved on first use. Each model version gets its own student. It
+    predicts the same encoded labels, so the label encoder from get_model()
+    applies to it too.
+    
+    Args:
+        kind: Student kind, one of lite_model.LITE_KINDS
+    
+    Returns:
+        CompactForest or CentroidModel: The lite model
+    """
+    from lite_model import distil, load_student
+    
+    teacher, _ = get_model()
+    path = lite_model_path(kind, model_version())
+    
+    def build():
+        student = distil(teacher, kind)
+        student.save(path)
+        return student
+    
+    return _cached_model(path, lambda: load_student(path, kind), build)
+
+def predict_crop(model, label_encoder, input_data, lite=None, monitor=True):
     """
     Predicts crops based on input environmental conditions.
     
@@ -46,14 +179,33 @@ def predict_crop(model, label_encoder, input_data):
         model: Trained machine learning model
         label_encoder: Label encoder used during training
         input_data: Array of environmental conditions
+        lite: Use the distilled lite model instead of model; defaults to
+            the LITE_MODEL environment variable
+        monitor: Add the inputs to the drift statistics (see
+            drift_monitor.py); off for synthetic batches such as
+            sensitivity grids, which are not user requests
         
     Returns:
         tuple: (predicted crop, probability distribution)
+    
+    Raises:
+        SchedulerBusy: Too many predictions are already waiting for CPU
     """
-    # Make prediction
-    prediction = model.predict(input_data)
+    if lite is None:
+        lite = lite_mode_by_default()
+    if lite:
+        # Resolved before taking the inference slot: distilling on first
+        # use is batch work and is scheduled as such
+        model = get_lite_model()
     
     # Get probability distribution
-    probabilities = model.predict_proba(input_data)
+    with compute_slot('inference'):
+        probabilities = model.predict_proba(input_data)
+    
+    # The prediction is the most probable class; no second pass over the model
+    prediction = model.classes_[np.argmax(probabilities, axis=1)]
+    
+    if monitor:
+        observe_inputs(input_data)
     
     return prediction, probabilities
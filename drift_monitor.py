@@ -0,0 +1,384 @@
+"""
+Build the training profile the input-drift monitor compares requests against.
+
+The profile holds each input's training range, mean and standard
+deviation, and the share of training rows in each of a fixed set of bins.
+By default it is computed from crop_data.get_dataset(); pass --csv to
+profile the real training data instead (one column per input, named like
+the field_conditions keys or N, P, K, temperature, humidity, ph, rainfall).
+The app builds the default profile on first use if none exists.
+
+Usage:
+    python drift_monitor.py [--csv training.csv] [--output models/drift_profile.npz]
+"""
+import argparse
+import math
+import os
+import threading
+
+import numpy as np
+
+from compact_forest import save_npz
+from model_inputs import FEATURE_KEYS, FEATURE_LABELS, FEATURE_RANGES
+
+# Environment variable with the profile path; "off" turns the monitor off
+PROFILE_ENV_VAR = "DRIFT_PROFILE"
+DEFAULT_PROFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "drift_profile.npz")
+
+# Equal-width bins across each input's slider range, plus one bin each for
+# values below and above it. Fixed edges keep the live histogram O(1).
+BINS = 10
+
+# Requests observed before drift scores are reported
+MIN_SAMPLES = 50
+
+# Population stability index bands (the usual rule of thumb): below 0.1 is
+# stable, 0.1-0.25 a moderate shift, above 0.25 a significant one
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+# Bin shares are floored at this before taking logs in the PSI
+PSI_FLOOR = 1e-4
+
+# Up to this many rows, a plain Python loop updates the statistics faster
+# than numpy's per-call overhead (one app request is one row)
+SCALAR_UPDATE_LIMIT = 4
+
+# Alternative column names accepted in a training CSV
+CSV_COLUMNS = {'N': 'n_value', 'P': 'p_value', 'K': 'k_value', 'ph': 'ph_value'}
+
+
+def bin_index(X):
+    """Histogram bin of every value: 0 below the range, BINS + 1 above it."""
+    X = np.asarray(X, dtype=np.float64)
+    low, high = FEATURE_RANGES[:, 0], FEATURE_RANGES[:, 1]
+    scaled = np.floor((X - low) / ((high - low) / BINS))
+    # The top of the range belongs to the last bin, like np.histogram
+    scaled[X == high] = BINS - 1
+    return np.clip(scaled, -1, BINS).astype(np.int64) + 1
+
+
+def build_profile(X):
+    """
+    Summarize training inputs for the drift monitor.
+
+    Args:
+        X: (n_rows, 7) training inputs in feature order
+
+    Returns:
+        dict: Arrays 'low'/'high' (training range), 'mean', 'std', 'shares'
+            ((7, BINS + 2) share of rows per bin) and 'rows'
+    """
+    X = np.asarray(X, dtype=np.float64)
+    bins = bin_index(X)
+    counts = np.stack([np.bincount(bins[:, j], minlength=BINS + 2) for j in range(X.shape[1])])
+    return {
+        'low': X.min(axis=0),
+        'high': X.max(axis=0),
+        'mean': X.mean(axis=0),
+        'std': X.std(axis=0),
+        'shares': counts / len(X),
+        'rows': np.asarray(len(X)),
+    }
+
+
+def profile_path():
+    """The configured profile path, or None if drift monitoring is turned off."""
+    path = os.environ.get(PROFILE_ENV_VAR, "").strip() or DEFAULT_PROFILE
+    return None if path.lower() in ("off", "false", "0", "none") else path
+
+
+def load_profile(path=None):
+    """
+    Read the stored training profile, building it from get_dataset() if missing.
+
+    Returns:
+        dict: See build_profile()
+    """
+    path = path or profile_path() or DEFAULT_PROFILE
+    if not os.path.exists(path):
+        from crop_data import get_dataset
+        save_npz(path, **build_profile(get_dataset().drop('label', axis=1).to_numpy(dtype=float)))
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def psi(live, train):
+    """Population stability index between two sets of bin shares."""
+    live = np.maximum(live, PSI_FLOOR)
+    train = np.maximum(train, PSI_FLOOR)
+    return float(np.sum((live - train) * np.log(live / train)))
+
+
+def binned_ks(live, train):
+    """Largest gap between the two cumulative distributions at the bin edges."""
+    return float(np.max(np.abs(np.cumsum(live) - np.cumsum(train))))
+
+
+class DriftMonitor:
+    """
+    Streaming statistics of model inputs, compared with a training profile.
+
+    Memory is fixed per input: a count, Welford's running mean and sum of
+    squared deviations, the min and max, a BINS + 2 histogram and an
+    out-of-range count. observe() folds a batch in, row by row for single
+    requests and with Chan's parallel update for larger batches.
+    """
+
+    def __init__(self, profile, path=None):
+        self.profile = profile
+        self.path = path
+        n_features = len(profile['mean'])
+        self._train_low = profile['low'].tolist()
+        self._train_high = profile['high'].tolist()
+        self._slider_low = FEATURE_RANGES[:, 0].tolist()
+        self._slider_high = FEATURE_RANGES[:, 1].tolist()
+        self._bin_width = ((FEATURE_RANGES[:, 1] - FEATURE_RANGES[:, 0]) / BINS).tolist()
+        self._lock = threading.Lock()
+        self.n_features = n_features
+        self.reset()
+
+    def reset(self):
+        """Forget everything observed so far."""
+        with self._lock:
+            self.count = 0
+            self.flagged = 0
+            self.mean = [0.0] * self.n_features
+            self.m2 = [0.0] * self.n_features
+            self.min = [math.inf] * self.n_features
+            self.max = [-math.inf] * self.n_features
+            self.histogram = [[0] * (BINS + 2) for _ in range(self.n_features)]
+            self.out_of_range = [0] * self.n_features
+
+    def observe(self, X):
+        """
+        Add a batch of model inputs to the statistics.
+
+        Args:
+            X: (n_rows, 7) inputs in feature order
+        """
+        if len(X) <= SCALAR_UPDATE_LIMIT:
+            rows = X.tolist() if isinstance(X, np.ndarray) else [list(map(float, row)) for row in X]
+            with self._lock:
+                for row in rows:
+                    self._observe_row(row)
+            return
+        self._observe_batch(np.asarray(X, dtype=np.float64))
+
+    def _observe_row(self, row):
+        self.count += 1
+        outside = False
+        for j, x in enumerate(row):
+            # Welford's update
+            delta = x - self.mean[j]
+            self.mean[j] += delta / self.count
+            self.m2[j] += delta * (x - self.mean[j])
+            if x < self.min[j]:
+                self.min[j] = x
+            if x > self.max[j]:
+                self.max[j] = x
+            # Same bins as bin_index()
+            b = math.floor((x - self._slider_low[j]) / self._bin_width[j])
+            if x == self._slider_high[j]:
+                b = BINS - 1
+            self.histogram[j][min(max(b, -1), BINS) + 1] += 1
+            if x < self._train_low[j] or x > self._train_high[j]:
+                self.out_of_range[j] += 1
+                outside = True
+        self.flagged += outside
+
+    def _observe_batch(self, X):
+        n = len(X)
+        mean = X.mean(axis=0)
+        m2 = ((X - mean) ** 2).sum(axis=0)
+        bins = bin_index(X)
+        outside = (X < self.profile['low']) | (X > self.profile['high'])
+        counts = [np.bincount(bins[:, j], minlength=BINS + 2).tolist() for j in range(self.n_features)]
+        with self._lock:
+            total = self.count + n
+            for j in range(self.n_features):
+                # Chan et al.'s merge of two (count, mean, M2) summaries
+                delta = mean[j] - self.mean[j]
+                self.mean[j] += delta * n / total
+                self.m2[j] += m2[j] + delta ** 2 * self.count * n / total
+                self.min[j] = min(self.min[j], float(X[:, j].min()))
+                self.max[j] = max(self.max[j], float(X[:, j].max()))
+                self.histogram[j] = [a + b for a, b in zip(self.histogram[j], counts[j])]
+                self.out_of_range[j] += int(outside[:, j].sum())
+            self.count = total
+            self.flagged += int(outside.any(axis=1).sum())
+
+    def metrics(self):
+        """
+        Current statistics and drift scores.
+
+        Returns:
+            dict: 'samples', 'flagged' (requests with any input outside the
+                training range), 'status' (worst feature status) and
+                'features', one dict per input with its live count, mean,
+                std, min, max, training mean and std, 'mean_shift' (in
+                training standard deviations), 'psi', 'ks', 'out_of_range'
+                and 'status' ('collecting', 'stable', 'moderate' or
+                'significant')
+        """
+        with self._lock:
+            count, flagged = self.count, self.flagged
+            mean, m2 = list(self.mean), list(self.m2)
+            low, high = list(self.min), list(self.max)
+            histogram = [list(h) for h in self.histogram]
+            out_of_range = list(self.out_of_range)
+
+        features = {}
+        for j, key in enumerate(FEATURE_KEYS):
+            train_std = float(self.profile['std'][j])
+            feature = {
+                'count': count,
+                'mean': mean[j] if count else None,
+                'std': math.sqrt(m2[j] / count) if count else None,
+                'min': low[j] if count else None,
+                'max': high[j] if count else None,
+                'train_mean': float(self.profile['mean'][j]),
+                'train_std': train_std,
+                'out_of_range': out_of_range[j],
+                'mean_shift': None, 'psi': None, 'ks': None,
+                'status': 'collecting',
+            }
+            if count >= MIN_SAMPLES:
+                shares = np.asarray(histogram[j]) / count
+                feature['mean_shift'] = (mean[j] - feature['train_mean']) / train_std if train_std else 0.0
+                feature['psi'] = psi(shares, self.profile['shares'][j])
+                feature['ks'] = binned_ks(shares, self.profile['shares'][j])
+                feature['status'] = ('significant' if feature['psi'] > PSI_SIGNIFICANT else
+                                     'moderate' if feature['psi'] > PSI_MODERATE else 'stable')
+            features[key] = feature
+
+        order = ('collecting', 'stable', 'moderate', 'significant')
+        return {
+            'samples': count,
+            'flagged': flagged,
+            'status': max((f['status'] for f in features.values()), key=order.index),
+            'features': features,
+        }
+
+    def out_of_range_inputs(self, row):
+        """
+        Inputs of one request outside the training range.
+
+        Returns:
+            list: (field_conditions key, value, training low, training high)
+        """
+        return [(key, x, self._train_low[j], self._train_high[j])
+                for j, (key, x) in enumerate(zip(FEATURE_KEYS, row))
+                if x < self._train_low[j] or x > self._train_high[j]]
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_monitor():
+    """
+    Return the process-wide drift monitor, or None if monitoring is turned off.
+
+    The profile is loaded (and built, if missing) on first use.
+    """
+    global _monitor
+    path = profile_path()
+    if path is None:
+        return None
+    if _monitor is None or _monitor.path != path:
+        with _monitor_lock:
+            if _monitor is None or _monitor.path != path:
+                _monitor = DriftMonitor(load_profile(path), path)
+    return _monitor
+
+
+def observe_inputs(X):
+    """Record model inputs with the process-wide monitor (see predict_crop)."""
+    monitor = get_monitor()
+    if monitor is not None:
+        monitor.observe(X)
+
+
+def drift_metrics():
+    """
+    Drift statistics of this process's requests (see DriftMonitor.metrics).
+
+    Returns:
+        dict or None: None if monitoring is turned off
+    """
+    monitor = get_monitor()
+    return None if monitor is None else monitor.metrics()
+
+
+def out_of_range_inputs(field_conditions):
+    """Inputs of a field outside the training range (see DriftMonitor.out_of_range_inputs)."""
+    monitor = get_monitor()
+    if monitor is None:
+        return []
+    return monitor.out_of_range_inputs([float(field_conditions[key]) for key in FEATURE_KEYS])
+
+
+def drift_status_panel():
+    """Show per-input drift scores (Streamlit)."""
+    import streamlit as st
+
+    st.subheader("Input Drift")
+    metrics = drift_metrics()
+    if metrics is None:
+        st.info(f"Drift monitoring is turned off ({PROFILE_ENV_VAR}=off).")
+        return
+    st.write(f"{metrics['samples']:,} requests observed, {metrics['flagged']:,} with an input outside "
+             f"the training range. Overall: **{metrics['status']}**.")
+    if metrics['samples'] < MIN_SAMPLES:
+        st.caption(f"Drift scores are shown after {MIN_SAMPLES} requests.")
+    st.table([
+        {
+            "Input": FEATURE_LABELS[key],
+            "Mean": "-" if f['mean'] is None else f"{f['mean']:.1f}",
+            "Training mean": f"{f['train_mean']:.1f}",
+            "Shift (sd)": "-" if f['mean_shift'] is None else f"{f['mean_shift']:+.2f}",
+            "PSI": "-" if f['psi'] is None else f"{f['psi']:.3f}",
+            "KS": "-" if f['ks'] is None else f"{f['ks']:.3f}",
+            "Out of range": f['out_of_range'],
+            "Status": f['status'],
+        }
+        for key, f in metrics['features'].items()
+    ])
+    if st.button("Reset drift statistics"):
+        get_monitor().reset()
+
+
+def _read_csv(path):
+    import pandas as pd
+
+    df = pd.read_csv(path).rename(columns=CSV_COLUMNS)
+    missing = [key for key in FEATURE_KEYS if key not in df.columns]
+    if missing:
+        raise ValueError(f"{path} has no column for: {', '.join(missing)}")
+    return df[list(FEATURE_KEYS)].to_numpy(dtype=float)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--csv", help="Training data to profile; defaults to crop_data.get_dataset()")
+    parser.add_argument("--output", default=profile_path() or DEFAULT_PROFILE, help="Profile path")
+    args = parser.parse_args()
+
+    if args.csv:
+        X = _read_csv(args.csv)
+    else:
+        from crop_data import get_dataset
+        X = get_dataset().drop('label', axis=1).to_numpy(dtype=float)
+    profile = build_profile(X)
+    save_npz(args.output, **profile)
+
+    print(f"Profiled {len(X)} rows into {args.output}")
+    print(f"{'input':<18} {'low':>8} {'high':>8} {'mean':>8} {'std':>8}")
+    for j, key in enumerate(FEATURE_KEYS):
+        print(f"{FEATURE_LABELS[key]:<18} {profile['low'][j]:>8.1f} {profile['high'][j]:>8.1f} "
+              f"{profile['mean'][j]:>8.1f} {profile['std'][j]:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+import itertools
+import queue
+import smtplib
+import threading
+import time
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formatdate
+
+# Delivery states reported by Outbox.status()
+QUEUED = "queued"
+SENDING = "sending"
+RETRYING = "retrying"
+SENT = "sent"
+FAILED = "failed"
+
+# Retry policy for transient SMTP/network errors
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 1.0      # seconds before the first retry, doubled each attempt
+BACKOFF_MAX = 30.0
+
+# Close the pooled connection after this long without traffic
+IDLE_TIMEOUT = 60.0
+
+# Finished entries kept for status polling
+STATUS_HISTORY = 500
+
+# Emails a Streamlit session remembers for its status panel
+SESSION_EMAILS = 20
+
+
+def smtp_config():
+    """
+    Read SMTP settings from the cached settings snapshot (settings.get_settings).
+
+    Returns:
+        dict: host, port, user and password
+    """
+    from settings import get_settings
+
+    settings = get_settings()
+    return {
+        'host': settings['SMTP_SERVER'],
+        'port': int(settings['SMTP_PORT']),
+        'user': settings['EMAIL_USER'],
+        'password': settings['EMAIL_PASSWORD'],
+    }
+
+
+def build_message(sender, recipient, subject, body, attachment=None,
+                  attachment_name="crop_fertilizer_report.pdf"):
+    """
+    Build a plain-text email, optionally with a PDF attachment.
+
+    Args:
+        attachment: PDF bytes to attach, if any
+
+    Returns:
+        MIMEMultipart: The message
+    """
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = recipient
+    msg['Date'] = formatdate(localtime=True)
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body))
+
+    if attachment is not None:
+        part = MIMEBase('application', 'pdf')
+        part.set_payload(attachment)
+        encoders.encode_base64(part)
+        part.add_header('Content-Disposition', 'attachment', filename=attachment_name)
+        msg.attach(part)
+
+    return msg
+
+
+def is_transient(error):
+    """Whether an SMTP error is worth retrying (network trouble or a 4xx reply)."""
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    # Socket errors and timeouts
+    return isinstance(error, OSError)
+
+
+class SMTPConnection:
+    """
+    A lazily opened, authenticated SMTP session that is reused across sends.
+
+    smtp_factory defaults to smtplib.SMTP and can be replaced to point the
+    connection at a local stand-in server.
+    """
+
+    def __init__(self, host, port, user='', password='', starttls=True,
+                 timeout=30, smtp_factory=smtplib.SMTP):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.smtp_factory = smtp_factory
+        self.server = None
+        self.last_used = 0.0
+        self.connects = 0
+
+    def open(self):
+        server = self.smtp_factory(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+        self.connects += 1
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except smtplib.SMTPException:
+            self.server.close()
+        except OSError:
+            pass
+        self.server = None
+
+    def is_idle(self, idle_timeout):
+        return self.server is not None and time.monotonic() - self.last_used > idle_timeout
+
+    def send(self, sender, recipients, message_text):
+        """Send over the pooled session, reconnecting once if it went stale."""
+        if self.server is None:
+            self.open()
+        try:
+            self.server.sendmail(sender, recipients, message_text)
+        except smtplib.SMTPServerDisconnected:
+            self.server = None
+            self.open()
+            self.server.sendmail(sender, recipients, message_text)
+        self.last_used = time.monotonic()
+
+
+class Outbox:
+    """
+    Queue of outgoing emails delivered by a background thread.
+
+    submit() returns immediately with a message id; status() reports its
+    delivery state so the UI can poll it on later reruns. The sender keeps
+    one authenticated SMTP connection open between messages and retries
+    transient failures with exponential backoff.
+    """
+
+    def __init__(self, connection, max_attempts=MAX_ATTEMPTS, backoff_base=BACKOFF_BASE,
+                 backoff_max=BACKOFF_MAX, idle_timeout=IDLE_TIMEOUT, sleep=time.sleep):
+        self.connection = connection
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.idle_timeout = idle_timeout
+        self._sleep = sleep
+        self._queue = queue.Queue()
+        self._status = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def submit(self, msg, recipients=None):
+        """
+        Queue a message for delivery.
+
+        Args:
+            msg: email.message.Message with From/To headers
+            recipients: Optional list of envelope recipients (defaults to To)
+
+        Returns:
+            int: Message id for status()
+        """
+        message_id = next(self._ids)
+        recipients = recipients or [msg['To']]
+        with self._lock:
+            self._status[message_id] = {
+                'status': QUEUED, 'recipients': recipients, 'attempts': 0,
+                'error': None, 'updated': time.time()
+            }
+            self._trim_history()
+        self._queue.put((message_id, msg['From'], recipients, msg.as_string()))
+        return message_id
+
+    def status(self, message_id):
+        """Return a copy of the delivery record for a message, or None if unknown."""
+        with self._lock:
+            record = self._status.get(message_id)
+            return dict(record) if record else None
+
+    def wait(self, message_id, timeout=None):
+        """Block until a message is sent or failed; returns its final record."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            record = self.status(message_id)
+            if record is None or record['status'] in (SENT, FAILED):
+                return record
+            if deadline is not None and time.monotonic() > deadline:
+                return record
+            time.sleep(0.01)
+
+    def pending(self):
+        """Number of messages waiting to be sent."""
+        return self._queue.qsize()
+
+    def close(self, timeout=5):
+        """Stop the sender thread after the queue drains and close the connection."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _update(self, message_id, **fields):
+        with self._lock:
+            self._status[message_id].update(fields, updated=time.time())
+
+    def _trim_history(self):
+        finished = [mid for mid, rec in self._status.items() if rec['status'] in (SENT, FAILED)]
+        for mid in finished[:max(0, len(self._status) - STATUS_HISTORY)]:
+            del self._status[mid]
+
+    def _deliver(self, message_id, sender, recipients, message_text):
+        for attempt in range(1, self.max_attempts + 1):
+            self._update(message_id, status=SENDING, attempts=attempt)
+            try:
+                self.connection.send(sender, recipients, message_text)
+            except Exception as e:
+                # Drop the session; it may be half-broken after an error
+                self.connection.close()
+                if not is_transient(e) or attempt == self.max_attempts:
+                    self._update(message_id, status=FAILED, error=str(e))
+                    return
+                self._update(message_id, status=RETRYING, error=str(e))
+                self._sleep(min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+            else:
+                self._update(message_id, status=SENT, error=None)
+                return
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                if self.connection.is_idle(self.idle_timeout):
+                    self.connection.close()
+                continue
+            if item is None:
+                break
+            self._deliver(*item)
+        self.connection.close()
+
+
+_outbox = None
+_outbox_key = None
+_outbox_lock = threading.Lock()
+
+
+def _config_key(config):
+    return (config['host'], config['port'], config['user'], config['password'])
+
+
+def get_outbox(config=None):
+    """
+    Return the process-wide outbox, for the current SMTP configuration.
+
+    One outbox (and so one pooled connection) is shared by every session.
+    When the SMTP settings change, the old outbox is told to stop once it
+    has sent what is already queued, and a new one takes over.
+
+    Args:
+        config: dict from smtp_config(); read from the settings if omitted
+
+    Returns:
+        Outbox: Running outbox
+    """
+    global _outbox, _outbox_key
+    config = config or smtp_config()
+    key = _config_key(config)
+    with _outbox_lock:
+        if _outbox is None or _outbox_key != key:
+            if _outbox is not None:
+                # Don't wait: the old sender drains its queue in the background
+                _outbox.close(timeout=0)
+            _outbox = Outbox(SMTPConnection(config['host'], config['port'],
+                                            config['user'], config['password']))
+            _outbox_key = key
+        return _outbox
+
+
+def queue_email(msg, config=None):
+    """
+    Queue a message on the shared outbox and remember it in the Streamlit session.
+
+    The session keeps the last SESSION_EMAILS messages for its status panel.
+
+    Returns:
+        int: Message id
+    """
+    import streamlit as st
+
+    outbox = get_outbox(config)
+    message_id = outbox.submit(msg)
+    # The outbox itself is kept, so status still works after a settings change
+    queued = st.session_state.setdefault('queued_emails', [])
+    queued.append((outbox, message_id, msg['To']))
+    del queued[:-SESSION_EMAILS]
+    return message_id
+
+
+def email_status_panel():
+    """Show the delivery status of emails queued by the current session."""
+    import streamlit as st
+
+    queued = st.session_state.get('queued_emails', [])
+    if not queued:
+        return
+
+    st.subheader("Email Delivery")
+    for outbox, message_id, recipient in queued[-5:]:
+        record = outbox.status(message_id)
+        if record is None:
+            st.write(f"- {recipient}: status unavailable")
+        elif record['status'] == SENT:
+            st.success(f"Sent to {recipient}")
+        elif record['status'] == FAILED:
+            st.error(f"Failed to send to {recipient}: {record['error']}")
+        else:
+            retry_note = f" (attempt {record['attempts']})" if record['attempts'] > 1 else ""
+            st.info(f"{record['status'].capitalize()}: {recipient}{retry_note}")
+    st.button("Refresh email status")
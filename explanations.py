@@ -0,0 +1,224 @@
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+from crop_recommendation_model import get_model, model_version
+from model_inputs import FEATURE_KEYS, FEATURE_LABELS, field_row
+
+# Inputs are rounded to these steps before explaining, so nearby requests
+# share one cached explanation (N/P/K in kg/ha, temperature in °C,
+# humidity in %, pH, rainfall in mm)
+QUANTIZATION = {
+    'n_value': 1.0,
+    'p_value': 1.0,
+    'k_value': 1.0,
+    'temperature': 0.1,
+    'humidity': 0.5,
+    'ph_value': 0.05,
+    'rainfall': 1.0,
+}
+
+# Explanations kept in memory
+EXPLANATION_CACHE_SIZE = 1024
+
+
+class PathExplainer:
+    """
+    Tree-path feature attributions for a CompactForest.
+
+    Each node of each tree gets an expected class distribution: the mean
+    prediction of that tree over the background rows that pass through the
+    node. Following one input's path from the root to its leaf, every
+    split moves the expectation from the node's value to the child's; the
+    change is credited to the split's feature. Summed over the path and
+    averaged over the trees, the credits add up exactly to the prediction
+    minus the forest's expected prediction over the background data.
+
+    This is the path attribution TreeSHAP falls back to in its approximate
+    mode (Saabas). Unlike exact TreeSHAP it needs no per-leaf polynomial
+    bookkeeping, so all trees and inputs are explained together with a
+    few array operations per tree level.
+    """
+
+    def __init__(self, forest, background):
+        """
+        Args:
+            forest: CompactForest to explain
+            background: (n_rows, n_features) inputs that define the expected
+                values, normally the training data
+        """
+        self.forest = forest
+        n_classes = len(forest.classes_)
+        n_leaves = len(forest.leaf_probs)
+
+        # Leaf distributions, normalized like predict_proba does per tree
+        leaf_classes = forest.leaf_classes.astype(np.int64)
+        leaf_weights = forest.leaf_probs.astype(np.float64)
+        leaf_weights /= leaf_weights.sum(axis=1, keepdims=True)
+        self.leaf_values = np.zeros((n_leaves, n_classes), dtype=np.float32)
+        np.put_along_axis(self.leaf_values, leaf_classes, leaf_weights.astype(np.float32), axis=1)
+
+        # Sum the leaf distribution each background row reaches into every
+        # split node on its path; dividing by the visit counts gives the means.
+        # Leaves keep only a few classes, so one bincount over (node, class)
+        # cells does it.
+        steps, leaves = self._walk(background)
+        n_split = len(forest.feature)
+        totals = np.zeros(n_split * n_classes)
+        counts = np.zeros(n_split)
+        for pairs, parent, _ in steps:
+            reached = leaves[pairs]
+            cells = parent[:, None] * n_classes + leaf_classes[reached]
+            totals += np.bincount(cells.ravel(), weights=leaf_weights[reached].ravel(),
+                                  minlength=n_split * n_classes)
+            counts += np.bincount(parent, minlength=n_split)
+        totals = totals.reshape(n_split, n_classes)
+        node_values = totals / np.maximum(counts, 1)[:, None]
+        # A node no background row reaches takes its parent's value. Children
+        # always come after their parent in the node arrays, so one pass
+        # in order fills whole unvisited subtrees.
+        parents = self._parents()
+        for node in np.flatnonzero(counts == 0).tolist():
+            node_values[node] = node_values[parents[node]]
+        self.node_values = node_values.astype(np.float32)
+
+        self.expected_value = self._value(forest.roots.astype(np.int64)).mean(axis=0)
+
+    def _parents(self):
+        """Parent split node of every split node (0 for the roots)."""
+        forest = self.forest
+        parents = np.zeros(len(forest.feature), dtype=np.int64)
+        for children in (forest.left, forest.right):
+            split = np.flatnonzero(children >= 0)
+            parents[children[split]] = split
+        return parents
+
+    def _walk(self, X):
+        """
+        Walk every (row, tree) pair down to its leaf, one level per step.
+
+        Returns:
+            tuple: per level, a (pairs, parent split nodes, child references)
+                tuple of the pairs still walking; and the leaf each pair
+                reaches. Pair p is row p // n_trees in tree p % n_trees.
+        """
+        forest = self.forest
+        X = np.asarray(X, dtype=np.float32)
+        node = np.tile(forest.roots.astype(np.int64), (len(X), 1)).ravel()
+        rows = np.repeat(np.arange(len(X)), forest.n_trees)
+        steps = []
+        for _ in range(forest.max_depth):
+            pairs = np.flatnonzero(node >= 0)
+            if not len(pairs):
+                break
+            parent = node[pairs]
+            go_left = X[rows[pairs], forest.feature[parent]] <= forest.threshold[parent]
+            node[pairs] = np.where(go_left, forest.left[parent], forest.right[parent])
+            steps.append((pairs, parent, node[pairs]))
+        return steps, -node - 1
+
+    def _value(self, node):
+        """Expected distributions of node references (split nodes or leaves)."""
+        return np.where((node >= 0)[:, None], self.node_values[np.maximum(node, 0)],
+                        self.leaf_values[np.maximum(-node - 1, 0)])
+
+    def explain(self, X, classes):
+        """
+        Attribute predictions to input features.
+
+        Args:
+            X: (n_samples, n_features) inputs
+            classes: (n_samples,) column of predict_proba to explain per input
+
+        Returns:
+            tuple: (n_samples, n_features) attributions and (n_samples,)
+                expected values; per input they add up to the probability
+                of its class
+        """
+        X = np.asarray(X, dtype=np.float32)
+        classes = np.asarray(classes, dtype=np.int64)
+        n_samples, n_features = X.shape
+        n_trees = self.forest.n_trees
+
+        pair_class = np.repeat(classes, n_trees)
+        cells = np.repeat(np.arange(n_samples), n_trees) * n_features
+        attributions = np.zeros(n_samples * n_features)
+        steps, _ = self._walk(X)
+        for pairs, parent, child in steps:
+            # Change of the explained class's expectation across this split
+            column = pair_class[pairs]
+            child_value = np.where(child >= 0, self.node_values[np.maximum(child, 0), column],
+                                   self.leaf_values[np.maximum(-child - 1, 0), column])
+            gain = child_value - self.node_values[parent, column]
+            attributions += np.bincount(cells[pairs] + self.forest.feature[parent], weights=gain,
+                                        minlength=n_samples * n_features)
+        return attributions.reshape(n_samples, n_features) / n_trees, self.expected_value[classes]
+
+
+_explainers = {}
+_explainer_lock = threading.Lock()
+
+
+def get_explainer():
+    """Return the explainer for the live model, built once per model version."""
+    model, _ = get_model()
+    version = model_version()
+    explainer = _explainers.get(version)
+    if explainer is None:
+        with _explainer_lock:
+            explainer = _explainers.get(version)
+            if explainer is None:
+                from crop_data import get_dataset
+                background = get_dataset().drop('label', axis=1).to_numpy(dtype=float)
+                explainer = PathExplainer(model, background)
+                # Only the live version is kept
+                _explainers.clear()
+                _explainers[version] = explainer
+    return explainer
+
+
+def quantize(row):
+    """Round a field row (see model_inputs.field_row) to QUANTIZATION steps."""
+    return tuple(round(round(value / QUANTIZATION[key]) * QUANTIZATION[key], 6)
+                 for key, value in zip(FEATURE_KEYS, row))
+
+
+@lru_cache(maxsize=EXPLANATION_CACHE_SIZE)
+def _explain(row, crop, version):
+    explainer = get_explainer()
+    _, label_encoder = get_model()
+    class_index = int(np.flatnonzero(label_encoder.classes_ == crop)[0])
+    attributions, expected = explainer.explain(np.asarray([row]), [class_index])
+    contributions = sorted(zip(FEATURE_KEYS, (attributions[0] * 100).tolist()),
+                           key=lambda item: abs(item[1]), reverse=True)
+    return {
+        'crop': crop,
+        'base': float(expected[0]) * 100,
+        'prediction': float(expected[0] + attributions[0].sum()) * 100,
+        'contributions': tuple((FEATURE_LABELS[key], value) for key, value in contributions),
+    }
+
+
+def explain_crop(field_conditions, crop):
+    """
+    Explain the forest's probability for one crop at a field.
+
+    Args:
+        field_conditions: Dictionary with the field's input values
+        crop: Crop name to explain
+
+    Returns:
+        dict: 'crop', 'base' (average probability over the training data,
+            in percent), 'prediction' (probability for the quantized field,
+            in percent) and 'contributions' ((input label, percentage
+            points) pairs, largest effect first), which add up to
+            prediction - base
+    """
+    get_model()
+    return _explain(quantize(field_row(field_conditions)), str(crop), model_version())
+
+
+def explanation_cache_info():
+    """Hit/miss statistics of the explanation cache."""
+    return _explain.cache_info()
@@ -0,0 +1,376 @@
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from model_inputs import FEATURE_KEYS
+
+# Environment variable with the history database path; "off" disables the
+# history. Every app process on the host can share one database file.
+HISTORY_DB_ENV_VAR = "HISTORY_DB"
+DEFAULT_HISTORY_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "field_history.db")
+
+# Records written per transaction, at most. The writer commits as soon as
+# the queue is empty or FLUSH_INTERVAL has passed since the batch started,
+# so a quiet app still writes each submission within a fraction of a second.
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.25
+
+# Records waiting for the writer, at most. Beyond this, record() drops the
+# submission (counted in stats()) rather than making the request wait.
+MAX_PENDING = 20000
+
+# Seconds a connection waits for another process's write lock
+BUSY_TIMEOUT = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    field_id TEXT,
+    soil_type TEXT,
+    n_value REAL,
+    p_value REAL,
+    k_value REAL,
+    temperature REAL,
+    humidity REAL,
+    ph_value REAL,
+    rainfall REAL,
+    model_version TEXT,
+    top_crop TEXT,
+    top_prob REAL,
+    fertilizers TEXT
+);
+CREATE TABLE IF NOT EXISTS recommendations (
+    submission_id INTEGER NOT NULL REFERENCES submissions(id) ON DELETE CASCADE,
+    rank INTEGER NOT NULL,
+    crop TEXT NOT NULL,
+    probability REAL NOT NULL,
+    PRIMARY KEY (submission_id, rank)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS submissions_created ON submissions(created);
+CREATE INDEX IF NOT EXISTS submissions_field ON submissions(field_id, created);
+CREATE INDEX IF NOT EXISTS submissions_top_crop ON submissions(top_crop, created);
+CREATE INDEX IF NOT EXISTS recommendations_crop ON recommendations(crop, submission_id);
+"""
+
+# Submission columns holding the model inputs, named after them
+INPUT_COLUMNS = FEATURE_KEYS
+
+
+def history_path():
+    """The configured database path, or None if the history is turned off."""
+    path = os.environ.get(HISTORY_DB_ENV_VAR, "").strip() or DEFAULT_HISTORY_DB
+    return None if path.lower() in ("off", "false", "0", "none") else path
+
+
+def connect(path):
+    """
+    Open a connection in WAL mode with the schema in place.
+
+    WAL lets readers (and other processes) query the database while the
+    writer commits. synchronous=NORMAL only syncs at checkpoints: a power
+    cut can lose the last few commits, never corrupt the file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA foreign_keys=ON")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def submission_record(field_conditions, result, field_id=None, model_version=None, created=None):
+    """
+    Flatten one submission into the row record() queues.
+
+    Args:
+        field_conditions: Dictionary with soil_type and the seven input values
+        result: compute_recommendation() output (top_crops, top_probs in
+            percent, fertilizer_recs)
+        field_id: Optional name of the field the user entered
+        model_version: Version of the model that made the prediction
+        created: Unix time; defaults to now
+
+    Returns:
+        tuple: (submission row, ((crop, probability), ...) in rank order)
+    """
+    top = tuple((str(crop), float(prob) / 100) for crop, prob in zip(result['top_crops'], result['top_probs']))
+    fertilizers = [rec['fertilizer'] for rec in result.get('fertilizer_recs') or []]
+    row = (
+        time.time() if created is None else created,
+        field_id or None,
+        field_conditions.get('soil_type'),
+        *(float(field_conditions[key]) for key in INPUT_COLUMNS),
+        None if model_version is None else str(model_version),
+        top[0][0] if top else None,
+        top[0][1] if top else None,
+        json.dumps(fertilizers),
+    )
+    return row, top
+
+
+def write_batch(connection, batch):
+    """
+    Insert (row, top) records from submission_record() in one transaction.
+
+    A record may carry a third item, a receipt dict from record_submission();
+    its 'id' is set to the new submission id before the commit, so anyone
+    who can read the row also knows which receipt it belongs to.
+    """
+    with connection:
+        cursor = connection.cursor()
+        children = []
+        for row, top, *receipt in batch:
+            cursor.execute("INSERT INTO submissions (created, field_id, soil_type, n_value, p_value, k_value, "
+                           "temperature, humidity, ph_value, rainfall, model_version, top_crop, top_prob, "
+                           "fertilizers) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            submission_id = cursor.lastrowid
+            if receipt and receipt[0] is not None:
+                receipt[0]['id'] = submission_id
+            children.extend((submission_id, rank, crop, prob) for rank, (crop, prob) in enumerate(top, 1))
+        cursor.executemany("INSERT INTO recommendations (submission_id, rank, crop, probability) "
+                           "VALUES (?, ?, ?, ?)", children)
+
+
+class HistoryWriter:
+    """
+    Background writer that batches history records into SQLite.
+
+    record() only puts the record on a queue, so the request path never
+    waits for the disk. One thread drains the queue and writes everything
+    that has piled up (up to batch_size records) in one transaction; a
+    transaction costs about as much as a single insert, which is what lets
+    the store keep up with thousands of submissions per second.
+    """
+
+    def __init__(self, path, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 max_pending=MAX_PENDING):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._stats = {'written': 0, 'dropped': 0, 'batches': 0, 'errors': 0, 'last_error': None,
+                       'write_ms': 0.0}
+        # Created here so a bad path fails loudly at startup, not in the thread
+        self._connection = connect(path)
+        self._thread = threading.Thread(target=self._run, name="field-history", daemon=True)
+        self._thread.start()
+
+    def record(self, row, top, receipt=None):
+        """
+        Queue one submission (see submission_record) without blocking.
+
+        Args:
+            receipt: Optional dict whose 'id' is set once the row is inserted
+
+        Returns:
+            bool: False if the queue was full and the record was dropped
+        """
+        try:
+            self._queue.put_nowait((row, top, receipt))
+            return True
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+            return False
+
+    def flush(self, timeout=None):
+        """Block until every record queued so far is committed."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5):
+        """Write what is queued, then stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self):
+        """Counts of records written, dropped and waiting, and write timings."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['pending'] = self._queue.qsize()
+        stats['avg_batch'] = stats['written'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        try:
+            write_batch(self._connection, batch)
+        except sqlite3.Error as e:
+            # Keep serving; the failure shows up in stats()
+            with self._lock:
+                self._stats['errors'] += 1
+                self._stats['last_error'] = str(e)
+            return
+        with self._lock:
+            self._stats['written'] += len(batch)
+            self._stats['batches'] += 1
+            self._stats['write_ms'] += (time.perf_counter() - start) * 1000
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch, waiters = [], []
+            deadline = time.monotonic() + self.flush_interval
+            # Gather whatever else is already queued, up to a full batch
+            while True:
+                if item is None:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stopping or len(batch) >= self.batch_size or time.monotonic() > deadline:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+        self._connection.close()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_history():
+    """
+    Return the process-wide history writer, or None if the history is off.
+
+    The writer is started on first use and drained when the process exits.
+    """
+    global _writer
+    path = history_path()
+    if path is None:
+        return None
+    with _writer_lock:
+        if _writer is None or _writer.path != path:
+            _writer = HistoryWriter(path)
+            atexit.register(_writer.close)
+        return _writer
+
+
+def record_submission(field_conditions, result, field_id=None, model_version=None):
+    """
+    Queue a submission for the history without waiting for the disk.
+
+    Does nothing if the history is turned off. The write itself happens on
+    the writer thread.
+
+    Returns:
+        dict or None: None if the history is off or the submission was
+            dropped; otherwise a receipt whose 'id' is the submission id
+            once the row is written (None until then)
+    """
+    writer = get_history()
+    if writer is None:
+        return None
+    receipt = {'id': None}
+    queued = writer.record(*submission_record(field_conditions, result, field_id, model_version), receipt)
+    return receipt if queued else None
+
+
+_readers = threading.local()
+
+
+def fetch_rows(sql, params=(), path=None):
+    """
+    Run a read query on the history database.
+
+    Returns:
+        list: One dict per row; empty if the history is off or not created yet
+    """
+    path = path or history_path()
+    if path is None or not os.path.exists(path):
+        return []
+    # One read connection per thread and database; WAL readers don't block the writer
+    connections = getattr(_readers, 'connections', None)
+    if connections is None:
+        connections = _readers.connections = {}
+    connection = connections.get(path)
+    if connection is None:
+        connection = connections[path] = connect(path)
+        connection.row_factory = sqlite3.Row
+    return [dict(row) for row in connection.execute(sql, params).fetchall()]
+
+
+def recent_submissions(limit=50, since=None, path=None):
+    """
+    Latest submissions, newest first.
+
+    Args:
+        limit: Maximum number of rows
+        since: Only submissions at or after this Unix time
+        path: Database path; defaults to the configured one
+
+    Returns:
+        list: One dict per submission (the submissions table's columns)
+    """
+    return fetch_rows("SELECT * FROM submissions WHERE created >= ? ORDER BY created DESC LIMIT ?",
+                      (since or 0, limit), path)
+
+
+def field_submissions(field_id, limit=50, path=None):
+    """Submissions for one field ID, newest first (see recent_submissions)."""
+    return fetch_rows("SELECT * FROM submissions WHERE field_id = ? ORDER BY created DESC LIMIT ?",
+                      (field_id, limit), path)
+
+
+def crop_submissions(crop, top_only=False, since=None, limit=50, path=None):
+    """
+    Submissions where a crop was recommended, newest first.
+
+    Args:
+        crop: Crop name
+        top_only: Only submissions where it was the top crop; otherwise
+            anywhere in the stored top-k
+        since: Only submissions at or after this Unix time
+
+    Returns:
+        list: Submission dicts, with the crop's 'rank' and 'probability'
+            unless top_only is set
+    """
+    if top_only:
+        return fetch_rows("SELECT * FROM submissions WHERE top_crop = ? AND created >= ? "
+                          "ORDER BY created DESC LIMIT ?", (crop, since or 0, limit), path)
+    # Submission IDs grow with time, so walking the (crop, submission_id)
+    # index backwards yields the newest matches first without a sort
+    return fetch_rows("SELECT s.*, r.rank, r.probability FROM recommendations r "
+                      "JOIN submissions s ON s.id = r.submission_id "
+                      "WHERE r.crop = ? AND s.created >= ? ORDER BY r.submission_id DESC LIMIT ?",
+                      (crop, since or 0, limit), path)
+
+
+def history_status_panel():
+    """Show the history writer's counters (Streamlit)."""
+    import streamlit as st
+
+    st.subheader("Field History")
+    writer = get_history()
+    if writer is None:
+        st.info(f"Field history is turned off ({HISTORY_DB_ENV_VAR}=off).")
+        return
+    stats = writer.stats()
+    st.table([{
+        "Database": writer.path,
+        "Written": stats['written'],
+        "Waiting": stats['pending'],
+        "Dropped": stats['dropped'],
+        "Avg batch": f"{stats['avg_batch']:.1f}",
+        "Errors": stats['errors'],
+    }])
+    if stats['last_error']:
+        st.warning(f"Last write error: {stats['last_error']}")
@@ -0,0 +1,141 @@
+import numpy as np
+
+from compact_forest import CompactForest, save_npz
+from compute_scheduler import compute_slot
+from model_inputs import FEATURE_RANGES
+
+# Student model kinds, from most to least faithful
+LITE_KINDS = ('forest', 'tree', 'centroid')
+
+# Forest-labelled samples used to train a student
+DISTILL_SAMPLES = 20000
+
+# Student sizes; chosen with benchmark_lite_model.py
+STUDENT_TREES = 5
+STUDENT_DEPTH = 10
+
+# Softness of the nearest-centroid probabilities (squared distance scale,
+# in slider-range units)
+CENTROID_TEMPERATURE = 0.01
+
+
+def distillation_samples(n_samples=DISTILL_SAMPLES, seed=0):
+    """
+    Draw inputs to label with the full model.
+
+    Half are uniform over the slider ranges, so the student also learns the
+    forest's answers far from the training data. The other half are training
+    rows with 10% multiplicative noise, so the region users care about most
+    is densely covered.
+
+    Returns:
+        numpy.ndarray: (n_samples, 7) inputs in app feature order
+    """
+    from crop_data import get_dataset
+
+    rng = np.random.default_rng(seed)
+    low, high = FEATURE_RANGES[:, 0], FEATURE_RANGES[:, 1]
+    n_uniform = n_samples // 2
+    uniform = rng.uniform(low, high, size=(n_uniform, len(low)))
+
+    rows = get_dataset().drop('label', axis=1).to_numpy(dtype=float)
+    picked = rows[rng.integers(len(rows), size=n_samples - n_uniform)]
+    jittered = np.clip(picked * rng.uniform(0.9, 1.1, size=picked.shape), low, high)
+    return np.vstack([uniform, jittered])
+
+
+class CentroidModel:
+    """
+    Nearest-centroid table: one mean input per label, in slider-range units.
+
+    predict_proba() is a softmax over negative squared distances, so it
+    needs a single (n_classes, 7) matrix product per call.
+    """
+
+    def __init__(self, centroids, classes, temperature=CENTROID_TEMPERATURE):
+        self.centroids = centroids
+        self.classes_ = classes
+        self.temperature = float(temperature)
+
+    @classmethod
+    def fit(cls, X, y, n_classes, temperature=CENTROID_TEMPERATURE):
+        scaled = _scale(X)
+        centroids = np.full((n_classes, X.shape[1]), np.inf, dtype=np.float32)
+        for label in np.unique(y):
+            centroids[label] = scaled[y == label].mean(axis=0)
+        return cls(centroids, np.arange(n_classes), temperature)
+
+    @property
+    def nbytes(self):
+        return self.centroids.nbytes + self.classes_.nbytes
+
+    def predict_proba(self, X):
+        distances = ((_scale(X)[:, None, :] - self.centroids[None, :, :]) ** 2).sum(axis=2)
+        # Labels the teacher never predicted have infinite distance and get 0
+        logits = -(distances - distances.min(axis=1, keepdims=True)) / self.temperature
+        weights = np.exp(logits)
+        return weights / weights.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, path):
+        save_npz(path, centroids=self.centroids, classes=self.classes_,
+                  temperature=np.asarray(self.temperature))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['centroids'], data['classes'], data['temperature'])
+
+
+def _scale(X):
+    low, high = FEATURE_RANGES[:, 0], FEATURE_RANGES[:, 1]
+    return ((np.asarray(X, dtype=np.float32) - low) / (high - low)).astype(np.float32)
+
+
+def distil(teacher, kind='tree', n_samples=DISTILL_SAMPLES, seed=0):
+    """
+    Train a small student model on the teacher's predictions.
+
+    Args:
+        teacher: Full model with predict() returning encoded labels
+            (a CompactForest or the scikit-learn forest)
+        kind: "forest" (a few shallow trees), "tree" (one shallow tree) or
+            "centroid" (nearest-centroid table)
+        n_samples: Number of teacher-labelled samples
+        seed: Sampling seed
+
+    Returns:
+        CompactForest or CentroidModel: Student with the teacher's classes_
+    """
+    if kind not in LITE_KINDS:
+        raise ValueError(f"Unknown lite model kind '{kind}'. Available: {', '.join(LITE_KINDS)}")
+
+    # scikit-learn is only needed to train the student, not to use it
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    with compute_slot('batch') as threads:
+        X = distillation_samples(n_samples, seed)
+        y = np.asarray(teacher.predict(X), dtype=np.int64)
+        n_classes = len(teacher.classes_)
+
+        if kind == 'centroid':
+            return CentroidModel.fit(X, y, n_classes)
+
+        if kind == 'tree':
+            student = DecisionTreeClassifier(max_depth=STUDENT_DEPTH, random_state=seed)
+        else:
+            student = RandomForestClassifier(n_estimators=STUDENT_TREES, max_depth=STUDENT_DEPTH,
+                                             random_state=seed, n_jobs=threads)
+        student.fit(X, y)
+    return CompactForest.from_sklearn(student, n_classes=n_classes)
+
+
+def load_student(path, kind):
+    """Load a student written by its save() method."""
+    if kind == 'centroid':
+        return CentroidModel.load(path)
+    forest, _ = CompactForest.load(path)
+    return forest
@@ -0,0 +1,96 @@
+import io
+from datetime import datetime
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfgen import canvas
+from report_content import (ADDITIONAL_TIPS, field_condition_rows, crop_detail_lines,
+                            explanation_rows, explanation_text, nutrient_rows, summary_text)
+
+# Page geometry in points
+MARGIN = 50
+LINE_HEIGHT = 13
+BODY_FONT = ('Helvetica', 10)
+HEADING_FONT = ('Helvetica-Bold', 12)
+
+
+class _TextWriter:
+    """Writes wrapped lines top-down onto a canvas, adding pages as needed."""
+
+    def __init__(self, pdf):
+        self.pdf = pdf
+        self.width, self.height = letter
+        self.y = self.height - MARGIN
+
+    def line(self, text, font=BODY_FONT, indent=0):
+        max_width = self.width - 2 * MARGIN - indent
+        for chunk in simpleSplit(text, font[0], font[1], max_width) or ['']:
+            if self.y < MARGIN:
+                self.pdf.showPage()
+                self.y = self.height - MARGIN
+            self.pdf.setFont(*font)
+            self.pdf.drawString(MARGIN + indent, self.y, chunk)
+            self.y -= LINE_HEIGHT
+
+    def heading(self, text):
+        self.y -= LINE_HEIGHT / 2
+        self.line(text, HEADING_FONT)
+
+    def rows(self, rows):
+        # Tables are flattened to aligned text columns; no grid is drawn
+        for row in rows:
+            self.line("    ".join(str(cell) for cell in row), indent=10)
+
+
+def render_pdf_bytes(field_conditions, top_crops, top_probs, fertilizer_recs,
+                     soil_analysis, optimal_levels, crop_info, include_charts=False,
+                     compact=False, explanations=None):
+    """
+    Generate a text-only PDF report directly on a ReportLab canvas.
+
+    This skips the Platypus layout engine, tables and charts, trading
+    presentation for render speed in bulk runs. include_charts and compact are
+    accepted for interface compatibility and ignored (page streams are
+    always compressed). explanations (explain_crop() results) add a table of
+    what drove each crop's confidence.
+
+    Returns:
+        bytes: PDF file as bytes
+    """
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    writer = _TextWriter(pdf)
+
+    writer.line("Crop & Fertilizer Recommendation Report", ('Helvetica-Bold', 14))
+    writer.line(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    writer.heading("Field Conditions")
+    writer.rows(field_condition_rows(field_conditions)[1:])
+
+    writer.heading("Recommended Crops")
+    for i, (crop, prob) in enumerate(zip(top_crops, top_probs)):
+        writer.line(f"{i+1}. {crop} (Confidence: {prob:.1f}%)", ('Helvetica-Bold', 10))
+        for label, text in crop_detail_lines(crop, crop_info):
+            writer.line(f"{label}: {text}".rstrip(), indent=10)
+
+    if explanations:
+        writer.heading("Why These Crops?")
+        writer.line(explanation_text(explanations))
+        writer.rows(explanation_rows(explanations))
+
+    writer.heading("Fertilizer Recommendations")
+    for i, rec in enumerate(fertilizer_recs):
+        writer.line(f"{i+1}. {rec['fertilizer']}", ('Helvetica-Bold', 10))
+        writer.line(f"Rationale: {rec['rationale']}", indent=10)
+
+    writer.heading("Soil Nutrient Analysis")
+    writer.rows(nutrient_rows(soil_analysis, optimal_levels))
+
+    writer.heading("Summary and Recommendations")
+    writer.line(summary_text(top_crops, top_probs, fertilizer_recs))
+
+    writer.heading("Additional Tips:")
+    for tip in ADDITIONAL_TIPS:
+        writer.line(f"- {tip}", indent=10)
+
+    pdf.save()
+    return buffer.getvalue()
@@ -0,0 +1,35 @@
+# The model's inputs, in the order the model takes them: field_conditions
+# key, display label and the app.py slider range. Every module that needs
+# the feature order, a label or a range derives it from here.
+MODEL_INPUTS = (
+    ('n_value', "Nitrogen (N)", (0, 140)),
+    ('p_value', "Phosphorus (P)", (5, 145)),
+    ('k_value', "Potassium (K)", (5, 205)),
+    ('temperature', "Temperature (°C)", (8.0, 44.0)),
+    ('humidity', "Humidity (%)", (14.0, 100.0)),
+    ('ph_value', "pH", (3.5, 10.0)),
+    ('rainfall', "Rainfall (mm)", (20.0, 300.0)),
+)
+
+FEATURE_KEYS = tuple(key for key, _, _ in MODEL_INPUTS)
+FEATURE_LABELS = {key: label for key, label, _ in MODEL_INPUTS}
+# Integer ranges make integer sliders (N/P/K), float ranges float ones
+SLIDER_RANGES = {key: bounds for key, _, bounds in MODEL_INPUTS}
+
+
+def field_row(field_conditions):
+    """The model input for a field, as a hashable tuple in feature order."""
+    return tuple(float(field_conditions[key]) for key in FEATURE_KEYS)
+
+
+def __getattr__(name):
+    # FEATURE_RANGES, the slider ranges as an (n_features, 2) array, is built
+    # on first use: modules that only need the keys (field_history, and
+    # through it settings) must not pay for importing numpy
+    if name == 'FEATURE_RANGES':
+        import numpy as np
+
+        global FEATURE_RANGES
+        FEATURE_RANGES = np.array([SLIDER_RANGES[key] for key in FEATURE_KEYS], dtype=float)
+        return FEATURE_RANGES
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
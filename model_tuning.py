@@ -0,0 +1,378 @@
+"""
+Cross-validated tuning of the crop forest for accuracy, latency and size.
+
+Evaluates forest configurations with stratified k-fold cross-validation,
+fitting the folds in parallel worker processes, and narrows the search
+space with successive halving: every configuration is first scored on a
+small stratified share of each fold's training rows, and only the best
+1/HALVING_FACTOR move on to the next round with HALVING_FACTOR times the
+rows, until the survivors are scored on full folds.
+
+Configurations are ranked by a combined objective on the compact forest
+the app actually serves (see compact_forest.py):
+
+    accuracy - latency_weight * single-row latency (ms) - size_weight * size (KiB)
+
+Fitted folds are cached as compact models under TUNING_DIR, keyed by the
+configuration, the fold's training rows and a fingerprint of the dataset, so
+repeating a search (e.g. with other objective weights) only re-scores
+them. Prints a report and the recommended configuration.
+
+Usage:
+    python model_tuning.py [--folds 5] [--candidates 0] [--latency-weight 0.01]
+                           [--size-weight 0.00002] [--output report.json] [--no-cache]
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import os
+import time
+import warnings
+
+import numpy as np
+
+from compact_forest import CompactForest
+from compute_scheduler import compute_slot
+from crop_recommendation_model import COMPACT_MAX_DEPTH, COMPACT_TOP_K, MODEL_DIR
+
+# Hyperparameters searched (None means no limit / all features)
+SEARCH_SPACE = {
+    'n_estimators': [25, 50, 100, 200],
+    'max_depth': [None, 12, 8, 6],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': ['sqrt', 'log2', None],
+}
+
+# The configuration the app serves (build_compact_model), always reported for reference
+BASELINE_CONFIG = {'n_estimators': 100, 'max_depth': COMPACT_MAX_DEPTH, 'min_samples_leaf': 1,
+                   'max_features': 'sqrt'}
+
+CV_FOLDS = 5
+
+# Successive halving: keep 1/factor of the candidates per round while
+# multiplying the share of training rows by factor, starting from
+# MIN_ROW_SHARE (three rounds: 1/9, 1/3, all rows)
+HALVING_FACTOR = 3
+MIN_ROW_SHARE = 1 / 9
+
+# Objective weights: one accuracy point (0.01) is worth 1 ms of single-row
+# latency or 500 KiB of model memory
+LATENCY_WEIGHT = 0.01
+SIZE_WEIGHT = 0.00002
+
+# Timed single-row predictions per fitted fold; the fastest is used, which
+# keeps scheduling noise out of the ranking
+LATENCY_RUNS = 50
+
+# Candidates always kept for the last round, so the report has a ranking
+MIN_FINALISTS = 3
+
+TUNING_DIR = os.path.join(MODEL_DIR, "tuning")
+
+
+def load_dataset():
+    """
+    Features and encoded labels of the crop dataset.
+
+    Returns:
+        tuple: (X float array, y int array)
+    """
+    from crop_data import get_dataset
+
+    df = get_dataset()
+    X = df.drop('label', axis=1).to_numpy(dtype=float)
+    y = df['label'].astype('category').cat.codes.to_numpy().astype(np.int64)
+    return X, y
+
+
+def dataset_fingerprint(X, y):
+    """Short hash of the data, so cached folds are not reused after it changes."""
+    digest = hashlib.sha1(np.ascontiguousarray(X).tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def stratified_folds(y, n_folds=CV_FOLDS, seed=0):
+    """
+    Stratified k-fold split.
+
+    Returns:
+        list: (train indices, test indices) per fold
+    """
+    from sklearn.model_selection import StratifiedKFold
+
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    return list(splitter.split(np.zeros(len(y)), y))
+
+
+def stratified_share(indices, y, share, seed=0):
+    """The given share of indices, taken per class so every class keeps some rows."""
+    if share >= 1:
+        return indices
+    rng = np.random.default_rng(seed)
+    picked = []
+    for label in np.unique(y[indices]):
+        members = indices[y[indices] == label]
+        count = max(2, math.ceil(share * len(members)))
+        picked.append(rng.choice(members, size=min(count, len(members)), replace=False))
+    return np.sort(np.concatenate(picked))
+
+
+def candidate_configs(space=None, n_candidates=None, seed=0):
+    """
+    Configurations to search: the full grid, or a random sample of it.
+
+    Returns:
+        list: Configuration dicts
+    """
+    space = space or SEARCH_SPACE
+    names = sorted(space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+    if n_candidates and n_candidates < len(grid):
+        rng = np.random.default_rng(seed)
+        grid = [grid[i] for i in sorted(rng.choice(len(grid), size=n_candidates, replace=False))]
+    return grid
+
+
+def config_label(config):
+    return ", ".join(f"{name}={config[name]}" for name in sorted(config))
+
+
+def _cache_path(cache_dir, config, train, fingerprint, seed):
+    # Keyed by the exact training rows, so a fold from another split
+    # (fold count, seed, row share) is never reused for this one
+    rows = hashlib.sha1(np.ascontiguousarray(train, dtype=np.int64).tobytes()).hexdigest()
+    key = json.dumps([config, rows, fingerprint, seed, COMPACT_TOP_K], sort_keys=True)
+    return os.path.join(cache_dir, f"{hashlib.sha1(key.encode()).hexdigest()[:20]}.npz")
+
+
+def _fit_fold(config, X_train, y_train, n_classes, seed):
+    """
+    Fit one fold and convert it to the served compact format.
+
+    Runs in a worker process, so each fit uses a single thread.
+
+    Returns:
+        tuple: (CompactForest arrays, fit seconds)
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    start = time.perf_counter()
+    model = RandomForestClassifier(random_state=seed, n_jobs=1, **config).fit(X_train, y_train)
+    fit_s = time.perf_counter() - start
+    forest = CompactForest.from_sklearn(model, top_k=COMPACT_TOP_K, n_classes=n_classes)
+    return forest.to_arrays(), fit_s
+
+
+def _score_fold(forest, X_test, y_test):
+    """Accuracy, single-row latency and size of one fitted fold."""
+    row = X_test[:1]
+    timings = []
+    for _ in range(LATENCY_RUNS):
+        start = time.perf_counter()
+        forest.predict_proba(row)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'accuracy': float(np.mean(forest.predict(X_test) == y_test)),
+        'latency_ms': min(timings),
+        'size_kib': forest.nbytes / 1024,
+    }
+
+
+def objective(metrics, latency_weight=LATENCY_WEIGHT, size_weight=SIZE_WEIGHT):
+    """Combined score; higher is better."""
+    return metrics['accuracy'] - latency_weight * metrics['latency_ms'] - size_weight * metrics['size_kib']
+
+
+def cross_validate(configs, X, y, folds, share=1.0, seed=0, cache_dir=TUNING_DIR,
+                   latency_weight=LATENCY_WEIGHT, size_weight=SIZE_WEIGHT):
+    """
+    Score configurations with k-fold cross-validation.
+
+    Folds missing from the cache are fitted in parallel, with as many
+    worker processes as the compute scheduler grants to batch work.
+
+    Args:
+        configs: Configuration dicts
+        X, y: Dataset
+        folds: Output of stratified_folds()
+        share: Share of each fold's training rows to fit on
+        seed: Random seed for the row share and the forests
+        cache_dir: Directory of cached fitted folds, or None to disable caching
+        latency_weight, size_weight: Objective weights
+
+    Returns:
+        list: One dict per configuration with its mean metrics, objective,
+            fit time and the number of folds fitted (not cached)
+    """
+    fingerprint = dataset_fingerprint(X, y)
+    n_classes = int(y.max()) + 1
+    jobs = {}
+    forests = {}
+    for c, config in enumerate(configs):
+        for f, (train, _) in enumerate(folds):
+            train = stratified_share(train, y, share, seed + f)
+            path = _cache_path(cache_dir, config, train, fingerprint, seed) if cache_dir else None
+            if path and os.path.exists(path):
+                forests[c, f] = (CompactForest.load(path)[0], None)
+            else:
+                jobs[c, f] = (path, (config, X[train], y[train], n_classes, seed))
+
+    if jobs:
+        with compute_slot('batch') as threads:
+            if threads > 1 and len(jobs) > 1:
+                from concurrent.futures import ProcessPoolExecutor
+
+                with ProcessPoolExecutor(max_workers=min(threads, len(jobs))) as pool:
+                    futures = {key: pool.submit(_fit_fold, *args) for key, (_, args) in jobs.items()}
+                    fitted = {key: future.result() for key, future in futures.items()}
+            else:
+                fitted = {key: _fit_fold(*args) for key, (_, args) in jobs.items()}
+        for key, (arrays, fit_s) in fitted.items():
+            forest = CompactForest.from_arrays(arrays)
+            if jobs[key][0]:
+                forest.save(jobs[key][0])
+            forests[key] = (forest, fit_s)
+
+    results = []
+    for c, config in enumerate(configs):
+        scores = [_score_fold(forests[c, f][0], X[test], y[test]) for f, (_, test) in enumerate(folds)]
+        metrics = {name: float(np.mean([score[name] for score in scores])) for name in scores[0]}
+        fit_times = [forests[c, f][1] for f in range(len(folds)) if forests[c, f][1] is not None]
+        results.append({
+            'config': config,
+            **metrics,
+            'accuracy_std': float(np.std([score['accuracy'] for score in scores])),
+            'objective': objective(metrics, latency_weight, size_weight),
+            'fit_s': float(np.mean(fit_times)) if fit_times else None,
+            'fitted_folds': len(fit_times),
+        })
+    return results
+
+
+def successive_halving(configs=None, n_folds=CV_FOLDS, factor=HALVING_FACTOR, min_share=MIN_ROW_SHARE,
+                       seed=0, cache_dir=TUNING_DIR, latency_weight=LATENCY_WEIGHT,
+                       size_weight=SIZE_WEIGHT, progress=None, reference=None):
+    """
+    Search configurations with successive halving over the share of training rows.
+
+    Args:
+        configs: Candidate configurations; defaults to the SEARCH_SPACE grid
+        n_folds: Cross-validation folds
+        factor: Candidates kept per round are 1/factor; the row share grows by factor
+        min_share: Row share of the first round
+        seed: Random seed for the folds, row shares and forests
+        cache_dir: Directory of cached fitted folds, or None to disable caching
+        latency_weight, size_weight: Objective weights
+        progress: Optional function called with a message after each round
+        reference: Optional configuration scored in the last round alongside
+            the finalists (in the same pass, so latencies are comparable)
+
+    Returns:
+        list: One list of cross_validate() results per round, best first
+    """
+    X, y = load_dataset()
+    folds = stratified_folds(y, n_folds, seed)
+    candidates = list(configs or candidate_configs())
+    rounds = []
+    share = min_share
+    while True:
+        start = time.perf_counter()
+        results = cross_validate(candidates, X, y, folds, min(share, 1.0), seed, cache_dir,
+                                 latency_weight, size_weight)
+        results.sort(key=lambda result: result['objective'], reverse=True)
+        rounds.append(results)
+        if progress:
+            fitted = sum(result['fitted_folds'] for result in results)
+            progress(f"Round {len(rounds)}: {len(candidates)} candidates on {min(share, 1.0):.0%} of the rows, "
+                     f"{fitted} folds fitted, {len(candidates) * n_folds - fitted} cached "
+                     f"({time.perf_counter() - start:.1f}s)")
+        if share >= 1:
+            return rounds
+        keep = max(min(MIN_FINALISTS, len(results)), len(results) // factor)
+        candidates = [result['config'] for result in results[:keep]]
+        share = share * factor if share * factor < 0.999 else 1.0
+        if share >= 1 and reference is not None and reference not in candidates:
+            candidates.append(reference)
+
+
+def tune(n_folds=CV_FOLDS, n_candidates=None, seed=0, cache_dir=TUNING_DIR,
+         latency_weight=LATENCY_WEIGHT, size_weight=SIZE_WEIGHT, progress=None):
+    """
+    Run the search, scoring the baseline configuration with the finalists.
+
+    Returns:
+        dict: 'recommended' configuration, its 'result', the 'baseline'
+            result, the final-round 'ranking', per-round 'rounds' summaries
+            and the 'weights' used
+    """
+    configs = candidate_configs(n_candidates=n_candidates, seed=seed)
+    rounds = successive_halving(configs, n_folds, seed=seed, cache_dir=cache_dir,
+                                latency_weight=latency_weight, size_weight=size_weight,
+                                progress=progress, reference=BASELINE_CONFIG)
+    ranking = rounds[-1]
+    baseline = next(result for result in ranking if result['config'] == BASELINE_CONFIG)
+    return {
+        'recommended': ranking[0]['config'],
+        'result': ranking[0],
+        'baseline': baseline,
+        'ranking': ranking,
+        'rounds': [{'candidates': len(results), 'best': results[0]['config'],
+                    'best_objective': results[0]['objective']} for results in rounds],
+        'weights': {'latency_ms': latency_weight, 'size_kib': size_weight},
+    }
+
+
+def format_report(report):
+    """Plain-text report of a tune() run."""
+    lines = [f"{'objective':>9} {'accuracy':>8} {'±':>6} {'1-row ms':>8} {'KiB':>8} {'fit s':>6}  configuration"]
+
+    def line(result, note=""):
+        fit = f"{result['fit_s']:>6.2f}" if result['fit_s'] is not None else f"{'cached':>6}"
+        return (f"{result['objective']:>9.4f} {result['accuracy']:>8.4f} {result['accuracy_std']:>6.4f} "
+                f"{result['latency_ms']:>8.3f} {result['size_kib']:>8.1f} {fit}  {config_label(result['config'])}{note}")
+
+    for result in report['ranking']:
+        notes = [note for note, shown in (("recommended", report['result']), ("baseline", report['baseline']))
+                 if result is shown]
+        lines.append(line(result, f"  <- {', '.join(notes)}" if notes else ""))
+
+    best, baseline = report['result'], report['baseline']
+    lines.append("")
+    lines.append(f"Recommended: {config_label(report['recommended'])}")
+    lines.append(f"  accuracy {best['accuracy']:.4f} vs {baseline['accuracy']:.4f} for the baseline, "
+                 f"{best['latency_ms'] / baseline['latency_ms']:.2f}x its latency and "
+                 f"{best['size_kib'] / baseline['size_kib']:.2f}x its size "
+                 f"(compact forest, top-{COMPACT_TOP_K} leaves)")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--folds", type=int, default=CV_FOLDS)
+    parser.add_argument("--candidates", type=int, default=0,
+                        help="Random sample of the grid to search (0 = full grid)")
+    parser.add_argument("--latency-weight", type=float, default=LATENCY_WEIGHT,
+                        help="Objective penalty per ms of single-row latency")
+    parser.add_argument("--size-weight", type=float, default=SIZE_WEIGHT,
+                        help="Objective penalty per KiB of model memory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    parser.add_argument("--no-cache", action="store_true", help="Refit every fold")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", category=UserWarning)
+    report = tune(args.folds, args.candidates or None, args.seed, None if args.no_cache else TUNING_DIR,
+                  args.latency_weight, args.size_weight, progress=print)
+    print()
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
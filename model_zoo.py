@@ -0,0 +1,100 @@
+# Estimators train_model() can fit, by name. An estimator spec is either a
+# name from ESTIMATORS, or a dict with a "name" key and keyword arguments
+# overriding that estimator's defaults:
+#
+#     train_model(estimator="extra_trees")
+#     train_model(estimator={"name": "knn", "n_neighbors": 9})
+#
+# scikit-learn is imported when an estimator is built, not with this module.
+# See benchmark_model_zoo.py for how the candidates compare.
+
+DEFAULT_ESTIMATOR = "random_forest"
+
+# Seed shared by every estimator, so repeated fits give the same model
+RANDOM_STATE = 42
+
+
+def _random_forest(n_jobs, n_estimators=100, **params):
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(n_estimators=n_estimators, random_state=RANDOM_STATE,
+                                  n_jobs=n_jobs, **params)
+
+
+def _extra_trees(n_jobs, n_estimators=100, **params):
+    from sklearn.ensemble import ExtraTreesClassifier
+    return ExtraTreesClassifier(n_estimators=n_estimators, random_state=RANDOM_STATE,
+                                n_jobs=n_jobs, **params)
+
+
+def _hist_gradient_boosting(n_jobs, **params):
+    # Uses OpenMP threads rather than n_jobs; train_model() limits them
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    return HistGradientBoostingClassifier(random_state=RANDOM_STATE, **params)
+
+
+def _knn(n_jobs, n_neighbors=5, weights='distance', **params):
+    # Distances need features on one scale: rainfall spans hundreds of mm, pH a few units
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+    return make_pipeline(StandardScaler(),
+                         KNeighborsClassifier(n_neighbors=n_neighbors, weights=weights,
+                                              n_jobs=n_jobs, **params))
+
+
+def _logistic(n_jobs, C=10.0, max_iter=2000, **params):
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+    return make_pipeline(StandardScaler(), LogisticRegression(C=C, max_iter=max_iter, **params))
+
+
+# name -> function(n_jobs, **params) returning an unfitted estimator
+ESTIMATORS = {
+    "random_forest": _random_forest,
+    "extra_trees": _extra_trees,
+    "hist_gradient_boosting": _hist_gradient_boosting,
+    "knn": _knn,
+    "logistic": _logistic,
+}
+
+# Estimators made of decision trees, which CompactForest.from_sklearn() can convert
+TREE_ENSEMBLES = ("random_forest", "extra_trees")
+
+
+def parse_spec(spec=None):
+    """
+    Split an estimator spec into its name and parameters.
+
+    Args:
+        spec: Estimator name, dict with a "name" key and parameters, or None
+            for DEFAULT_ESTIMATOR
+
+    Returns:
+        tuple: (name, params dict)
+    """
+    if spec is None:
+        return DEFAULT_ESTIMATOR, {}
+    if isinstance(spec, str):
+        name, params = spec, {}
+    else:
+        params = dict(spec)
+        name = params.pop("name", DEFAULT_ESTIMATOR)
+    if name not in ESTIMATORS:
+        raise ValueError(f"Unknown estimator '{name}'. Available: {', '.join(ESTIMATORS)}")
+    return name, params
+
+
+def build_estimator(spec=None, n_jobs=1):
+    """
+    Create an unfitted estimator from a spec.
+
+    Args:
+        spec: See parse_spec()
+        n_jobs: Threads the estimator may use, for those that take n_jobs
+
+    Returns:
+        An unfitted scikit-learn classifier
+    """
+    name, params = parse_spec(spec)
+    return ESTIMATORS[name](n_jobs, **params)
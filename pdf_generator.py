@@ -1,13 +1,12 @@
 import io
+import os
 import base64
+import tempfile
 from fpdf import FPDF
-import matplotlib.pyplot as plt
-import numpy as np
-from PIL import Image
-import streamlit as st
-import plotly.express as px
-import pandas as pd
 from datetime import datetime
+from report_charts import confidence_chart_png, nutrient_chart_png, condition_radar_png
+from report_content import (ADDITIONAL_TIPS, field_condition_rows, crop_detail_lines,
+                            explanation_rows, explanation_text, nutrient_rows, summary_text)
 
 class ReportPDF(FPDF):
     def header(self):
@@ -38,10 +37,20 @@ class ReportPDF(FPDF):
         # Add page number
         self.cell(0, 10, f'Page {self.page_no()}/{{nb}}', 0, 0, 'C')
 
-def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs, 
-                      soil_analysis, optimal_levels, crop_info):
+def _add_chart(pdf, png_bytes, width):
+    """Embed PNG bytes at the current position (fpdf only reads images from disk)."""
+    with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
+        tmp.write(png_bytes)
+    try:
+        pdf.image(tmp.name, x=(pdf.w - width) / 2, w=width)
+    finally:
+        os.remove(tmp.name)
+
+def render_pdf_bytes(field_conditions, top_crops, top_probs, fertilizer_recs,
+                     soil_analysis, optimal_levels, crop_info, include_charts=True,
+                     compact=False, explanations=None):
     """
-    Generate a PDF report with the crop and fertilizer recommendations.
+    Generate a PDF report with the crop and fertilizer recommendations using fpdf.
     
     Args:
         field_conditions: Dictionary with field input values
@@ -51,9 +60,13 @@ def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs,
         soil_analysis: Dictionary with soil nutrient analysis
         optimal_levels: Dictionary with optimal nutrient levels
         crop_info: Dictionary with crop information
+        include_charts: Embed the confidence, field condition and nutrient charts
+        compact: Embed low-resolution palette charts
+        explanations: Optional explain_crop() results; adds a table of what
+            drove each crop's confidence
         
     Returns:
-        base64 encoded PDF for download
+        bytes: PDF file as bytes
     """
     # Create PDF object
     pdf = ReportPDF()
@@ -70,17 +83,7 @@ def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs,
     pdf.set_font('Arial', '', 11)
     
     # Format the field conditions as a table
-    field_data = [
-        ['Parameter', 'Value'],
-        ['Soil Type', field_conditions['soil_type']],
-        ['Nitrogen (N)', f"{field_conditions['n_value']} kg/ha"],
-        ['Phosphorus (P)', f"{field_conditions['p_value']} kg/ha"],
-        ['Potassium (K)', f"{field_conditions['k_value']} kg/ha"],
-        ['Temperature', f"{field_conditions['temperature']}°C"],
-        ['Humidity', f"{field_conditions['humidity']}%"],
-        ['pH Value', f"{field_conditions['ph_value']}"],
-        ['Rainfall', f"{field_conditions['rainfall']} mm"]
-    ]
+    field_data = field_condition_rows(field_conditions)
     
     # Column widths for the field conditions table
     col_width = pdf.w / 2 - 15
@@ -97,6 +100,10 @@ def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs,
     
     pdf.ln(5)
     
+    if include_charts:
+        _add_chart(pdf, condition_radar_png(field_conditions, compact=compact), 75)
+        pdf.ln(5)
+    
     # Crop Recommendations Section
     pdf.set_font('Arial', 'B', 12)
     pdf.cell(0, 10, 'Recommended Crops', 0, 1, 'L')
@@ -108,19 +115,35 @@ def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs,
         pdf.cell(0, 8, f"{i+1}. {crop} (Confidence: {prob:.1f}%)", 0, 1, 'L')
         pdf.set_font('Arial', '', 11)
         
-        if crop in crop_info:
-            info = crop_info[crop]
-            pdf.cell(0, 8, f"Description: {info['description']}", 0, 1, 'L')
-            pdf.cell(0, 8, f"Growing Season: {info['growing_season']}", 0, 1, 'L')
-            pdf.cell(0, 8, "Ideal Conditions:", 0, 1, 'L')
-            pdf.cell(0, 8, f"- Temperature: {info['ideal_temp']}", 0, 1, 'L')
-            pdf.cell(0, 8, f"- Soil pH: {info['ideal_ph']}", 0, 1, 'L')
-            pdf.cell(0, 8, f"- Water Needs: {info['water_needs']}", 0, 1, 'L')
+        for label, text in crop_detail_lines(crop, crop_info):
+            pdf.cell(0, 8, f"{label}: {text}".rstrip(), 0, 1, 'L')
         
         pdf.ln(3)
     
+    if include_charts and top_crops:
+        _add_chart(pdf, confidence_chart_png(top_crops, top_probs, compact=compact), 110)
+    
     pdf.ln(5)
     
+    # What drove the recommendation
+    if explanations:
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(0, 10, 'Why These Crops?', 0, 1, 'L')
+        pdf.set_font('Arial', '', 11)
+        pdf.multi_cell(0, 8, explanation_text(explanations), 0, 'L')
+        
+        # First column for the condition, the rest split between the crops
+        label_width = 50
+        crop_width = (pdf.w - 20 - label_width) / len(explanations)
+        for i, row in enumerate(explanation_rows(explanations)):
+            pdf.set_font('Arial', 'B' if i == 0 else '', 11)
+            pdf.cell(label_width, 8, row[0], 1, 0, 'L')
+            for cell in row[1:]:
+                pdf.cell(crop_width, 8, cell, 1, 0, 'R')
+            pdf.ln()
+        
+        pdf.ln(5)
+    
     # Fertilizer Recommendations Section
     pdf.set_font('Arial', 'B', 12)
     pdf.cell(0, 10, 'Fertilizer Recommendations', 0, 1, 'L')
@@ -141,15 +164,7 @@ def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs,
     pdf.set_font('Arial', '', 11)
     
     # Create a table for soil nutrient analysis
-    nutrient_table = [
-        ['Nutrient', 'Current Level', 'Optimal Level', 'Status'],
-        ['Nitrogen (N)', f"{soil_analysis['n_value']} kg/ha", f"{optimal_levels['N']} kg/ha", 
-         'Deficient' if soil_analysis['n_value'] < optimal_levels['N'] else 'Adequate'],
-        ['Phosphorus (P)', f"{soil_analysis['p_value']} kg/ha", f"{optimal_levels['P']} kg/ha",
-         'Deficient' if soil_analysis['p_value'] < optimal_levels['P'] else 'Adequate'],
-        ['Potassium (K)', f"{soil_analysis['k_value']} kg/ha", f"{optimal_levels['K']} kg/ha",
-         'Deficient' if soil_analysis['k_value'] < optimal_levels['K'] else 'Adequate']
-    ]
+    nutrient_table = nutrient_rows(soil_analysis, optimal_levels)
     
     # Column widths for the nutrient analysis table
     col_width = pdf.w / 4 - 8
@@ -176,24 +191,17 @@ def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs,
     
     pdf.ln(5)
     
+    if include_charts and top_crops:
+        _add_chart(pdf, nutrient_chart_png(soil_analysis, optimal_levels, top_crops[0], compact=compact), 110)
+        pdf.ln(5)
+    
     # Summary Section
     pdf.set_font('Arial', 'B', 12)
     pdf.cell(0, 10, 'Summary and Recommendations', 0, 1, 'L')
     pdf.set_font('Arial', '', 11)
     
-    # Most recommended crop
-    top_crop = top_crops[0] if top_crops else "None"
-    top_prob = top_probs[0] if top_probs else 0
-    
-    summary_text = f"Based on your field conditions, we recommend {top_crop} as the optimal crop "
-    summary_text += f"with a confidence of {top_prob:.1f}%. "
-    
-    # Add fertilizer summary
-    if fertilizer_recs:
-        summary_text += f"To optimize growth, we recommend using {fertilizer_recs[0]['fertilizer']} "
-        summary_text += f"as the primary fertilizer. {fertilizer_recs[0]['rationale']}"
-    
-    pdf.multi_cell(0, 8, summary_text, 0, 'L')
+    # Most recommended crop and primary fertilizer
+    pdf.multi_cell(0, 8, summary_text(top_crops, top_probs, fertilizer_recs), 0, 'L')
     
     pdf.ln(5)
     
@@ -201,10 +209,9 @@ def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs,
     pdf.set_font('Arial', 'B', 11)
     pdf.cell(0, 8, "Additional Tips:", 0, 1, 'L')
     pdf.set_font('Arial', '', 11)
-    pdf.multi_cell(0, 8, "• Consider soil testing regularly to monitor nutrient levels.", 0, 'L')
-    pdf.multi_cell(0, 8, "• Apply fertilizers according to recommended rates and timing.", 0, 'L')
-    pdf.multi_cell(0, 8, "• Monitor water requirements throughout the growing season.", 0, 'L')
-    pdf.multi_cell(0, 8, "• Rotate crops to maintain soil health and prevent pest buildup.", 0, 'L')
+    # Core fpdf fonts are latin-1 only, so use a plain dash instead of a bullet
+    for tip in ADDITIONAL_TIPS:
+        pdf.multi_cell(0, 8, f"- {tip}", 0, 'L')
     
     # Save the PDF to a bytes buffer
     pdf_output = io.BytesIO()
@@ -218,12 +225,22 @@ def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs,
     
     # Write to BytesIO
     pdf_output.write(pdf_data)
-    pdf_output.seek(0)
     
-    # Encode PDF to base64 for download
-    b64_pdf = base64.b64encode(pdf_output.read()).decode('utf-8')
+    return pdf_output.getvalue()
+
+def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs, 
+                      soil_analysis, optimal_levels, crop_info, include_charts=True):
+    """
+    Generate a PDF report with the crop and fertilizer recommendations.
+    
+    Returns:
+        base64 encoded PDF for download
+    """
+    pdf_bytes = render_pdf_bytes(field_conditions, top_crops, top_probs, fertilizer_recs,
+                                 soil_analysis, optimal_levels, crop_info, include_charts)
     
-    return b64_pdf
+    # Encode PDF to base64 for download
+    return base64.b64encode(pdf_bytes).decode('utf-8')
 
 def get_download_link(b64_pdf, filename="crop_fertilizer_report.pdf"):
     """
@@ -0,0 +1,164 @@
+import io
+from functools import lru_cache
+
+import matplotlib
+import numpy as np
+from matplotlib.figure import Figure
+
+from report_content import RADAR_CATEGORIES, radar_values
+
+# Maximum number of rendered charts kept in memory per chart type
+CHART_CACHE_SIZE = 128
+
+# Default raster resolution; low enough to keep the PDF small but sharp on print
+CHART_DPI = 110
+
+# Compact mode: lower resolution and a small flat-color palette
+COMPACT_CHART_DPI = 80
+COMPACT_PALETTE_COLORS = 64
+
+
+def _figure_to_png(fig, dpi, compact=False):
+    """Render a matplotlib figure to PNG bytes."""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight",
+                facecolor="white" if compact else fig.get_facecolor())
+    if not compact:
+        return buffer.getvalue()
+
+    # Charts are flat-colored, so an opaque palette image loses almost nothing
+    from PIL import Image
+    buffer.seek(0)
+    image = Image.open(buffer).convert("RGB").quantize(COMPACT_PALETTE_COLORS)
+    compact_buffer = io.BytesIO()
+    image.save(compact_buffer, format="PNG", optimize=True)
+    return compact_buffer.getvalue()
+
+
+def _resolve_dpi(dpi, compact):
+    if dpi is not None:
+        return dpi
+    return COMPACT_CHART_DPI if compact else CHART_DPI
+
+
+# Charts are drawn on standalone Figure objects, never through pyplot: pyplot's
+# global figure manager is not thread-safe, and reports render concurrently
+# from session threads and scheduler slots. A Figure without pyplot is freed
+# by the garbage collector like any other object.
+
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def _confidence_chart(crops, probs, dpi, compact):
+    fig = Figure(figsize=(5, 2.6))
+    ax = fig.subplots()
+    colors = matplotlib.colormaps['viridis'](np.linspace(0.2, 0.9, len(crops)))
+    ax.bar(crops, probs, color=colors)
+    ax.set_ylabel("Confidence (%)")
+    ax.set_title("Top Crop Recommendations")
+    ax.set_ylim(0, 100)
+    for i, prob in enumerate(probs):
+        ax.text(i, prob + 2, f"{prob:.1f}%", ha="center", fontsize=8)
+    return _figure_to_png(fig, dpi, compact)
+
+
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def _nutrient_chart(current, optimal, crop, dpi, compact):
+    labels = ["Nitrogen (N)", "Phosphorus (P)", "Potassium (K)"]
+    x = np.arange(len(labels))
+    width = 0.38
+
+    fig = Figure(figsize=(5, 2.6))
+    ax = fig.subplots()
+    ax.bar(x - width / 2, current, width, label="Current Level", color="#1E88E5")
+    ax.bar(x + width / 2, optimal, width, label="Optimal Level", color="#FFC107")
+    ax.set_xticks(x)
+    ax.set_xticklabels(labels)
+    ax.set_ylabel("kg/ha")
+    ax.set_title(f"Soil Nutrient Levels for {crop}")
+    ax.legend(fontsize=8)
+    return _figure_to_png(fig, dpi, compact)
+
+
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def _radar_chart(values, dpi, compact):
+    angles = np.linspace(0, 2 * np.pi, len(values), endpoint=False).tolist()
+    closed_values = list(values) + [values[0]]
+    closed_angles = angles + [angles[0]]
+
+    fig = Figure(figsize=(3.6, 3.6))
+    ax = fig.subplots(subplot_kw={"polar": True})
+    ax.plot(closed_angles, closed_values, color="#4CAF50")
+    ax.fill(closed_angles, closed_values, color="#4CAF50", alpha=0.3)
+    ax.set_xticks(angles)
+    ax.set_xticklabels(RADAR_CATEGORIES, fontsize=8)
+    ax.set_yticklabels([])
+    ax.set_ylim(0, 1)
+    ax.set_title("Your Field Conditions", fontsize=10)
+    return _figure_to_png(fig, dpi, compact)
+
+
+def confidence_chart_png(top_crops, top_probs, dpi=None, compact=False):
+    """
+    Render the crop confidence bar chart as PNG bytes.
+
+    Args:
+        top_crops: List of recommended crops
+        top_probs: List of confidence scores (percent) for the crops
+        dpi: Output resolution; defaults to CHART_DPI, or COMPACT_CHART_DPI when compact
+        compact: Produce a smaller, opaque palette PNG
+
+    Returns:
+        bytes: PNG image
+    """
+    # Round the inputs so near-identical reports share a cached render
+    probs = tuple(round(float(p), 1) for p in top_probs)
+    return _confidence_chart(tuple(top_crops), probs, _resolve_dpi(dpi, compact), compact)
+
+
+def nutrient_chart_png(soil_analysis, optimal_levels, crop, dpi=None, compact=False):
+    """
+    Render the current vs optimal N/P/K comparison chart as PNG bytes.
+
+    Args:
+        soil_analysis: Dictionary with n_value, p_value and k_value
+        optimal_levels: Dictionary with optimal N, P and K levels
+        crop: Crop the optimal levels refer to
+        dpi: Output resolution; defaults to CHART_DPI, or COMPACT_CHART_DPI when compact
+        compact: Produce a smaller, opaque palette PNG
+
+    Returns:
+        bytes: PNG image
+    """
+    current = tuple(float(soil_analysis[key]) for key in ('n_value', 'p_value', 'k_value'))
+    optimal = tuple(float(optimal_levels[key]) for key in ('N', 'P', 'K'))
+    return _nutrient_chart(current, optimal, crop, _resolve_dpi(dpi, compact), compact)
+
+
+def condition_radar_png(field_conditions, dpi=None, compact=False):
+    """
+    Render the normalized field condition radar chart as PNG bytes.
+
+    Args:
+        field_conditions: Dictionary with field input values
+        dpi: Output resolution; defaults to CHART_DPI, or COMPACT_CHART_DPI when compact
+        compact: Produce a smaller, opaque palette PNG
+
+    Returns:
+        bytes: PNG image
+    """
+    return _radar_chart(radar_values(field_conditions), _resolve_dpi(dpi, compact), compact)
+
+
+def chart_cache_info():
+    """Return hit/miss statistics for each chart cache."""
+    return {
+        'confidence': _confidence_chart.cache_info(),
+        'nutrient': _nutrient_chart.cache_info(),
+        'radar': _radar_chart.cache_info(),
+    }
+
+
+def clear_chart_cache():
+    """Drop all memoized chart renders."""
+    _confidence_chart.cache_clear()
+    _nutrient_chart.cache_clear()
+    _radar_chart.cache_clear()
@@ -0,0 +1,139 @@
+# Report content shared by every PDF backend. The backends only differ in
+# layout; rows, labels and wording are assembled here so they stay identical.
+from model_inputs import field_row
+
+NUTRIENTS = [('n_value', 'N', 'Nitrogen (N)'), ('p_value', 'P', 'Phosphorus (P)'), ('k_value', 'K', 'Potassium (K)')]
+
+# Radar axes, one per model input in feature order, and the ranges used to
+# normalize them
+RADAR_CATEGORIES = ['Nitrogen', 'Phosphorus', 'Potassium', 'Temperature', 'Humidity', 'pH', 'Rainfall']
+RADAR_RANGES = [(0, 140), (0, 145), (0, 205), (8, 44), (0, 100), (3.5, 10), (0, 300)]
+
+ADDITIONAL_TIPS = [
+    "Consider soil testing regularly to monitor nutrient levels.",
+    "Apply fertilizers according to recommended rates and timing.",
+    "Monitor water requirements throughout the growing season.",
+    "Rotate crops to maintain soil health and prevent pest buildup.",
+]
+
+
+def field_condition_rows(field_conditions):
+    """
+    Build the field conditions table.
+
+    Returns:
+        list: Rows of [parameter, value], including the header row
+    """
+    return [
+        ['Parameter', 'Value'],
+        ['Soil Type', field_conditions['soil_type']],
+        ['Nitrogen (N)', f"{field_conditions['n_value']} kg/ha"],
+        ['Phosphorus (P)', f"{field_conditions['p_value']} kg/ha"],
+        ['Potassium (K)', f"{field_conditions['k_value']} kg/ha"],
+        ['Temperature', f"{field_conditions['temperature']}°C"],
+        ['Humidity', f"{field_conditions['humidity']}%"],
+        ['pH Value', f"{field_conditions['ph_value']}"],
+        ['Rainfall', f"{field_conditions['rainfall']} mm"]
+    ]
+
+
+def radar_values(field_conditions):
+    """
+    Normalize the field conditions for the radar chart.
+
+    Returns:
+        tuple: One value per RADAR_CATEGORIES axis, clamped to [0, 1] so
+            inputs outside RADAR_RANGES stay on the chart
+    """
+    return tuple(
+        round(min(1.0, max(0.0, (v - lo) / (hi - lo))), 3)
+        for v, (lo, hi) in zip(field_row(field_conditions), RADAR_RANGES)
+    )
+
+
+def crop_detail_lines(crop, crop_info):
+    """
+    Build the (label, text) detail lines shown under a recommended crop.
+
+    Returns:
+        list: Empty if the crop has no entry in crop_info
+    """
+    if crop not in crop_info:
+        return []
+    info = crop_info[crop]
+    return [
+        ('Description', info['description']),
+        ('Growing Season', info['growing_season']),
+        ('Ideal Conditions', ''),
+        ('- Temperature', info['ideal_temp']),
+        ('- Soil pH', info['ideal_ph']),
+        ('- Water Needs', info['water_needs']),
+    ]
+
+
+def nutrient_rows(soil_analysis, optimal_levels):
+    """
+    Build the soil nutrient analysis table.
+
+    Returns:
+        list: Rows of [nutrient, current, optimal, status], including the header row
+    """
+    rows = [['Nutrient', 'Current Level', 'Optimal Level', 'Status']]
+    for key, symbol, label in NUTRIENTS:
+        optimal = optimal_levels[symbol]
+        status = 'Deficient' if soil_analysis[key] < optimal else 'Adequate'
+        rows.append([label, f"{soil_analysis[key]} kg/ha", f"{optimal} kg/ha", status])
+    return rows
+
+
+def summary_text(top_crops, top_probs, fertilizer_recs, bold=lambda text: text):
+    """
+    Build the summary paragraph.
+
+    Args:
+        bold: Optional callable used to emphasise the crop and fertilizer names
+
+    Returns:
+        str: Summary text
+    """
+    top_crop = top_crops[0] if top_crops else "None"
+    top_prob = top_probs[0] if top_probs else 0
+
+    text = f"Based on your field conditions, we recommend {bold(top_crop)} as the optimal crop "
+    text += f"with a confidence of {top_prob:.1f}%. "
+
+    if fertilizer_recs:
+        text += f"To optimize growth, we recommend using {bold(fertilizer_recs[0]['fertilizer'])} "
+        text += f"as the primary fertilizer. {fertilizer_recs[0]['rationale']}"
+
+    return text
+
+
+def explanation_rows(explanations):
+    """
+    Build the table of what drove each crop's confidence.
+
+    Args:
+        explanations: explanations.explain_crop() results, one per crop
+
+    Returns:
+        list: Rows of [condition, effect on each crop], including the header
+            row; ordered by the effect on the first crop, largest first
+    """
+    rows = [['Condition'] + [explanation['crop'] for explanation in explanations]]
+    effects = [dict(explanation['contributions']) for explanation in explanations]
+    for label, _ in explanations[0]['contributions']:
+        rows.append([label] + [f"{effect[label]:+.1f} pts" for effect in effects])
+    return rows
+
+
+def explanation_text(explanations):
+    """
+    Build the sentence introducing the explanation table.
+
+    Returns:
+        str: Explanation of the table's units and baseline
+    """
+    baselines = ", ".join(f"{explanation['crop']} {explanation['base']:.1f}%" for explanation in explanations)
+    return ("Percentage points each field condition added to (+) or took from (-) a crop's "
+            f"confidence, compared with an average field ({baselines}).")
@@ -0,0 +1,153 @@
+import base64
+import os
+from abc import ABC, abstractmethod
+
+from compute_scheduler import compute_slot
+
+# Environment variable used to pick the report backend
+RENDERER_ENV_VAR = "REPORT_RENDERER"
+DEFAULT_RENDERER = "reportlab"
+
+# Environment variable enabling compact output by default ("1"/"true")
+COMPACT_ENV_VAR = "REPORT_COMPACT"
+
+
+class ReportRenderer(ABC):
+    """
+    Common interface for PDF report backends.
+
+    Subclasses set name (and supports_charts if they embed charts) and
+    implement render().
+    """
+    name = None
+    supports_charts = False
+
+    @abstractmethod
+    def render(self, **report):
+        """
+        Render a report to PDF.
+
+        Args:
+            **report: field_conditions, top_crops, top_probs, fertilizer_recs,
+                soil_analysis, optimal_levels and crop_info, plus the optional
+                include_charts, compact and explanations (see render_report)
+
+        Returns:
+            bytes: PDF file as bytes
+        """
+
+
+class ReportLabRenderer(ReportRenderer):
+    """Full layout with tables and embedded charts (reportlab_pdf)."""
+    name = "reportlab"
+    supports_charts = True
+
+    def render(self, **report):
+        from reportlab_pdf import render_pdf_bytes
+        return render_pdf_bytes(**report)
+
+
+class FPDFRenderer(ReportRenderer):
+    """Legacy fpdf layout with tables and embedded charts (pdf_generator)."""
+    name = "fpdf"
+    supports_charts = True
+
+    def render(self, **report):
+        from pdf_generator import render_pdf_bytes
+        return render_pdf_bytes(**report)
+
+
+class MinimalRenderer(ReportRenderer):
+    """Text-only canvas layout for bulk runs (minimal_pdf)."""
+    name = "minimal"
+
+    def render(self, **report):
+        from minimal_pdf import render_pdf_bytes
+        return render_pdf_bytes(**report)
+
+
+RENDERERS = {
+    renderer.name: renderer
+    for renderer in (ReportLabRenderer(), FPDFRenderer(), MinimalRenderer())
+}
+
+
+def get_renderer(name=None):
+    """
+    Look up a report renderer by name.
+
+    Args:
+        name: Backend name; defaults to the REPORT_RENDERER environment
+            variable, then to "reportlab"
+
+    Returns:
+        ReportRenderer: The selected backend
+    """
+    name = name or os.environ.get(RENDERER_ENV_VAR) or DEFAULT_RENDERER
+    if name not in RENDERERS:
+        raise ValueError(f"Unknown report renderer '{name}'. Available: {', '.join(RENDERERS)}")
+    return RENDERERS[name]
+
+
+def compact_by_default():
+    """Whether REPORT_COMPACT asks for compact output."""
+    return os.environ.get(COMPACT_ENV_VAR, "").strip().lower() in ("1", "true", "yes")
+
+
+def render_report(field_conditions, top_crops, top_probs, fertilizer_recs,
+                  soil_analysis, optimal_levels, crop_info, renderer=None, compact=None,
+                  explanations=None):
+    """
+    Generate a PDF report with the configured backend.
+
+    Args:
+        renderer: Optional backend name overriding the REPORT_RENDERER setting
+        compact: Low-resolution palette charts;
+            defaults to the REPORT_COMPACT setting
+        explanations: Optional explanations.explain_crop() results for the
+            top crops, shown as a "Why These Crops?" table
+
+    Returns:
+        bytes: PDF file as bytes
+
+    Raises:
+        SchedulerBusy: Too many reports are already waiting for CPU
+    """
+    if compact is None:
+        compact = compact_by_default()
+    with compute_slot('render'):
+        return get_renderer(renderer).render(
+            field_conditions=field_conditions,
+            top_crops=top_crops,
+            top_probs=top_probs,
+            fertilizer_recs=fertilizer_recs,
+            soil_analysis=soil_analysis,
+            optimal_levels=optimal_levels,
+            crop_info=crop_info,
+            compact=compact,
+            explanations=explanations
+        )
+
+
+def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs,
+                      soil_analysis, optimal_levels, crop_info, renderer=None,
+                      compact=None, encode_base64=True):
+    """
+    Generate a PDF report with the configured backend.
+
+    Prefer render_report() when only the raw bytes are needed; the base64
+    copy is a third larger than the PDF itself.
+
+    Args:
+        renderer: Optional backend name overriding the REPORT_RENDERER setting
+        compact: See render_report()
+        encode_base64: Set to False to skip the base64 copy
+
+    Returns:
+        tuple: (base64 encoded PDF or None, PDF file as bytes)
+    """
+    pdf_bytes = render_report(field_conditions, top_crops, top_probs, fertilizer_recs,
+                              soil_analysis, optimal_levels, crop_info,
+                              renderer=renderer, compact=compact)
+    b64_pdf = base64.b64encode(pdf_bytes).decode() if encode_base64 else None
+    return b64_pdf, pdf_bytes
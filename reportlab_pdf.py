@@ -5,13 +5,30 @@ from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
 from datetime import datetime
+from report_charts import confidence_chart_png, nutrient_chart_png, condition_radar_png
+from report_content import (ADDITIONAL_TIPS, field_condition_rows, crop_detail_lines,
+                            explanation_rows, explanation_text, nutrient_rows, summary_text)
 
-def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs, 
-                      soil_analysis, optimal_levels, crop_info):
+
+def _chart_image(png_bytes, width):
+    """Wrap PNG bytes in a flowable scaled to the given width."""
+    img_width, img_height = ImageReader(io.BytesIO(png_bytes)).getSize()
+    return Image(io.BytesIO(png_bytes), width=width, height=width * img_height / img_width)
+
+def render_pdf_bytes(field_conditions, top_crops, top_probs, fertilizer_recs,
+                     soil_analysis, optimal_levels, crop_info, include_charts=True,
+                     compact=False, explanations=None):
     """
     Generate a PDF report with crop and fertilizer recommendations using ReportLab.
     
+    When include_charts is set, the confidence, field condition and nutrient
+    charts are rasterized server-side (memoized in report_charts) and embedded.
+    compact uses low-resolution palette charts for smaller attachments
+    (page streams are always compressed). explanations (explain_crop() results)
+    add a table of what drove each crop's confidence.
+    
     Returns:
         bytes: PDF file as bytes
     """
@@ -57,17 +74,7 @@ def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs,
     story.append(Paragraph("Field Conditions", subtitle_style))
     
     # Create field conditions table
-    field_data = [
-        ['Parameter', 'Value'],
-        ['Soil Type', field_conditions['soil_type']],
-        ['Nitrogen (N)', f"{field_conditions['n_value']} kg/ha"],
-        ['Phosphorus (P)', f"{field_conditions['p_value']} kg/ha"],
-        ['Potassium (K)', f"{field_conditions['k_value']} kg/ha"],
-        ['Temperature', f"{field_conditions['temperature']}°C"],
-        ['Humidity', f"{field_conditions['humidity']}%"],
-        ['pH Value', f"{field_conditions['ph_value']}"],
-        ['Rainfall', f"{field_conditions['rainfall']} mm"]
-    ]
+    field_data = field_condition_rows(field_conditions)
     
     field_table = Table(field_data, colWidths=[2*inch, 3*inch])
     
@@ -87,25 +94,47 @@ def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs,
     story.append(field_table)
     story.append(Spacer(1, 0.2*inch))
     
+    if include_charts:
+        story.append(_chart_image(condition_radar_png(field_conditions, compact=compact), 3*inch))
+        story.append(Spacer(1, 0.2*inch))
+    
     # Crop Recommendations Section
     story.append(Paragraph("Recommended Crops", subtitle_style))
     
     for i, (crop, prob) in enumerate(zip(top_crops, top_probs)):
         story.append(Paragraph(f"{i+1}. {crop} (Confidence: {prob:.1f}%)", heading2_style))
         
-        if crop in crop_info:
-            info = crop_info[crop]
-            story.append(Paragraph(f"<b>Description:</b> {info['description']}", info_style))
-            story.append(Paragraph(f"<b>Growing Season:</b> {info['growing_season']}", info_style))
-            story.append(Paragraph(f"<b>Ideal Conditions:</b>", info_style))
-            story.append(Paragraph(f"- Temperature: {info['ideal_temp']}", info_style))
-            story.append(Paragraph(f"- Soil pH: {info['ideal_ph']}", info_style))
-            story.append(Paragraph(f"- Water Needs: {info['water_needs']}", info_style))
+        for label, text in crop_detail_lines(crop, crop_info):
+            # Bold the section labels, keep the "- ..." condition lines plain
+            if label.startswith('-'):
+                story.append(Paragraph(f"{label}: {text}", info_style))
+            else:
+                story.append(Paragraph(f"<b>{label}:</b> {text}".rstrip(), info_style))
         
         story.append(Spacer(1, 0.1*inch))
     
+    if include_charts and top_crops:
+        story.append(_chart_image(confidence_chart_png(top_crops, top_probs, compact=compact), 4.5*inch))
+    
     story.append(Spacer(1, 0.1*inch))
     
+    # What drove the recommendation
+    if explanations:
+        story.append(Paragraph("Why These Crops?", subtitle_style))
+        story.append(Paragraph(explanation_text(explanations), normal_style))
+        story.append(Spacer(1, 0.1*inch))
+        
+        explanation_data = explanation_rows(explanations)
+        explanation_table = Table(explanation_data, colWidths=[1.6*inch] + [1.2*inch] * len(explanations))
+        explanation_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ]))
+        story.append(explanation_table)
+        story.append(Spacer(1, 0.2*inch))
+    
     # Fertilizer Recommendations Section
     story.append(Paragraph("Fertilizer Recommendations", subtitle_style))
     
@@ -120,20 +149,7 @@ def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs,
     story.append(Paragraph("Soil Nutrient Analysis", subtitle_style))
     
     # Create nutrient analysis table
-    nutrient_data = [
-        ['Nutrient', 'Current Level', 'Optimal Level', 'Status'],
-    ]
-    
-    # Add N, P, K data
-    for nutrient, label in [('n_value', 'Nitrogen (N)'), ('p_value', 'Phosphorus (P)'), ('k_value', 'Potassium (K)')]:
-        optimal = optimal_levels['N' if nutrient == 'n_value' else 'P' if nutrient == 'p_value' else 'K']
-        status = 'Deficient' if soil_analysis[nutrient] < optimal else 'Adequate'
-        nutrient_data.append([
-            label,
-            f"{soil_analysis[nutrient]} kg/ha",
-            f"{optimal} kg/ha", 
-            status
-        ])
+    nutrient_data = nutrient_rows(soil_analysis, optimal_levels)
     
     nutrient_table = Table(nutrient_data, colWidths=[1.2*inch, 1.2*inch, 1.2*inch, 1.2*inch])
     
@@ -155,30 +171,22 @@ def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs,
     story.append(nutrient_table)
     story.append(Spacer(1, 0.2*inch))
     
+    if include_charts and top_crops:
+        story.append(_chart_image(nutrient_chart_png(soil_analysis, optimal_levels, top_crops[0], compact=compact), 4.5*inch))
+        story.append(Spacer(1, 0.2*inch))
+    
     # Summary Section
     story.append(Paragraph("Summary and Recommendations", subtitle_style))
     
-    # Most recommended crop
-    top_crop = top_crops[0] if top_crops else "None"
-    top_prob = top_probs[0] if top_probs else 0
-    
-    summary_text = f"Based on your field conditions, we recommend <b>{top_crop}</b> as the optimal crop "
-    summary_text += f"with a confidence of {top_prob:.1f}%. "
-    
-    # Add fertilizer summary
-    if fertilizer_recs:
-        summary_text += f"To optimize growth, we recommend using <b>{fertilizer_recs[0]['fertilizer']}</b> "
-        summary_text += f"as the primary fertilizer. {fertilizer_recs[0]['rationale']}"
-    
-    story.append(Paragraph(summary_text, normal_style))
+    # Most recommended crop and primary fertilizer
+    summary = summary_text(top_crops, top_probs, fertilizer_recs, bold=lambda text: f"<b>{text}</b>")
+    story.append(Paragraph(summary, normal_style))
     story.append(Spacer(1, 0.1*inch))
     
     # Final tips
     story.append(Paragraph("Additional Tips:", heading2_style))
-    story.append(Paragraph("• Consider soil testing regularly to monitor nutrient levels.", normal_style))
-    story.append(Paragraph("• Apply fertilizers according to recommended rates and timing.", normal_style))
-    story.append(Paragraph("• Monitor water requirements throughout the growing season.", normal_style))
-    story.append(Paragraph("• Rotate crops to maintain soil health and prevent pest buildup.", normal_style))
+    for tip in ADDITIONAL_TIPS:
+        story.append(Paragraph(f"• {tip}", normal_style))
     
     # Build the PDF
     doc.build(story)
@@ -187,7 +195,20 @@ def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs,
     pdf_bytes = buffer.getvalue()
     buffer.close()
     
+    return pdf_bytes
+
+def create_pdf_report(field_conditions, top_crops, top_probs, fertilizer_recs, 
+                      soil_analysis, optimal_levels, crop_info, include_charts=True):
+    """
+    Generate a PDF report with crop and fertilizer recommendations using ReportLab.
+    
+    Returns:
+        tuple: (base64 encoded PDF, PDF file as bytes)
+    """
+    pdf_bytes = render_pdf_bytes(field_conditions, top_crops, top_probs, fertilizer_recs,
+                                 soil_analysis, optimal_levels, crop_info, include_charts)
+    
     # Encode in base64
     b64_pdf = base64.b64encode(pdf_bytes).decode()
     
-    return b64_pdf, pdf_bytes
\ No newline at end of file
+    return b64_pdf, pdf_bytes
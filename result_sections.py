@@ -0,0 +1,447 @@
+import datetime
+
+import streamlit as st
+from chart_payload import (show_attribution_chart, show_confidence_chart, show_deficiency_chart,
+                           show_nutrient_chart, show_radar_chart, show_sweep_chart)
+from compute_scheduler import SchedulerBusy
+from crop_data import crop_info, fertilizer_info
+from drift_monitor import out_of_range_inputs
+from email_outbox import build_message, queue_email
+from explanations import explain_crop
+from report_renderers import render_report
+from robustness import ERROR_LEVELS, robustness_analysis
+from rotation_planner import DEFAULT_SEASONS, MAX_SEASONS, plan_rotation
+from model_inputs import FEATURE_LABELS
+from sensitivity import sensitivity_sweep
+from settings import get_settings
+from similar_fields import get_field_index, similar_fields
+
+# Each result section is a fragment: widgets inside one section rerun only
+# that section instead of the whole script. Fall back to plain functions on
+# Streamlit versions without fragments.
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+
+def charts_enabled(key):
+    """Toggle that defers building a section's charts until the user wants them."""
+    return st.toggle("Show charts", value=True, key=key)
+
+
+def crop_cards(result):
+    """Render the top-3 crop cards. Drawn first, before any chart is built."""
+    top_crops = result['top_crops']
+    top_probs = result['top_probs']
+    
+    # Display results
+    st.header("Recommended Crops")
+    
+    # Create columns for top recommendations
+    cols = st.columns(3)
+    
+    for i, (crop, prob) in enumerate(zip(top_crops, top_probs)):
+        with cols[i]:
+            st.subheader(f"{i+1}. {crop}")
+            st.metric("Confidence", f"{prob:.1f}%")
+    
+            # Display crop information
+            if crop in crop_info:
+                info = crop_info[crop]
+                st.write(f"**Description:** {info['description']}")
+                st.write(f"**Growing Season:** {info['growing_season']}")
+                st.write(f"**Ideal Conditions:**")
+                st.write(f"- Temperature: {info['ideal_temp']}")
+                st.write(f"- Soil pH: {info['ideal_ph']}")
+                st.write(f"- Water Needs: {info['water_needs']}")
+
+
+def input_range_warning(field_conditions):
+    """Warn when an input lies outside the range the model was trained on."""
+    outside = out_of_range_inputs(field_conditions)
+    if outside:
+        details = "; ".join(f"{FEATURE_LABELS[key]} {value:g} (trained on {low:g} to {high:g})"
+                            for key, value, low, high in outside)
+        st.warning(f"Some inputs are outside the range the model was trained on, so treat these "
+                   f"recommendations with caution: {details}.")
+
+
+@fragment
+def visualization_section(result, field_conditions):
+    """Confidence bar chart and field condition radar chart."""
+    top_crops = result['top_crops']
+    top_probs = result['top_probs']
+    
+    # Visualization section
+    st.header("Visualization")
+    if not charts_enabled('show-visualization'):
+        return
+    
+    show_confidence_chart(top_crops, top_probs)
+    show_radar_chart(field_conditions)
+
+
+@fragment
+def explanation_section(result, field_conditions):
+    """Which field conditions drove each top crop's confidence."""
+    top_crops = result['top_crops']
+    
+    st.header("Why These Crops?")
+    if not top_crops:
+        return
+    
+    crop = st.radio("Explain", top_crops, horizontal=True, key='explain-crop')
+    explanation = explain_crop(field_conditions, crop)
+    
+    # Lead with the condition that helped most, then the one that hurt most
+    helped = max(explanation['contributions'], key=lambda item: item[1])
+    hurt = min(explanation['contributions'], key=lambda item: item[1])
+    text = (f"An average field gets {explanation['base']:.1f}% for {crop}; yours gets "
+            f"{explanation['prediction']:.1f}%. {helped[0]} helped most ({helped[1]:+.1f} points)")
+    if hurt[1] < 0:
+        text += f", while {hurt[0]} held it back ({hurt[1]:+.1f} points)"
+    st.write(text + ".")
+    
+    if charts_enabled('show-explanation-chart'):
+        show_attribution_chart(explanation)
+
+
+@fragment
+def what_if_section(result, field_conditions):
+    """What-if sweeps of one or two inputs. Changing the inputs only reruns this section."""
+    st.header("What If?")
+    st.write("See how the top crops' chances would change if one or two of your field conditions were different.")
+    
+    keys_by_label = {label: key for key, label in FEATURE_LABELS.items()}
+    labels = st.multiselect("Conditions to vary", list(keys_by_label), default=[FEATURE_LABELS['rainfall']],
+                            max_selections=2, key='what-if-inputs')
+    if not labels:
+        st.info("Pick one or two conditions to vary.")
+        return
+    
+    # The whole grid is scored in one batch and cached for this field
+    try:
+        sweep = sensitivity_sweep(field_conditions, [keys_by_label[label] for label in labels])
+    except SchedulerBusy:
+        st.warning("The server is busy with other requests. Please try again in a moment.")
+        return
+    
+    crop = None
+    if len(labels) == 2:
+        crop = st.radio("Crop", sweep['crops'], horizontal=True, key='what-if-crop')
+    show_sweep_chart(sweep, crop)
+
+
+@fragment
+def robustness_section(result, field_conditions):
+    """How often each crop stays in the top 3 when the inputs are slightly off."""
+    st.header("How Robust Is This Recommendation?")
+    if not st.toggle("Account for measurement error", value=False, key='show-robustness'):
+        st.caption("Soil tests and climate averages are never exact. Turn this on to see how "
+                   "the recommendation holds up when your inputs are slightly off.")
+        return
+    
+    level = st.select_slider("Measurement error", options=list(ERROR_LEVELS), value="Typical",
+                             key='robustness-level')
+    try:
+        analysis = robustness_analysis(field_conditions, error_scale=ERROR_LEVELS[level])
+    except SchedulerBusy:
+        st.warning("The server is busy with other requests. Please try again in a moment.")
+        return
+    
+    st.table([
+        {
+            "Crop": row['crop'],
+            "In top 3": f"{row['top3_rate']:.0%}",
+            "Top pick": f"{row['top1_rate']:.0%}",
+            "Typical confidence": f"{row['prob_median']:.1f}%",
+            "Range (90%)": f"{row['prob_low']:.1f}% - {row['prob_high']:.1f}%",
+        }
+        for row in analysis['crops'][:6]
+    ])
+    st.caption(f"Based on {analysis['samples']:,} variations of your inputs "
+               f"({analysis['elapsed_ms']:.0f} ms).")
+
+
+@fragment
+def similar_fields_section(result, field_conditions):
+    """The past submissions closest to this field, and what was recommended there."""
+    st.header("Fields Like Yours")
+    # The user's own earlier submissions of this field don't count as "like yours"
+    field_id = st.session_state.get('field-id', '').strip()
+    # Nor does this submission's own row, once the history writer has stored it
+    submission = st.session_state.get('submission') or {}
+    own_id = submission.get('id')
+    similar = similar_fields(field_conditions, exclude_field_id=field_id or None,
+                             exclude_ids=() if own_id is None else (own_id,))
+    if similar is None:
+        index = get_field_index()
+        if index is not None and index.last_error:
+            st.error(f"Past submissions could not be indexed ({index.last_error}). Retrying in the background.")
+        else:
+            st.caption("Past submissions are still being indexed. Check back in a few seconds.")
+        return
+    if not similar['fields']:
+        st.caption("No past submissions yet. Fields submitted from now on will show up here.")
+        return
+    
+    common = ", ".join(f"{crop} ({count})" for crop, count in similar['crops'][:3])
+    st.write(f"The {len(similar['fields'])} most similar of {similar['indexed']:,} past fields were "
+             f"recommended: {common}.")
+    # Distances are in slider-range units; sqrt(7) is the largest possible
+    st.table([
+        {
+            "Submitted": datetime.datetime.fromtimestamp(row['created']).strftime("%Y-%m-%d"),
+            "Field": row['field_id'] or "-",
+            "Similarity": f"{max(0.0, 1 - row['distance'] / 7 ** 0.5):.0%}",
+            "Top crop": row['top_crop'],
+            "Confidence": f"{row['top_prob'] * 100:.1f}%",
+            "Soil": row['soil_type'],
+        }
+        for row in similar['fields']
+    ])
+
+
+def condition_analysis_section(result, field_conditions):
+    """Comparison of the field conditions with each top crop's ideal conditions."""
+    temperature = field_conditions['temperature']
+    ph_value = field_conditions['ph_value']
+    rainfall = field_conditions['rainfall']
+    top_crops = result['top_crops']
+    
+    # Show environmental condition analysis
+    st.header("Environmental Condition Analysis")
+    
+    # Create a comparison table
+    comparison_data = []
+    for crop in top_crops:
+        if crop in crop_info:
+            info = crop_info[crop]
+            comparison_data.append({
+                "Crop": crop,
+                "Your Temperature": f"{temperature}°C",
+                "Ideal Temperature": info['ideal_temp'],
+                "Your pH": f"{ph_value}",
+                "Ideal pH": info['ideal_ph'],
+                "Your Rainfall": f"{rainfall} mm",
+                "Water Needs": info['water_needs']
+            })
+    
+    if comparison_data:
+        import pandas as pd
+        st.table(pd.DataFrame(comparison_data))
+
+
+@fragment
+def fertilizer_section(result, field_conditions):
+    """Fertilizer recommendations and the soil nutrient charts for the top crop."""
+    n_value, p_value, k_value = field_conditions['n_value'], field_conditions['p_value'], field_conditions['k_value']
+    top_crops = result['top_crops']
+    
+    # Fertilizer recommendation section
+    st.header("Fertilizer Recommendations")
+    
+    # Get fertilizer recommendations for the top crop
+    if not top_crops:
+        return
+    
+    top_crop = top_crops[0]
+    fertilizer_recs = result['fertilizer_recs']
+    
+    st.write(f"Based on your soil nutrient levels and the recommended crop ({top_crop}), we suggest:")
+    
+    # Create columns for fertilizer recommendations
+    fert_cols = st.columns(len(fertilizer_recs))
+    
+    for i, rec in enumerate(fertilizer_recs):
+        with fert_cols[i]:
+            st.subheader(rec["fertilizer"])
+            st.write(rec["rationale"])
+    
+            # Display fertilizer details if available in our database
+            if rec["fertilizer"] in fertilizer_info:
+                fert_data = fertilizer_info[rec["fertilizer"]]
+                st.write("**Details:**")
+                st.write(f"- {fert_data['description']}")
+                st.write(f"- N-P-K Content: {fert_data['n_content']}-{fert_data['p_content']}-{fert_data['k_content']}")
+                st.write(f"- Recommended application: {fert_data['application_rate']}")
+                st.write(f"- Best time to apply: {fert_data['best_time']}")
+    
+    # Show NPK deficiency visualization
+    st.subheader("Soil Nutrient Analysis")
+    
+    # Optimal NPK levels for the recommended crop
+    optimal_levels = result['optimal_levels']
+    
+    # Calculate deficiency percentages
+    n_deficit_pct = max(0, 100 * (1 - (n_value / optimal_levels["N"])))
+    p_deficit_pct = max(0, 100 * (1 - (p_value / optimal_levels["P"])))
+    k_deficit_pct = max(0, 100 * (1 - (k_value / optimal_levels["K"])))
+    
+    if not charts_enabled('show-nutrient-charts'):
+        return
+    
+    # Create two columns for visualization
+    nutrient_cols = st.columns(2)
+    
+    with nutrient_cols[0]:
+        # Bar chart comparing current vs optimal
+        soil_analysis = {'n_value': n_value, 'p_value': p_value, 'k_value': k_value}
+        show_nutrient_chart(top_crop, soil_analysis, optimal_levels)
+    
+    with nutrient_cols[1]:
+        # Deficiency distribution, only nutrients with a deficiency
+        deficiency_data = []
+        labels = []
+        
+        if n_deficit_pct > 0:
+            deficiency_data.append(n_deficit_pct)
+            labels.append("Nitrogen (N)")
+        if p_deficit_pct > 0:
+            deficiency_data.append(p_deficit_pct)
+            labels.append("Phosphorus (P)")
+        if k_deficit_pct > 0:
+            deficiency_data.append(k_deficit_pct)
+            labels.append("Potassium (K)")
+        
+        if deficiency_data:
+            show_deficiency_chart(labels, deficiency_data)
+        else:
+            st.info("Your soil has adequate nutrient levels. No significant deficiencies detected.")
+
+
+@fragment
+def rotation_section(result, field_conditions):
+    """The best sequence of crops over the next few seasons on this field."""
+    st.header("Crop Rotation Plan")
+    if not st.toggle("Plan several seasons", value=False, key='show-rotation'):
+        st.caption("Each crop takes different nutrients out of the soil. Turn this on to see "
+                   "which sequence of crops suits your field best over several seasons.")
+        return
+    
+    n_seasons = st.slider("Seasons", 2, MAX_SEASONS, DEFAULT_SEASONS, key='rotation-seasons')
+    try:
+        plan = plan_rotation(field_conditions, n_seasons)
+    except SchedulerBusy:
+        st.warning("The server is busy with other requests. Please try again in a moment.")
+        return
+    
+    st.table([
+        {
+            "Season": season['season'],
+            "Crop": season['crop'],
+            "Confidence": f"{season['probability']:.1f}%",
+            "Soil N-P-K at planting": "-".join(f"{season['soil'][key]:.0f}" for key in ('N', 'P', 'K')),
+        }
+        for season in plan['seasons']
+    ])
+    st.write(f"Average confidence of this plan: {plan['average']:.1f}%, against "
+             f"{plan['repeat_average']:.1f}% for growing {plan['repeat_crop']} every season.")
+    # Soil after each season is estimated without fertilizer
+    st.caption(f"Soil levels assume no fertilizer between seasons. Based on {plan['states']:,} "
+               f"possible soil states ({plan['elapsed_ms']:.0f} ms).")
+
+
+@fragment
+def pdf_section(result, field_conditions):
+    """PDF generation, download and email. Its buttons only rerun this section."""
+    top_crops = result['top_crops']
+    top_probs = result['top_probs']
+    fertilizer_recs = result['fertilizer_recs']
+    optimal_levels = result['optimal_levels']
+    n_value, p_value, k_value = field_conditions['n_value'], field_conditions['p_value'], field_conditions['k_value']
+    
+    # Generate PDF Report Section
+    st.header("PDF Report")
+    st.write("Get a comprehensive PDF report of your crop and fertilizer recommendations for offline reference.")
+    
+    # Soil analysis for PDF
+    soil_analysis = {
+        'n_value': n_value,
+        'p_value': p_value,
+        'k_value': k_value
+    }
+    
+    # Create PDF generation button
+    pdf_col1, pdf_col2 = st.columns([2, 3])
+    
+    with pdf_col1:
+        generate_pdf = st.button("Generate PDF Report")
+    
+    # Generate PDF when button is clicked and keep it with the result,
+    # so the download and email buttons survive their own reruns
+    if generate_pdf:
+        with st.spinner("Generating PDF Report..."):
+            # Create the PDF report
+            try:
+                result['pdf_bytes'] = render_report(
+                    field_conditions=field_conditions,
+                    top_crops=top_crops,
+                    top_probs=top_probs,
+                    fertilizer_recs=fertilizer_recs,
+                    soil_analysis=soil_analysis,
+                    optimal_levels=optimal_levels,
+                    crop_info=crop_info,
+                    explanations=[explain_crop(field_conditions, crop) for crop in top_crops]
+                )
+            except SchedulerBusy:
+                st.warning("The server is busy generating other reports. Please try again in a moment.")
+    
+    if result.get('pdf_bytes'):
+        pdf_bytes = result['pdf_bytes']
+        st.success("PDF Report Generated! You can now download or email it.")
+    
+        # Create columns for download and email buttons
+        download_col, email_col = st.columns(2)
+    
+        # Download button
+        with download_col:
+            st.download_button(
+                label="Download PDF Report",
+                data=pdf_bytes,
+                file_name="crop_fertilizer_report.pdf",
+                mime="application/pdf",
+                key='pdf-download'
+            )
+    
+        # Email section
+        with email_col:
+            # Add email input
+            email_address = st.text_input("Email address to send the report to:", placeholder="your.email@example.com")
+    
+            # Email button
+            if st.button("Email PDF Report"):
+                if email_address and "@" in email_address:
+                    # Ask for email credentials if not already set
+                    email_settings = get_settings()
+                    if not email_settings['EMAIL_PASSWORD']:
+                        st.error("Email configuration required. Please ask the administrator to set up email credentials.")
+                    else:
+                        # Email body
+                        email_body = f"""
+                        Hello,
+    
+                        Thank you for using our Crop & Fertilizer Recommendation System.
+    
+                        Attached is your personalized report based on the field conditions you provided.
+    
+                        Top recommended crop: {top_crops[0] if top_crops else 'N/A'}
+    
+                        This report includes detailed recommendations for crops, fertilizers, and soil analysis
+                        to help optimize your agricultural practices.
+    
+                        Regards,
+                        Crop & Fertilizer Recommendation System
+                        """
+    
+                        msg = build_message(
+                            sender=email_settings['EMAIL_USER'] or 'cropadviser@example.com',
+                            recipient=email_address,
+                            subject="Your Crop & Fertilizer Recommendation Report",
+                            body=email_body,
+                            attachment=pdf_bytes
+                        )
+    
+                        # Queue for the background sender instead of blocking this rerun
+                        queue_email(msg)
+                        st.success(f"Report queued for delivery to {email_address}.")
+                else:
+                    st.error("Please enter a valid email address.")
@@ -0,0 +1,49 @@
+from collections import OrderedDict
+
+# Recommendations kept per browser session
+MAX_RESULTS_PER_SESSION = 8
+
+
+class ResultStore:
+    """
+    Bounded LRU mapping from an input tuple to a computed recommendation.
+
+    Results are plain dicts, so follow-up actions (PDF generation, email)
+    can attach to them, e.g. result['pdf_bytes'].
+    """
+
+    def __init__(self, maxsize=MAX_RESULTS_PER_SESSION):
+        self.maxsize = maxsize
+        self._results = OrderedDict()
+
+    def get(self, key):
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._results
+
+    def __len__(self):
+        return len(self._results)
+
+
+def input_key(field_conditions):
+    """Hashable key for a field_conditions dict."""
+    return tuple(sorted(field_conditions.items()))
+
+
+def get_session_store():
+    """Return the ResultStore of the current Streamlit session, creating it on first use."""
+    import streamlit as st
+
+    if 'result_store' not in st.session_state:
+        st.session_state['result_store'] = ResultStore()
+    return st.session_state['result_store']
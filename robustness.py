@@ -0,0 +1,160 @@
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from crop_recommendation_model import (get_lite_model, get_model, lite_mode_by_default, model_version,
+                                       predict_crop)
+from model_inputs import FEATURE_KEYS, FEATURE_RANGES, field_row
+
+# Typical measurement error of each input, as one standard deviation:
+# ('relative', 0.15) is +-15% of the value, ('absolute', 1.5) is +-1.5 units.
+# Soil lab tests for N/P/K commonly disagree by 10-20%; climate inputs are
+# long-term averages that a given season misses by a few units.
+MEASUREMENT_ERRORS = {
+    'n_value': ('relative', 0.15),
+    'p_value': ('relative', 0.15),
+    'k_value': ('relative', 0.15),
+    'temperature': ('absolute', 1.5),
+    'humidity': ('absolute', 5.0),
+    'ph_value': ('absolute', 0.3),
+    'rainfall': ('relative', 0.20),
+}
+
+# Relative errors never go below this share of the input's slider range,
+# so an input at (or near) zero still varies
+RELATIVE_ERROR_FLOOR = 0.02
+
+# Multipliers of MEASUREMENT_ERRORS offered in the app
+ERROR_LEVELS = {"Low": 0.5, "Typical": 1.0, "High": 2.0}
+
+# Perturbed inputs scored per analysis, at most
+DEFAULT_SAMPLES = 2000
+
+# Wall time one analysis may take. The samples are scored in one batch,
+# cut down to fit the budget at the cost per row measured by the previous
+# analysis with the same model, but never below PILOT_SAMPLES. Before the
+# first analysis a small pilot batch measures that cost.
+LATENCY_BUDGET_MS = 250.0
+PILOT_SAMPLES = 100
+
+# Probability interval reported per crop (5th to 95th percentile)
+INTERVAL = (5, 95)
+
+# Analyses kept in memory
+ROBUSTNESS_CACHE_SIZE = 64
+
+# (lite, model version) -> milliseconds per row of the last batch scored
+_row_cost_ms = {}
+
+
+def perturbed_inputs(row, n_samples, error_scale=1.0, seed=0):
+    """
+    Draw inputs around a field's values from the measurement error models.
+
+    Args:
+        row: Field inputs in feature order (see model_inputs.field_row)
+        n_samples: Number of inputs to draw
+        error_scale: Multiplier of every error's standard deviation
+        seed: Random seed
+
+    Returns:
+        numpy.ndarray: (n_samples, 7) inputs, clipped to the slider ranges
+    """
+    row = np.asarray(row, dtype=float)
+    relative = np.array([MEASUREMENT_ERRORS[key][0] == 'relative' for key in FEATURE_KEYS])
+    sigma = np.array([MEASUREMENT_ERRORS[key][1] for key in FEATURE_KEYS])
+    # Relative errors scale with the value; absolute ones are in input units
+    floor = RELATIVE_ERROR_FLOOR * (FEATURE_RANGES[:, 1] - FEATURE_RANGES[:, 0])
+    sigma = np.where(relative, np.maximum(sigma * np.abs(row), floor), sigma) * error_scale
+    noise = np.random.default_rng(seed).standard_normal((n_samples, len(row))) * sigma
+    return np.clip(row + noise, FEATURE_RANGES[:, 0], FEATURE_RANGES[:, 1])
+
+
+def _measure_row_cost(row, lite, version):
+    """Score a pilot batch to learn the cost per row on this host and load."""
+    model, label_encoder = get_model()
+    X = perturbed_inputs(row, PILOT_SAMPLES, seed=1)
+    start = time.perf_counter()
+    predict_crop(model, label_encoder, X, lite=lite, monitor=False)
+    _row_cost_ms[lite, version] = (time.perf_counter() - start) * 1000 / PILOT_SAMPLES
+    return _row_cost_ms[lite, version]
+
+
+@lru_cache(maxsize=ROBUSTNESS_CACHE_SIZE)
+def _analyse(row, n_samples, error_scale, lite, version):
+    # Keyed by the number of samples actually scored: an analysis cut down
+    # on a busy host is not served later in place of the full one
+    model, label_encoder = get_model()
+    start = time.perf_counter()
+    X = perturbed_inputs(row, n_samples, error_scale)
+    _, probabilities = predict_crop(model, label_encoder, X, lite=lite, monitor=False)
+    _row_cost_ms[lite, version] = (time.perf_counter() - start) * 1000 / n_samples
+
+    n_samples, n_classes = probabilities.shape
+    ranked = np.argsort(-probabilities, axis=1, kind='stable')[:, :3]
+    # Crops with zero probability only reach the top 3 through ties; they don't count
+    counted = np.take_along_axis(probabilities, ranked, axis=1) > 0
+    in_top3 = np.bincount(ranked[counted], minlength=n_classes) / n_samples
+    top1 = np.bincount(ranked[:, 0], minlength=n_classes) / n_samples
+    low, median, high = np.percentile(probabilities, (INTERVAL[0], 50, INTERVAL[1]), axis=0) * 100
+
+    crops = []
+    for index in np.argsort(-in_top3, kind='stable'):
+        if in_top3[index] == 0:
+            break
+        crops.append({
+            'crop': str(label_encoder.inverse_transform([index])[0]),
+            'top3_rate': float(in_top3[index]),
+            'top1_rate': float(top1[index]),
+            'prob_low': float(low[index]),
+            'prob_median': float(median[index]),
+            'prob_high': float(high[index]),
+        })
+    return {
+        'crops': tuple(crops),
+        'samples': len(probabilities),
+        'elapsed_ms': (time.perf_counter() - start) * 1000,
+    }
+
+
+def robustness_analysis(field_conditions, n_samples=DEFAULT_SAMPLES, error_scale=1.0,
+                        budget_ms=LATENCY_BUDGET_MS, lite=None):
+    """
+    How stable a field's recommendation is under measurement error.
+
+    Scores perturbed copies of the field's inputs (see perturbed_inputs)
+    and counts how often each crop lands in the top 3. The number of
+    samples shrinks if needed to stay within budget_ms, down to
+    PILOT_SAMPLES. Results are cached per field, settings, model version
+    and number of samples scored, and the draws are seeded, so the same
+    field and sample count always get the same answer.
+
+    Args:
+        field_conditions: Dictionary with the field's input values
+        n_samples: Maximum number of perturbed inputs
+        error_scale: Multiplier of MEASUREMENT_ERRORS (see ERROR_LEVELS)
+        budget_ms: Latency budget in milliseconds
+        lite: Use the lite model; defaults to the LITE_MODEL setting
+
+    Returns:
+        dict: 'crops' (one dict per crop that reached the top 3 at least
+            once, most robust first: top3_rate, top1_rate and the median
+            and INTERVAL percentiles of its probability in percent),
+            'samples' scored and 'elapsed_ms' of the analysis
+    """
+    lite = lite_mode_by_default() if lite is None else lite
+    # get_model() first, so the cache key names the live model version
+    get_model()
+    if lite:
+        # Load (or distil) the lite model before anything is timed
+        get_lite_model()
+    row, version = field_row(field_conditions), model_version()
+    per_row_ms = _row_cost_ms.get((lite, version)) or _measure_row_cost(row, lite, version)
+    n_samples = min(int(n_samples), max(PILOT_SAMPLES, int(budget_ms / max(per_row_ms, 1e-6))))
+    return _analyse(row, n_samples, float(error_scale), lite, version)
+
+
+def robustness_cache_info():
+    """Hit/miss statistics of the analysis cache."""
+    return _analyse.cache_info()
@@ -0,0 +1,216 @@
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from crop_data import crop_info, get_dataset, optimal_levels_for
+from crop_recommendation_model import get_model, lite_mode_by_default, model_version, predict_crop
+from model_inputs import FEATURE_KEYS, FEATURE_RANGES, field_row
+
+# Seasons planned by default, and the most the app offers
+DEFAULT_SEASONS = 4
+MAX_SEASONS = 6
+
+# Nutrient model, per season and in kg/ha. A crop removes UPTAKE_SHARE of
+# its optimal N/P/K level (optimal_levels_for), scaled by how rich the
+# soils it grows on in the training data are compared with the average
+# crop's. Legumes fix LEGUME_N_FIXATION of nitrogen. Between seasons the
+# soil recovers RECOVERY_SHARE of the gap back to the field's starting
+# levels (crop residues, mineralization). No fertilizer is applied.
+UPTAKE_SHARE = 0.35
+LEGUME_CROPS = ('chickpea', 'kidneybeans', 'pigeonpeas', 'mothbeans', 'mungbean', 'blackgram', 'lentil')
+LEGUME_N_FIXATION = 30.0
+RECOVERY_SHARE = 0.2
+
+# N/P/K are rounded to this step (kg/ha) between seasons. Plans that reach
+# the same rounded soil share one model score and one memo entry.
+SOIL_STEP = 5.0
+
+# Percentage points deducted each time a crop follows itself: pests and
+# diseases build up in monocultures
+REPEAT_PENALTY = 10.0
+
+# A crop below this probability (percent) in a season is only chosen when
+# nothing reaches it: a plan should not sacrifice a season to set up the
+# soil for the next one
+MIN_PROBABILITY = 10.0
+_UNSUITABLE_PENALTY = 1000.0
+
+# Plans kept in memory
+PLAN_CACHE_SIZE = 64
+
+_NUTRIENTS = ('N', 'P', 'K')
+
+# Columns of the model input holding N/P/K
+NUTRIENT_COLUMNS = [FEATURE_KEYS.index(key) for key in ('n_value', 'p_value', 'k_value')]
+
+
+def rotation_crops():
+    """Crops a seasonal rotation can use: all but the perennials (fruit trees, coffee)."""
+    _, label_encoder = get_model()
+    return tuple(str(crop) for crop in label_encoder.classes_
+                 if not crop_info.get(crop, {}).get('growing_season', '').startswith("Perennial"))
+
+
+@lru_cache(maxsize=1)
+def _demand_weights():
+    """Per crop, mean N/P/K of its training rows relative to all rows'."""
+    df = get_dataset()
+    means = df.groupby('label')[list(_NUTRIENTS)].mean()
+    return (means / df[list(_NUTRIENTS)].mean()).to_dict('index')
+
+
+def crop_nutrient_balance(crop):
+    """
+    Net N/P/K change one season of a crop causes, before soil recovery.
+
+    Returns:
+        tuple: (uptake, fixation) arrays of N, P, K in kg/ha
+    """
+    optimal = optimal_levels_for(crop)
+    weights = _demand_weights().get(crop, {})
+    uptake = np.array([UPTAKE_SHARE * optimal[key] * weights.get(key, 1.0) for key in _NUTRIENTS])
+    fixation = np.array([LEGUME_N_FIXATION if crop in LEGUME_CROPS else 0.0, 0.0, 0.0])
+    return uptake, fixation
+
+
+def _next_soil(soil, uptake, fixation, baseline):
+    """
+    Soil after one season of each crop.
+
+    Args:
+        soil: (S, 3) N/P/K at planting
+        uptake, fixation: (C, 3) per crop (see crop_nutrient_balance)
+        baseline: (3,) the field's starting N/P/K
+
+    Returns:
+        ndarray: (S, C, 3) N/P/K at the next planting, rounded to SOIL_STEP
+    """
+    soil = soil[:, None, :]
+    after = soil - np.minimum(uptake, soil) + fixation
+    after += RECOVERY_SHARE * (baseline - after)
+    after = np.clip(after, FEATURE_RANGES[NUTRIENT_COLUMNS, 0], FEATURE_RANGES[NUTRIENT_COLUMNS, 1])
+    return np.round(after / SOIL_STEP) * SOIL_STEP
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _plan(row, n_seasons, crops, lite, version):
+    model, label_encoder = get_model()
+    start = time.perf_counter()
+    classes = [str(crop) for crop in label_encoder.classes_]
+    columns = np.array([classes.index(crop) for crop in crops])
+    balances = [crop_nutrient_balance(crop) for crop in crops]
+    uptake = np.array([u for u, _ in balances])
+    fixation = np.array([f for _, f in balances])
+    baseline = np.asarray(row)[NUTRIENT_COLUMNS]
+    n_crops = len(crops)
+
+    # Forward: the distinct soil states each season can start from, the
+    # score of every crop in each, and where each crop leads. Scoring a
+    # whole season's states is one batched model call.
+    states = [baseline[None, :]]
+    scores, successors = [], []
+    for season in range(n_seasons):
+        X = np.tile(np.asarray(row, dtype=float), (len(states[-1]), 1))
+        X[:, NUTRIENT_COLUMNS] = states[-1]
+        _, probabilities = predict_crop(model, label_encoder, X, lite=lite, monitor=False)
+        scores.append(probabilities[:, columns] * 100)
+        if season < n_seasons - 1:
+            after = _next_soil(states[-1], uptake, fixation, baseline).reshape(-1, 3)
+            unique, inverse = np.unique(after, axis=0, return_inverse=True)
+            states.append(unique)
+            successors.append(inverse.reshape(-1, n_crops))
+
+    # Backward: value[s, p] is the best total from state s on when crop p
+    # was grown last (p == n_crops: nothing yet). Each (season, soil state,
+    # previous crop) is solved once, so the work grows with the number of
+    # distinct states, not with n_crops ** n_seasons sequences.
+    value = np.zeros((1, n_crops + 1))
+    choices = []
+    for season in reversed(range(n_seasons)):
+        gain = np.where(scores[season] < MIN_PROBABILITY, scores[season] - _UNSUITABLE_PENALTY, scores[season])
+        if season < n_seasons - 1:
+            gain += value[successors[season], np.arange(n_crops)]
+        # Best crop after each previous crop. The penalty only touches the
+        # option of repeating that crop, so the best and runner-up suffice.
+        ranked = np.argsort(-gain, axis=1, kind='stable')
+        rows, best = np.arange(len(gain)), ranked[:, 0]
+        best_gain = gain[rows, best]
+        value = np.repeat(best_gain[:, None], n_crops + 1, axis=1)
+        choice = np.repeat(best[:, None], n_crops + 1, axis=1)
+        repeat_gain = best_gain - REPEAT_PENALTY
+        if n_crops > 1:
+            second = ranked[:, 1]
+            switch = gain[rows, second] > repeat_gain
+            value[rows, best] = np.where(switch, gain[rows, second], repeat_gain)
+            choice[rows, best] = np.where(switch, second, best)
+        else:
+            value[rows, best] = repeat_gain
+        choices.append(choice)
+    choices.reverse()
+
+    # Follow the choices from the field's own soil
+    seasons, state, previous = [], 0, n_crops
+    for season in range(n_seasons):
+        crop = int(choices[season][state, previous])
+        seasons.append({
+            'season': season + 1,
+            'crop': crops[crop],
+            'probability': float(scores[season][state, crop]),
+            'soil': dict(zip(_NUTRIENTS, states[season][state].round(1).tolist())),
+        })
+        if season < n_seasons - 1:
+            state = int(successors[season][state, crop])
+        previous = crop
+
+    # For comparison: growing the first season's best crop every season
+    first = int(np.argmax(scores[0][0]))
+    repeat, state = [], 0
+    for season in range(n_seasons):
+        repeat.append(float(scores[season][state, first]))
+        if season < n_seasons - 1:
+            state = int(successors[season][state, first])
+
+    return {
+        'seasons': tuple(seasons),
+        'average': float(np.mean([s['probability'] for s in seasons])),
+        'repeat_crop': crops[first],
+        'repeat_average': float(np.mean(repeat)),
+        'states': sum(len(s) for s in states),
+        'elapsed_ms': (time.perf_counter() - start) * 1000,
+    }
+
+
+def plan_rotation(field_conditions, n_seasons=DEFAULT_SEASONS, crops=None, lite=None):
+    """
+    Best sequence of crops over several seasons for a field.
+
+    Each season's crop is scored by the model's probability for it on the
+    soil left by the seasons before (see crop_nutrient_balance), with the
+    field's climate inputs throughout. The plan maximizes the total
+    probability, less REPEAT_PENALTY for each crop grown twice in a row,
+    by dynamic programming over the rounded soil states. Crops below
+    MIN_PROBABILITY are avoided where any crop reaches it. Results are
+    cached per field, settings and model version.
+
+    Args:
+        field_conditions: Dictionary with the field's input values
+        n_seasons: Number of seasons to plan
+        crops: Crops to choose from; defaults to rotation_crops()
+        lite: Use the lite model; defaults to the LITE_MODEL setting
+
+    Returns:
+        dict: 'seasons' (per season: crop, probability in percent, soil
+            N/P/K at planting), 'average' probability of the plan,
+            'repeat_crop' and 'repeat_average' (growing the first season's
+            best crop every season, for comparison), 'states' (distinct
+            soil states solved) and 'elapsed_ms'
+
+    Raises:
+        SchedulerBusy: Too many predictions are already waiting for CPU
+    """
+    lite = lite_mode_by_default() if lite is None else lite
+    # get_model() first, so the cache key names the live model version
+    get_model()
+    crops = tuple(crops) if crops is not None else rotation_crops()
+    return _plan(field_row(field_conditions), int(n_seasons), crops, lite, model_version())
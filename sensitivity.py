@@ -0,0 +1,94 @@
+from functools import lru_cache
+
+import numpy as np
+
+from crop_recommendation_model import get_model, lite_mode_by_default, model_version, predict_crop
+from model_inputs import FEATURE_KEYS, FEATURE_LABELS, FEATURE_RANGES, field_row
+
+# Grid points per swept input: a line has 61 points, a 2-input heatmap
+# 41 x 41 = 1681, scored together in one predict_proba call
+LINE_POINTS = 61
+GRID_POINTS = 41
+
+# Crops followed across the sweep: the top ones at the current inputs
+TRACKED_CROPS = 3
+
+# Scored grids kept in memory (a 41 x 41 grid over 22 crops is ~300 KB)
+SWEEP_CACHE_SIZE = 64
+
+
+def sweep_axes(features, points):
+    """Evenly spaced values across each swept input's slider range."""
+    return [np.linspace(*FEATURE_RANGES[FEATURE_KEYS.index(key)], points) for key in features]
+
+
+@lru_cache(maxsize=SWEEP_CACHE_SIZE)
+def _scored_grid(row, features, points, lite, version):
+    """
+    Class probabilities over the sweep grid, plus the unchanged input.
+
+    Cached per field, swept inputs, resolution, model kind and model
+    version. The returned arrays are shared: they are read-only.
+    """
+    axes = sweep_axes(features, points)
+    mesh = np.meshgrid(*axes, indexing='ij')
+    X = np.tile(np.asarray(row, dtype=float), (mesh[0].size + 1, 1))
+    for key, values in zip(features, mesh):
+        X[1:, FEATURE_KEYS.index(key)] = values.ravel()
+
+    model, label_encoder = get_model()
+    # A single batched call for the whole grid; row 0 is the field as entered
+    _, probabilities = predict_crop(model, label_encoder, X, lite=lite, monitor=False)
+    current = probabilities[0]
+    grid = probabilities[1:].reshape(*(len(axis) for axis in axes), -1)
+    for array in (current, grid):
+        array.flags.writeable = False
+    return current, grid
+
+
+def sensitivity_sweep(field_conditions, features, points=None, lite=None):
+    """
+    Score a field with one or two inputs swept across their slider ranges.
+
+    Args:
+        field_conditions: Dictionary with the field's input values
+        features: One or two field_conditions keys to sweep
+        points: Grid points per swept input; defaults to LINE_POINTS for one
+            input and GRID_POINTS for two
+        lite: Use the lite model; defaults to the LITE_MODEL setting
+
+    Returns:
+        dict: 'features' and their 'labels', 'axes' (values per swept input),
+            'current' (the field's value of each swept input), 'crops' (the
+            top crops at the current inputs) and 'probs' (their probability
+            in percent at every grid point, shape (crops, *grid)), plus
+            'best_crop' and 'best_prob' (the most likely crop and its
+            probability at every grid point)
+    """
+    features = tuple(features)
+    if not 1 <= len(features) <= 2 or any(key not in FEATURE_KEYS for key in features):
+        raise ValueError(f"Sweep one or two of: {', '.join(FEATURE_KEYS)}")
+    points = points or (LINE_POINTS if len(features) == 1 else GRID_POINTS)
+    lite = lite_mode_by_default() if lite is None else lite
+
+    # get_model() first, so the cache key names the live model version
+    _, label_encoder = get_model()
+    current, grid = _scored_grid(field_row(field_conditions), features, points, lite, model_version())
+
+    tracked = np.argsort(current)[::-1][:TRACKED_CROPS]
+    best = np.argmax(grid, axis=-1)
+    return {
+        'features': features,
+        'labels': [FEATURE_LABELS[key] for key in features],
+        'axes': sweep_axes(features, points),
+        'current': [float(field_conditions[key]) for key in features],
+        'crops': [str(crop) for crop in label_encoder.inverse_transform(tracked)],
+        'probs': np.moveaxis(grid[..., tracked], -1, 0) * 100,
+        'best_crop': label_encoder.inverse_transform(best),
+        'best_prob': np.max(grid, axis=-1) * 100,
+    }
+
+
+def sweep_cache_info():
+    """Hit/miss statistics of the scored-grid cache."""
+    return _scored_grid.cache_info()
@@ -1,49 +1,103 @@
-import streamlit as st
 import os
 import json
+import tempfile
+import threading
 from pathlib import Path
+from types import MappingProxyType
+from compute_scheduler import scheduler_status_panel
+from field_history import history_status_panel
+from email_outbox import build_message, queue_email, email_status_panel
 
 # Constants
 SETTINGS_DIR = ".streamlit"
 SETTINGS_FILE = "email_settings.json"
 SETTINGS_PATH = Path(SETTINGS_DIR) / SETTINGS_FILE
 
+DEFAULT_SETTINGS = {
+    "EMAIL_USER": "",
+    "EMAIL_PASSWORD": "",
+    "SMTP_SERVER": "smtp.gmail.com",
+    "SMTP_PORT": "587"
+}
+
+# Parsed settings, revalidated against the file's mtime and size
+_cache = {"signature": None, "snapshot": None}
+_cache_lock = threading.Lock()
+
+def _file_signature():
+    """Return (mtime_ns, size) of the settings file, or None if it doesn't exist."""
+    try:
+        stat = os.stat(SETTINGS_PATH)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _read_settings_file():
+    try:
+        with open(SETTINGS_PATH, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def _build_snapshot(file_settings, env):
+    # Defaults, overridden by deployment environment variables, overridden
+    # by non-empty values saved from the settings page
+    merged = dict(DEFAULT_SETTINGS)
+    merged.update({key: value for key, value in env.items() if value})
+    merged.update({key: value for key, value in file_settings.items() if value})
+    return MappingProxyType(merged)
+
+def get_settings():
+    """
+    Return the current settings as an immutable snapshot.
+    
+    The settings file is only re-read when its mtime or size changes, so
+    calling this on every Streamlit rerun is a single stat() call.
+    """
+    signature = (_file_signature(), tuple(os.environ.get(key) for key in DEFAULT_SETTINGS))
+    snapshot = _cache["snapshot"]
+    if snapshot is not None and _cache["signature"] == signature:
+        return snapshot
+    
+    with _cache_lock:
+        if _cache["snapshot"] is None or _cache["signature"] != signature:
+            env = {key: os.environ.get(key) for key in DEFAULT_SETTINGS}
+            _cache["snapshot"] = _build_snapshot(_read_settings_file(), env)
+            _cache["signature"] = signature
+        return _cache["snapshot"]
+
 def save_settings(settings):
-    """Save settings to JSON file."""
+    """Save settings to JSON file atomically."""
     # Ensure directory exists
     Path(SETTINGS_DIR).mkdir(exist_ok=True)
     
-    # Write settings to file
-    with open(SETTINGS_PATH, 'w') as f:
-        json.dump(settings, f)
+    # Write to a temp file in the same directory and rename it over the old
+    # file, so concurrent readers see either the old or the new settings
+    fd, tmp_path = tempfile.mkstemp(dir=SETTINGS_DIR, prefix=".email_settings.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(settings, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, SETTINGS_PATH)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
     
-    # Set environment variables
-    for key, value in settings.items():
-        if value:  # Only set non-empty values
-            os.environ[key] = value
+    # Drop the cached snapshot; the next reader re-reads the file
+    with _cache_lock:
+        _cache["signature"] = None
+        _cache["snapshot"] = None
 
 def load_settings():
-    """Load settings from JSON file."""
-    if not SETTINGS_PATH.exists():
-        return {
-            "EMAIL_USER": "",
-            "EMAIL_PASSWORD": "",
-            "SMTP_SERVER": "smtp.gmail.com",
-            "SMTP_PORT": "587"
-        }
-    
-    with open(SETTINGS_PATH, 'r') as f:
-        settings = json.load(f)
-    
-    # Set environment variables from loaded settings
-    for key, value in settings.items():
-        if value:  # Only set non-empty values
-            os.environ[key] = value
-            
-    return settings
+    """Load settings as a plain dict (a mutable copy of get_settings())."""
+    return dict(get_settings())
 
 def settings_page():
     """Render the settings page."""
+    import streamlit as st
+    
     st.title("Email Configuration Settings")
     
     # Load current settings
@@ -108,60 +162,51 @@ def settings_page():
             st.info("You can now test your email configuration by sending a test email.")
     
     # Test email functionality - outside the form
-    if os.environ.get("EMAIL_PASSWORD"):
+    if get_settings()["EMAIL_PASSWORD"]:
         st.subheader("Test Email Configuration")
         test_email = st.text_input("Enter an email address to send a test message")
         
         if st.button("Send Test Email") and test_email:
             if "@" in test_email:
-                with st.spinner("Sending test email..."):
-                    try:
-                        import smtplib
-                        from email.mime.multipart import MIMEMultipart
-                        from email.mime.text import MIMEText
-                        from email.utils import formatdate
-                        
-                        # Setup email
-                        sender_email = os.environ.get('EMAIL_USER')
-                        sender_password = os.environ.get('EMAIL_PASSWORD')
-                        
-                        msg = MIMEMultipart()
-                        msg['From'] = sender_email
-                        msg['To'] = test_email
-                        msg['Date'] = formatdate(localtime=True)
-                        msg['Subject'] = "Test Email from Crop & Fertilizer Recommendation System"
-                        
-                        # Email body
-                        email_body = """
-                        Hello,
-                        
-                        This is a test email from the Crop & Fertilizer Recommendation System.
-                        
-                        If you received this email, it means your email configuration is working correctly.
-                        
-                        Regards,
-                        Crop & Fertilizer Recommendation System
-                        """
-                        
-                        msg.attach(MIMEText(email_body))
-                        
-                        # Connect to server and send email
-                        smtp_server = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
-                        smtp_port = int(os.environ.get('SMTP_PORT', 587))
-                        
-                        with smtplib.SMTP(smtp_server, smtp_port) as server:
-                            server.starttls()
-                            server.login(sender_email, sender_password)
-                            server.sendmail(sender_email, test_email, msg.as_string())
-                        
-                        st.success(f"Test email sent successfully to {test_email}!")
-                    except Exception as e:
-                        st.error(f"Failed to send test email: {str(e)}")
-                        st.info("Please check your email settings and try again.")
+                # Email body
+                email_body = """
+                Hello,
+                
+                This is a test email from the Crop & Fertilizer Recommendation System.
+                
+                If you received this email, it means your email configuration is working correctly.
+                
+                Regards,
+                Crop & Fertilizer Recommendation System
+                """
+                
+                msg = build_message(
+                    sender=get_settings()["EMAIL_USER"],
+                    recipient=test_email,
+                    subject="Test Email from Crop & Fertilizer Recommendation System",
+                    body=email_body
+                )
+                
+                # Delivered in the background; the status panel below reports the result
+                queue_email(msg)
+                st.info(f"Test email to {test_email} queued for delivery.")
             else:
                 st.error("Please enter a valid email address.")
+        
+        email_status_panel()
     else:
         st.warning("Please configure and save your email settings first.")
+    
+    # CPU budget shared by predictions, reports and training
+    scheduler_status_panel()
+    
+    # Background writer of the submission history
+    history_status_panel()
+    
+    # Live inputs compared with the training data; imported here because
+    # it pulls in numpy, which the settings module otherwise avoids
+    from drift_monitor import drift_status_panel
+    drift_status_panel()
         
     # Help section
     st.subheader("Help & Troubleshooting")
@@ -0,0 +1,220 @@
+"""
+Versioned, memory-mapped model store shared by several app processes.
+
+A published model is a directory of .npy files (one per CompactForest
+array, plus the class labels) named after its version, e.g. v000003. The
+CURRENT file names the live version. Processes attach with read-only
+memory maps, so the operating system keeps one copy of the arrays in the
+page cache however many workers use them. Publishing a new version and
+atomically replacing CURRENT makes every worker switch on its next
+prediction, without a restart.
+
+Usage:
+    python shared_model.py publish    # train and publish a new version
+    python shared_model.py ensure     # publish only if nothing is published yet
+    python shared_model.py status
+"""
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from compact_forest import CompactForest, LabelDecoder
+
+CURRENT_FILE = "CURRENT"
+
+# Versions kept on disk; older ones are deleted on publish. Workers still
+# mapping a deleted version keep working (POSIX) until they re-attach.
+KEEP_VERSIONS = 3
+
+# Only one process builds the first version; the others wait for it
+BUILD_LOCK_FILE = ".build.lock"
+BUILD_TIMEOUT = 300.0
+
+_VERSION_PATTERN = re.compile(r"^v\d+$")
+
+
+def _versions(root):
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root) if _VERSION_PATTERN.match(name))
+
+
+def current_version(root):
+    """Return the live version name, or None if nothing has been published."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _current_signature(root):
+    try:
+        stat = os.stat(os.path.join(root, CURRENT_FILE))
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def publish(forest, labels, root):
+    """
+    Publish a model as the new live version.
+
+    Args:
+        forest: CompactForest to publish
+        labels: Class names, indexed by the forest's encoded labels
+        root: Store directory
+
+    Returns:
+        str: The new version name
+    """
+    os.makedirs(root, exist_ok=True)
+    arrays = forest.to_arrays()
+    arrays['labels'] = np.asarray(labels, dtype=str)
+
+    staging = tempfile.mkdtemp(dir=root, prefix=".publish-")
+    for name, array in arrays.items():
+        np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(array))
+
+    # Another process may publish concurrently; take the next free number
+    while True:
+        existing = _versions(root)
+        version = f"v{int(existing[-1][1:]) + 1 if existing else 1:06d}"
+        try:
+            os.rename(staging, os.path.join(root, version))
+            break
+        except OSError:
+            if not os.path.exists(os.path.join(root, version)):
+                raise
+
+    fd, tmp_path = tempfile.mkstemp(dir=root, prefix=".current-")
+    with os.fdopen(fd, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(root, CURRENT_FILE))
+
+    for old in _versions(root)[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return version
+
+
+def attach(root, version=None, mmap=True):
+    """
+    Open a published model.
+
+    Args:
+        root: Store directory
+        version: Version to open; defaults to the live one
+        mmap: Map the arrays read-only instead of copying them into memory
+
+    Returns:
+        tuple: (CompactForest, LabelDecoder, version)
+    """
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No model published in {root}")
+    directory = os.path.join(root, version)
+    arrays = {}
+    for name in os.listdir(directory):
+        if name.endswith(".npy"):
+            array = np.load(os.path.join(directory, name), mmap_mode='r' if mmap else None)
+            # Plain ndarray views of the mapping: numpy results derived from
+            # np.memmap objects are memmaps too, which makes every operation slower
+            arrays[name[:-len(".npy")]] = array.view(np.ndarray)
+    return CompactForest.from_arrays(arrays), LabelDecoder(arrays['labels']), version
+
+
+class SharedModel:
+    """
+    Process-local handle on the live version of a shared model store.
+
+    get() costs one stat() of the CURRENT file when nothing changed. When
+    another process has published a new version, the handle attaches to it
+    and returns the new model from then on.
+    """
+
+    def __init__(self, root, build=None):
+        """
+        Args:
+            root: Store directory
+            build: Optional function returning (CompactForest, LabelDecoder),
+                used to publish the first version if the store is empty
+        """
+        self.root = root
+        self.build = build
+        self.version = None
+        self._model = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Return the live model, attaching to a newer version if one was published.
+
+        Returns:
+            tuple: (CompactForest, LabelDecoder)
+        """
+        signature = _current_signature(self.root)
+        if self._model is not None and signature == self._signature:
+            return self._model
+
+        with self._lock:
+            if signature is None:
+                self._publish_first()
+                signature = _current_signature(self.root)
+            if self._model is None or signature != self._signature:
+                forest, labels, version = attach(self.root)
+                self._model = (forest, labels)
+                self.version = version
+                self._signature = signature
+            return self._model
+
+    def _publish_first(self):
+        """Build and publish the first version, or wait for another process doing it."""
+        if self.build is None:
+            raise FileNotFoundError(f"No model published in {self.root}")
+        os.makedirs(self.root, exist_ok=True)
+        lock_path = os.path.join(self.root, BUILD_LOCK_FILE)
+        deadline = time.monotonic() + BUILD_TIMEOUT
+        while current_version(self.root) is None:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if time.monotonic() > deadline:
+                    # The builder died; clear its lock and try again
+                    try:
+                        os.unlink(lock_path)
+                    except FileNotFoundError:
+                        pass
+                    deadline = time.monotonic() + BUILD_TIMEOUT
+                time.sleep(0.2)
+                continue
+            try:
+                os.close(fd)
+                if current_version(self.root) is None:
+                    forest, labels = self.build()
+                    publish(forest, labels.classes_, self.root)
+            finally:
+                os.unlink(lock_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=["publish", "ensure", "status"])
+    args = parser.parse_args()
+
+    from crop_recommendation_model import SHARED_MODEL_DIR, publish_model
+
+    if args.command == "publish" or (args.command == "ensure" and current_version(SHARED_MODEL_DIR) is None):
+        print(f"Published {publish_model()} to {SHARED_MODEL_DIR}")
+    print(f"Live version: {current_version(SHARED_MODEL_DIR)} "
+          f"(on disk: {', '.join(_versions(SHARED_MODEL_DIR)) or 'none'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from field_history import INPUT_COLUMNS, connect, fetch_rows, history_path
+from model_inputs import FEATURE_RANGES, field_row
+
+# Past fields shown in the "Fields Like Yours" panel
+DEFAULT_NEIGHBOURS = 10
+
+# Seconds between checks for new submissions. New rows go into a delta that
+# is searched exhaustively, at most DELTA_LIMIT rows. A full delta is folded
+# into a second, "recent" tree, which is cheap to rebuild; once that grows
+# past REBUILD_FRACTION of the main tree, both are merged into a new main
+# tree. All rebuilds run on the background thread.
+REFRESH_INTERVAL = 5.0
+DELTA_LIMIT = 2000
+REBUILD_FRACTION = 0.1
+
+# Rows per fetch when loading the history
+LOAD_CHUNK = 100000
+
+# KD-tree leaf size; larger leaves build faster and search a little slower
+LEAF_SIZE = 32
+
+logger = logging.getLogger(__name__)
+
+_NO_IDS = np.empty(0, dtype=np.int64)
+_NO_VECTORS = np.empty((0, len(INPUT_COLUMNS)))
+
+
+def normalize(X):
+    """Scale the seven inputs to [0, 1] by their slider ranges, so each counts equally."""
+    X = np.asarray(X, dtype=np.float64)
+    return (X - FEATURE_RANGES[:, 0]) / (FEATURE_RANGES[:, 1] - FEATURE_RANGES[:, 0])
+
+
+def _tree_data(level):
+    return _NO_VECTORS if level is None else np.asarray(level[0].data)
+
+
+def _tree_ids(level):
+    return _NO_IDS if level is None else level[1]
+
+
+class FieldIndex:
+    """
+    Nearest-neighbour index over the normalized inputs of past submissions.
+
+    Submissions are spread over three levels, like a log-structured merge
+    tree: a main KD-tree over most of the history, a recent
+    KD-tree over the last few percent, and a small delta of the newest rows
+    that is searched exhaustively. refresh() appends new rows to the delta
+    and folds full levels into the next one, so the expensive main rebuild
+    only runs after the history has grown by REBUILD_FRACTION. Queries
+    read one immutable snapshot, so a rebuild never blocks them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # (main, recent, delta vectors, delta ids, last submission id seen);
+        # main and recent are (cKDTree, submission ids) or None
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.build_seconds = 0.0
+        # Failed refreshes, counted by the background thread; last_error is
+        # cleared by the next successful one
+        self.errors = 0
+        self.last_error = None
+        self._stopped = threading.Event()
+
+    def stop(self):
+        """Tell the background refresh thread to exit."""
+        self._stopped.set()
+
+    @property
+    def ready(self):
+        return self._snapshot is not None
+
+    @property
+    def size(self):
+        """Number of past submissions searched."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return 0
+        main, recent, _, delta_ids, _ = snapshot
+        return len(_tree_ids(main)) + len(_tree_ids(recent)) + len(delta_ids)
+
+    def _load(self, after_id):
+        """Ids and normalized inputs of submissions with id > after_id."""
+        if not os.path.exists(self.path):
+            return _NO_IDS, _NO_VECTORS
+        # Plain tuples: far cheaper than dict rows for millions of submissions
+        connection = connect(self.path)
+        try:
+            ids, vectors = [_NO_IDS], [_NO_VECTORS]
+            while True:
+                block = np.array(connection.execute(
+                    f"SELECT id, {', '.join(INPUT_COLUMNS)} FROM submissions WHERE id > ? ORDER BY id LIMIT ?",
+                    (after_id, LOAD_CHUNK)).fetchall(), dtype=np.float64)
+                if not len(block):
+                    break
+                ids.append(block[:, 0].astype(np.int64))
+                vectors.append(normalize(block[:, 1:]))
+                after_id = int(ids[-1][-1])
+        finally:
+            connection.close()
+        return np.concatenate(ids), np.vstack(vectors)
+
+    def _build(self, levels, delta, delta_ids):
+        """One KD-tree level over the given levels' rows plus a delta."""
+        # scipy comes with scikit-learn; its tree answers a single query ~3x
+        # faster than sklearn.neighbors.KDTree, which validates every call
+        from scipy.spatial import cKDTree
+
+        start = time.perf_counter()
+        vectors = np.vstack([_tree_data(level) for level in levels] + [delta])
+        ids = np.concatenate([_tree_ids(level) for level in levels] + [delta_ids])
+        tree = cKDTree(vectors, leafsize=LEAF_SIZE, balanced_tree=False)
+        self.build_seconds = time.perf_counter() - start
+        self.builds += 1
+        return tree, ids
+
+    def refresh(self):
+        """Pick up new submissions, folding full levels into larger trees."""
+        with self._lock:
+            main, recent, delta, delta_ids, last_id = self._snapshot or (None, None, _NO_VECTORS, _NO_IDS, 0)
+            new_ids, new_vectors = self._load(last_id)
+            if len(new_ids):
+                delta_ids = np.concatenate([delta_ids, new_ids])
+                delta = np.vstack([delta, new_vectors])
+                last_id = int(new_ids[-1])
+
+            if len(delta_ids) > DELTA_LIMIT:
+                if main is None:
+                    # First build, or the whole history is new
+                    main = self._build([recent], delta, delta_ids)
+                    recent = None
+                elif len(_tree_ids(recent)) + len(delta_ids) > REBUILD_FRACTION * len(_tree_ids(main)):
+                    main = self._build([main, recent], delta, delta_ids)
+                    recent = None
+                else:
+                    recent = self._build([recent], delta, delta_ids)
+                delta, delta_ids = _NO_VECTORS, _NO_IDS
+            self._snapshot = (main, recent, delta, delta_ids, last_id)
+
+    def query(self, x, k=DEFAULT_NEIGHBOURS):
+        """
+        Find the k past submissions closest to one input row.
+
+        Args:
+            x: Seven raw input values in feature order
+            k: Number of neighbours
+
+        Returns:
+            tuple: (submission ids, distances in normalized units), nearest
+                first; empty before the first refresh()
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return _NO_IDS, np.empty(0)
+        main, recent, delta, delta_ids, _ = snapshot
+        point = normalize(np.asarray(x, dtype=np.float64).reshape(1, -1))
+
+        ids, distances = [_NO_IDS], [np.empty(0)]
+        for level in (main, recent):
+            if level is not None:
+                tree, tree_ids = level
+                level_distances, positions = tree.query(point[0], k=min(k, len(tree_ids)))
+                ids.append(tree_ids[np.atleast_1d(positions)])
+                distances.append(np.atleast_1d(level_distances))
+        if len(delta_ids):
+            delta_distances = np.sqrt(((delta - point) ** 2).sum(axis=1))
+            nearest = np.argpartition(delta_distances, k)[:k] if len(delta_ids) > k else slice(None)
+            ids.append(delta_ids[nearest])
+            distances.append(delta_distances[nearest])
+
+        ids, distances = np.concatenate(ids), np.concatenate(distances)
+        order = np.argsort(distances, kind='stable')[:k]
+        return ids[order], distances[order]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _refresh_loop(index):
+    while True:
+        try:
+            index.refresh()
+            index.last_error = None
+        except Exception as e:
+            # E.g. the database is locked for longer than the busy timeout;
+            # the next round picks up where this one stopped. Anything else
+            # (a malformed row, out of memory) is logged with its traceback,
+            # and the thread keeps going so the index can still recover.
+            index.errors += 1
+            index.last_error = f"{type(e).__name__}: {e}"
+            if isinstance(e, sqlite3.Error):
+                logger.warning("Field index refresh failed, retrying in %.0f s: %s", REFRESH_INTERVAL, e)
+            else:
+                logger.exception("Field index refresh failed, retrying in %.0f s", REFRESH_INTERVAL)
+        if index._stopped.wait(REFRESH_INTERVAL):
+            return
+
+
+def get_field_index():
+    """
+    Return the process-wide index, or None if the history is turned off.
+
+    The first call starts a background thread that builds the index and
+    keeps it up to date; until the first refresh finishes the index is not
+    ready. If the history path changes, the old index's thread is stopped.
+    """
+    global _index
+    path = history_path()
+    if path is None:
+        return None
+    with _index_lock:
+        if _index is None or _index.path != path:
+            if _index is not None:
+                _index.stop()
+            _index = FieldIndex(path)
+            threading.Thread(target=_refresh_loop, args=(_index,), name="field-index", daemon=True).start()
+        return _index
+
+
+def similar_fields(field_conditions, k=DEFAULT_NEIGHBOURS, exclude_field_id=None, exclude_ids=()):
+    """
+    Past submissions with the inputs closest to a field's.
+
+    Args:
+        field_conditions: Dictionary with the field's input values
+        k: Number of past fields to return
+        exclude_field_id: Leave out submissions with this field ID (the
+            user's own earlier submissions)
+        exclude_ids: Leave out these submission ids (e.g. the row this very
+            submission was just stored as)
+
+    Returns:
+        dict or None: None while the index is being built; otherwise
+            'fields' (submission dicts with a 'distance' in normalized
+            units, nearest first), 'crops' ((top crop, count) among them,
+            most common first) and 'indexed' (past submissions searched)
+    """
+    index = get_field_index()
+    if index is None or not index.ready:
+        return None
+    x = field_row(field_conditions)
+    # Ask for extra neighbours so excluded submissions don't leave the list short
+    exclude_ids = set(exclude_ids)
+    ids, distances = index.query(x, k * 3 if exclude_field_id or exclude_ids else k)
+    distance_by_id = dict(zip(ids.tolist(), distances.tolist()))
+
+    fields = []
+    if distance_by_id:
+        placeholders = ", ".join("?" * len(distance_by_id))
+        for row in fetch_rows(f"SELECT * FROM submissions WHERE id IN ({placeholders})",
+                              tuple(distance_by_id), index.path):
+            if row['id'] in exclude_ids or (exclude_field_id and row['field_id'] == exclude_field_id):
+                continue
+            row['distance'] = distance_by_id[row['id']]
+            fields.append(row)
+        fields = sorted(fields, key=lambda row: row['distance'])[:k]
+    return {
+        'fields': fields,
+        'crops': Counter(row['top_crop'] for row in fields).most_common(),
+        'indexed': index.size,
+    }
@@ -3,5 +3,8 @@
 # Use PORT from environment or default to 5000
 PORT="${PORT:-5000}"
 
+# Train and publish the shared model once, before any app process needs it
+python shared_model.py ensure
+
 # Run streamlit with specified port
 streamlit run app.py --server.port=$PORT --server.address=0.0.0.0
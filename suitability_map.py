@@ -0,0 +1,514 @@
+"""
+Precompute a regional crop-suitability map over the climate grid.
+
+Scores every cell of the climate grid (see climate_grid.py) with the
+compact forest and writes the top crop and its probability as
+memory-mapped rasters. Soil inputs are either fixed for the whole region
+or read from ESRI ASCII soil grids (N, P, K, pH) on the climate grid's
+geometry. The grid is cut into JOB_TILE x JOB_TILE tiles scored by a
+process pool. Each finished tile is marked in done.npy, so an interrupted
+run picks up where it stopped; a different model, climate grid or soil
+input starts the map over.
+
+    map.json          geometry, crop names, model version, inputs, last run
+    crop.npy          (rows, cols) uint8 index into the crop names, 255 = no data
+    probability.npy   (rows, cols) uint8 probability of that crop, in 1/255 steps
+    done.npy          (tile rows, tile cols) uint8, 1 once a tile is written
+    soil.npy          (rows, cols, 4) float32 N, P, K, pH (with --soil-grids)
+
+The app shows the map, and looks up single cells, on its Suitability Map
+page.
+
+Usage:
+    python suitability_map.py build [--soil 50 50 50 6.5 | --soil-grids n.asc p.asc k.asc ph.asc] \\
+        [--workers 4] [--restart]
+    python suitability_map.py status
+    python suitability_map.py lookup "12.97, 77.59"
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
+import numpy as np
+
+from climate_grid import (VARIABLES, ClimateGrid, climate_grid_path, get_climate_grid, parse_location,
+                          read_ascii_grid)
+from model_inputs import FEATURE_KEYS
+
+# Environment variable with the map directory
+SUITABILITY_MAP_ENV_VAR = "SUITABILITY_MAP"
+DEFAULT_SUITABILITY_MAP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "suitability")
+
+# Cells per job tile side: 65,536 cells scored in one predict_proba call,
+# large enough to amortize the call, small enough to lose little on restart
+JOB_TILE = 256
+
+NO_CROP = 255
+
+# Soil inputs, in model feature order, and the sidebar defaults used when
+# no soil grids are given
+SOIL_INPUTS = ('n_value', 'p_value', 'k_value', 'ph_value')
+DEFAULT_SOIL = (50.0, 50.0, 50.0, 6.5)
+
+# Columns of the model input taken from the soil and the climate
+_SOIL_COLUMNS = [FEATURE_KEYS.index(key) for key in SOIL_INPUTS]
+_CLIMATE_COLUMNS = [FEATURE_KEYS.index(key) for key in VARIABLES]
+
+# Seconds between progress lines during a build
+PROGRESS_INTERVAL = 5.0
+
+# Cells per side of the map drawn in the app, at most. The figure carries a
+# crop name per cell for hovering, about 1 MB at this size.
+MAP_DISPLAY_SIZE = 300
+
+
+def suitability_map_path():
+    return os.environ.get(SUITABILITY_MAP_ENV_VAR, "").strip() or DEFAULT_SUITABILITY_MAP
+
+
+def _write_meta(directory, meta):
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".map-")
+    with os.fdopen(fd, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(directory, "map.json"))
+
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, "map.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+
+def _convert_soil(output, grid, soil_grids):
+    """Stream the four soil grids into soil.npy, checking they match the climate grid."""
+    opened = [read_ascii_grid(path) for path in soil_grids]
+    for (geometry, _), path in zip(opened, soil_grids):
+        if (geometry['rows'], geometry['cols']) != (grid.rows, grid.cols) or not all(
+                math.isclose(geometry[key], getattr(grid, key), abs_tol=1e-9)
+                for key in ('west', 'north', 'cell_size')):
+            raise ValueError(f"{path} does not have the climate grid's rows, columns and corner")
+    soil = np.lib.format.open_memmap(os.path.join(output, "soil.npy"), mode="w+", dtype=np.float32,
+                                     shape=(grid.rows, grid.cols, len(SOIL_INPUTS)))
+    top = 0
+    for bands in zip(*(stream for _, stream in opened)):
+        soil[top:top + len(bands[0])] = np.stack(bands, axis=-1)
+        top += len(bands[0])
+    soil.flush()
+
+
+def prepare_map(output, version, labels, soil=None, soil_grids=None, restart=False):
+    """
+    Create the map files, or reuse them to resume an interrupted build.
+
+    Args:
+        output: Map directory
+        version: Model version the map is scored with
+        labels: Crop names, in the model's class order
+        soil: Fixed (N, P, K, pH) for every cell; defaults to DEFAULT_SOIL
+        soil_grids: Paths of N, P, K and pH ESRI ASCII grids instead
+        restart: Start over even if a matching build can be resumed
+
+    Returns:
+        dict: The map's metadata (map.json)
+
+    Raises:
+        FileNotFoundError: No climate grid is configured
+    """
+    grid = get_climate_grid()
+    if grid is None:
+        raise FileNotFoundError(f"No climate grid in {climate_grid_path()}; see climate_grid.py")
+    inputs = {
+        'model_version': version,
+        'climate': _file_signature(os.path.join(grid.directory, "grid.json")),
+        'soil': [_file_signature(path) for path in soil_grids] if soil_grids
+                else [float(value) for value in soil or DEFAULT_SOIL],
+        'job_tile': JOB_TILE,
+    }
+    meta = _read_meta(output)
+    if meta is not None and meta['inputs'] == inputs and not restart:
+        return meta
+
+    # Start over: the files are replaced, never patched
+    if os.path.exists(output):
+        shutil.rmtree(output)
+    os.makedirs(output)
+    tile_rows, tile_cols = -(-grid.rows // JOB_TILE), -(-grid.cols // JOB_TILE)
+    for name, dtype, shape, fill in (("crop", np.uint8, (grid.rows, grid.cols), NO_CROP),
+                                     ("probability", np.uint8, (grid.rows, grid.cols), 0),
+                                     ("done", np.uint8, (tile_rows, tile_cols), 0)):
+        array = np.lib.format.open_memmap(os.path.join(output, f"{name}.npy"), mode="w+", dtype=dtype,
+                                          shape=shape)
+        array[:] = fill
+        array.flush()
+        del array
+    if soil_grids:
+        _convert_soil(output, grid, soil_grids)
+    meta = {
+        'rows': grid.rows, 'cols': grid.cols, 'west': grid.west, 'north': grid.north,
+        'cell_size': grid.cell_size, 'climate_dir': grid.directory, 'crops': [str(label) for label in labels],
+        'inputs': inputs, 'crop_cells': None, 'last_run': None,
+    }
+    _write_meta(output, meta)
+    return meta
+
+
+# Per-process state of the pool workers, set by _init_worker
+_worker = {}
+
+
+def _init_worker(output):
+    from crop_recommendation_model import get_model
+
+    meta = _read_meta(output)
+    _worker['meta'] = meta
+    _worker['grid'] = ClimateGrid(meta['climate_dir'])
+    _worker['crop'] = np.load(os.path.join(output, "crop.npy"), mmap_mode='r+')
+    _worker['probability'] = np.load(os.path.join(output, "probability.npy"), mmap_mode='r+')
+    _worker['done'] = np.load(os.path.join(output, "done.npy"), mmap_mode='r+')
+    soil_path = os.path.join(output, "soil.npy")
+    _worker['soil'] = np.load(soil_path, mmap_mode='r') if os.path.exists(soil_path) else None
+    # The shared model store is memory-mapped: every worker maps one copy
+    _worker['model'], _ = get_model()
+
+
+def _score_tile(tile_row, tile_col):
+    """
+    Score one job tile and mark it done.
+
+    Returns:
+        tuple: (cells with data, seconds)
+    """
+    start = time.perf_counter()
+    meta, grid = _worker['meta'], _worker['grid']
+    top, left = tile_row * JOB_TILE, tile_col * JOB_TILE
+    n_rows, n_cols = min(JOB_TILE, meta['rows'] - top), min(JOB_TILE, meta['cols'] - left)
+
+    X = np.empty((n_rows, n_cols, len(FEATURE_KEYS)))
+    X[:, :, _CLIMATE_COLUMNS] = grid.window(top, left, n_rows, n_cols)
+    if _worker['soil'] is not None:
+        X[:, :, _SOIL_COLUMNS] = _worker['soil'][top:top + n_rows, left:left + n_cols]
+    else:
+        X[:, :, _SOIL_COLUMNS] = meta['inputs']['soil']
+    valid = ~np.isnan(X).any(axis=2)
+
+    crops = np.full((n_rows, n_cols), NO_CROP, dtype=np.uint8)
+    probabilities = np.zeros((n_rows, n_cols), dtype=np.uint8)
+    if valid.any():
+        proba = _worker['model'].predict_proba(X[valid])
+        best = np.argmax(proba, axis=1)
+        crops[valid] = best
+        probabilities[valid] = np.rint(proba[np.arange(len(best)), best] * 255)
+
+    # Raster first, then the done flag: a crash in between only redoes the tile
+    _worker['crop'][top:top + n_rows, left:left + n_cols] = crops
+    _worker['probability'][top:top + n_rows, left:left + n_cols] = probabilities
+    _worker['crop'].flush()
+    _worker['probability'].flush()
+    _worker['done'][tile_row, tile_col] = 1
+    _worker['done'].flush()
+    return int(valid.sum()), time.perf_counter() - start
+
+
+def _count_crops(output, n_crops):
+    """Cells per top crop, read in row blocks."""
+    crop = np.load(os.path.join(output, "crop.npy"), mmap_mode='r')
+    counts = np.zeros(NO_CROP + 1, dtype=np.int64)
+    for top in range(0, crop.shape[0], JOB_TILE):
+        counts += np.bincount(crop[top:top + JOB_TILE].ravel(), minlength=NO_CROP + 1)
+    return counts[:n_crops].tolist()
+
+
+def build_map(output=None, workers=None, soil=None, soil_grids=None, restart=False, progress=print):
+    """
+    Score every tile of the climate grid that is not done yet.
+
+    Args:
+        output: Map directory; defaults to the configured one
+        workers: Worker processes; defaults to the number of CPUs. With 1
+            the tiles are scored in this process.
+        soil, soil_grids, restart: See prepare_map()
+        progress: Called with a progress line every PROGRESS_INTERVAL seconds
+
+    Returns:
+        dict: 'tiles' (in the map), 'resumed' (already done), 'scored'
+            (tiles scored now), 'cells' (cells with data scored now),
+            'seconds' and 'cells_per_second'
+    """
+    from crop_recommendation_model import get_model, model_version
+
+    output = output or suitability_map_path()
+    workers = workers or os.cpu_count() or 1
+    _, labels = get_model()
+    meta = prepare_map(output, model_version(), labels.classes_, soil, soil_grids, restart)
+    done = np.load(os.path.join(output, "done.npy"))
+    pending = [tuple(tile) for tile in np.argwhere(done == 0).tolist()]
+
+    start = last_report = time.perf_counter()
+    cells = scored = 0
+
+    def finished(result):
+        nonlocal cells, scored, last_report
+        cells += result[0]
+        scored += 1
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            progress(f"{scored:,}/{len(pending):,} tiles, {cells / (now - start):,.0f} cells/s")
+
+    if workers == 1:
+        _init_worker(output)
+        for tile in pending:
+            finished(_score_tile(*tile))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(output,)) as pool:
+            for future in as_completed([pool.submit(_score_tile, *tile) for tile in pending]):
+                finished(future.result())
+
+    seconds = time.perf_counter() - start
+    run = {'tiles': int(done.size), 'resumed': int(done.size - len(pending)), 'scored': scored, 'cells': cells,
+           'seconds': seconds, 'cells_per_second': cells / seconds if seconds else 0.0, 'workers': workers}
+    meta['crop_cells'] = _count_crops(output, len(meta['crops']))
+    meta['last_run'] = run
+    _write_meta(output, meta)
+    return run
+
+
+class SuitabilityMap:
+    """Read-only view of a precomputed suitability map, memory-mapped."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.meta = _read_meta(directory)
+        self.rows, self.cols = self.meta['rows'], self.meta['cols']
+        self.crops = self.meta['crops']
+        self.crop = np.load(os.path.join(directory, "crop.npy"), mmap_mode='r').view(np.ndarray)
+        self.probability = np.load(os.path.join(directory, "probability.npy"), mmap_mode='r').view(np.ndarray)
+
+    def lookup(self, lat, lon):
+        """
+        Top crop of the cell containing a point.
+
+        Returns:
+            dict or None: 'crop' and 'probability' (0-1); None outside the
+                map or where the cell has no data or is not scored yet
+        """
+        row = math.floor((self.meta['north'] - lat) / self.meta['cell_size'])
+        col = math.floor((lon - self.meta['west']) / self.meta['cell_size'])
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return None
+        crop = int(self.crop[row, col])
+        if crop == NO_CROP:
+            return None
+        return {'crop': self.crops[crop], 'probability': int(self.probability[row, col]) / 255}
+
+    def completion(self):
+        """Share of job tiles scored."""
+        return float(np.load(os.path.join(self.directory, "done.npy")).mean())
+
+    def overview(self, size=MAP_DISPLAY_SIZE):
+        """
+        Every n-th cell, so the map fits in size x size cells.
+
+        Returns:
+            tuple: (latitudes, longitudes, crop indices with NaN for no
+                data, probabilities in whole percent)
+        """
+        step = max(1, -(-max(self.rows, self.cols) // size))
+        crop = self.crop[::step, ::step].astype(np.float32)
+        probability = np.rint(self.probability[::step, ::step] / 2.55)
+        crop[crop == NO_CROP] = np.nan
+        cell_size = self.meta['cell_size']
+        lats = self.meta['north'] - (np.arange(0, self.rows, step) + 0.5) * cell_size
+        lons = self.meta['west'] + (np.arange(0, self.cols, step) + 0.5) * cell_size
+        return lats, lons, crop, probability
+
+
+_map = None
+_map_signature = None
+_map_lock = threading.Lock()
+
+
+def get_suitability_map():
+    """
+    Return the configured suitability map, or None if none has been built.
+
+    Costs one stat() per call once open, like get_climate_grid().
+    """
+    global _map, _map_signature
+    directory = suitability_map_path()
+    try:
+        stat = os.stat(os.path.join(directory, "map.json"))
+    except FileNotFoundError:
+        return None
+    signature = (directory, stat.st_ino, stat.st_mtime_ns)
+    if signature != _map_signature:
+        with _map_lock:
+            if signature != _map_signature:
+                _map = SuitabilityMap(directory)
+                _map_signature = signature
+    return _map
+
+
+def suitability_at(text):
+    """
+    Look up the precomputed top crop for a location typed by the user.
+
+    Args:
+        text: "lat, lon" in decimal degrees, or a district code of the
+            climate grid
+
+    Returns:
+        dict or None: None without a map; otherwise 'label', 'crop' and
+            'probability' (0-1)
+
+    Raises:
+        ValueError: Unknown location, or no map data there; the message is
+            meant for the user
+    """
+    suitability = get_suitability_map()
+    if suitability is None:
+        return None
+    label, lat, lon = parse_location(text, get_climate_grid())
+    cell = suitability.lookup(lat, lon)
+    if cell is None:
+        raise ValueError(f"No suitability data for {label}")
+    return {'label': label, **cell}
+
+
+# Keyed on the SuitabilityMap itself: get_suitability_map() opens a new one
+# whenever map.json changes, so a rebuilt or growing map gets a new figure
+@lru_cache(maxsize=8)
+def _map_figure(suitability, view, lite):
+    import plotly.colors
+    import plotly.graph_objects as go
+
+    lats, lons, crop, probability = suitability.overview()
+    lats, lons = np.round(lats, 3), np.round(lons, 3)
+    names = np.array(suitability.crops + [""])
+    text = names[np.nan_to_num(crop, nan=len(suitability.crops)).astype(int)]
+    # Integers where possible: the figure is sent on every rerun of the page
+    probability = probability.astype(np.uint8)
+    if view == "crop":
+        # One flat colour band per crop index
+        palette = plotly.colors.qualitative.Alphabet
+        n = len(suitability.crops)
+        colorscale = []
+        for i in range(n):
+            colour = palette[i % len(palette)]
+            colorscale += [(i / n, colour), ((i + 1) / n, colour)]
+        heatmap = go.Heatmap(z=crop, x=lons, y=lats, text=text, customdata=probability, zmin=-0.5,
+                             zmax=n - 0.5, colorscale=colorscale, showscale=False,
+                             hovertemplate="%{text}, %{customdata:.0f}%<extra></extra>")
+        title = "Most suitable crop"
+    else:
+        heatmap = go.Heatmap(z=np.where(np.isnan(crop), np.nan, probability).astype(np.float32), x=lons, y=lats, text=text,
+                             colorscale='Viridis', zmin=0, zmax=100, colorbar={'title': "%"},
+                             hovertemplate="%{text}, %{z:.0f}%<extra></extra>")
+        title = "Probability of the most suitable crop"
+    fig = go.Figure(heatmap)
+    fig.update_layout(title=title, xaxis_title="Longitude", yaxis_title="Latitude",
+                      yaxis={'scaleanchor': 'x'}, height=600)
+    if lite:
+        fig.layout.template = {}
+    return fig
+
+
+def suitability_map_page():
+    """The Suitability Map page (Streamlit)."""
+    import streamlit as st
+    from chart_payload import chart_mode
+
+    st.title("🗺️ Regional Crop Suitability")
+    suitability = get_suitability_map()
+    if suitability is None:
+        st.info("No suitability map has been built yet. Run `python suitability_map.py build` "
+                "after converting a climate grid (see climate_grid.py).")
+        return
+    meta = suitability.meta
+    soil = meta['inputs']['soil']
+    soil_text = ("soil from grids" if isinstance(soil[0], list) else
+                 f"soil fixed at N {soil[0]:g}, P {soil[1]:g}, K {soil[2]:g}, pH {soil[3]:g}")
+    completion = suitability.completion()
+    st.caption(f"Model {meta['inputs']['model_version']}, {soil_text}. "
+               f"{meta['rows'] * meta['cols']:,} cells"
+               + ("" if completion == 1 else f"; {completion:.0%} scored so far") + ".")
+
+    location = st.text_input("Look up a location", key='map-location',
+                             help="Latitude and longitude (e.g. 12.97, 77.59) or a district code")
+    if location.strip():
+        try:
+            cell = suitability_at(location)
+        except ValueError as e:
+            st.warning(str(e))
+        else:
+            st.write(f"**{cell['label']}**: {cell['crop']} ({cell['probability']:.0%})")
+
+    view = st.radio("Show", ["crop", "probability"], horizontal=True, key='map-view',
+                    format_func={"crop": "Most suitable crop", "probability": "Probability"}.get)
+    # Streamlit has no native heatmap; every chart mode but 'full' sends the lite figure
+    st.plotly_chart(_map_figure(suitability, view, chart_mode() != 'full'))
+
+    if meta['crop_cells']:
+        total = sum(meta['crop_cells'])
+        shares = sorted(zip(meta['crops'], meta['crop_cells']), key=lambda item: -item[1])
+        st.table([{"Crop": crop, "Cells": f"{count:,}", "Share": f"{count / total:.1%}"}
+                  for crop, count in shares if count])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Score the climate grid (resumes an interrupted build)")
+    soil = build.add_mutually_exclusive_group()
+    soil.add_argument("--soil", type=float, nargs=4, metavar=("N", "P", "K", "PH"),
+                      help=f"Fixed soil inputs (default: {' '.join(f'{v:g}' for v in DEFAULT_SOIL)})")
+    soil.add_argument("--soil-grids", nargs=4, metavar=("N", "P", "K", "PH"), help="Soil ESRI ASCII grids")
+    build.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    build.add_argument("--restart", action="store_true", help="Start over instead of resuming")
+    commands.add_parser("status", help="Show the map's progress and last run")
+    lookup = commands.add_parser("lookup", help="Top crop at a location")
+    lookup.add_argument("location", help='"lat, lon" or a district code')
+    args = parser.parse_args()
+
+    if args.command == "build":
+        run = build_map(workers=args.workers, soil=args.soil, soil_grids=args.soil_grids, restart=args.restart)
+        print(f"Scored {run['scored']:,} tiles ({run['resumed']:,} of {run['tiles']:,} already done), "
+              f"{run['cells']:,} cells in {run['seconds']:.1f} s: {run['cells_per_second']:,.0f} cells/s "
+              f"with {run['workers']} workers")
+    elif args.command == "status":
+        suitability = get_suitability_map()
+        if suitability is None:
+            parser.error(f"No suitability map in {suitability_map_path()}")
+        meta = suitability.meta
+        print(f"{suitability.directory}: {meta['rows']:,} x {meta['cols']:,} cells, model "
+              f"{meta['inputs']['model_version']}, {suitability.completion():.0%} of tiles scored")
+        if meta['last_run']:
+            run = meta['last_run']
+            print(f"Last run: {run['cells']:,} cells in {run['seconds']:.1f} s, "
+                  f"{run['cells_per_second']:,.0f} cells/s with {run['workers']} workers")
+    else:
+        try:
+            cell = suitability_at(args.location)
+        except ValueError as e:
+            parser.error(str(e))
+        if cell is None:
+            parser.error(f"No suitability map in {suitability_map_path()}")
+        print(f"{cell['label']}: {cell['crop']} ({cell['probability']:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import smtplib
+import threading
+
+import pytest
+
+
+class FakeSMTPServer:
+    """
+    In-memory stand-in for an SMTP server, plugged in through smtp_factory.
+
+    Every connection is recorded with the messages sent over it. fail()
+    scripts errors per recipient: each send to that recipient pops the next
+    one, and a send succeeds once the list is empty.
+    """
+
+    def __init__(self):
+        self.connections = []
+        self.failures = {}
+        self._lock = threading.Lock()
+
+    def fail(self, recipient, *errors):
+        self.failures[recipient] = list(errors)
+
+    def factory(self, host, port, timeout=None):
+        session = _FakeSMTP(self)
+        with self._lock:
+            self.connections.append(session)
+        return session
+
+    @property
+    def delivered(self):
+        return [recipient for session in self.connections for recipient in session.sent]
+
+
+class _FakeSMTP:
+    def __init__(self, server):
+        self.server = server
+        self.sent = []
+        self.logged_in = False
+        self.closed = False
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        self.logged_in = True
+
+    def sendmail(self, sender, recipients, message_text):
+        if self.closed:
+            raise smtplib.SMTPServerDisconnected("Connection closed")
+        with self.server._lock:
+            errors = self.server.failures.get(recipients[0])
+            error = errors.pop(0) if errors else None
+        if error is not None:
+            raise error
+        self.sent.extend(recipients)
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def smtp_server():
+    return FakeSMTPServer()
@@ -0,0 +1,86 @@
+import json
+import smtplib
+
+import bulk_mailer
+from bulk_mailer import job_key, load_journal, send_bulk
+
+CONFIG = {'host': "localhost", 'port': 25, 'user': "sender@example.com", 'password': "secret"}
+
+
+def _jobs(n):
+    return [{'recipient': f"user{i}@example.com", 'pdf_bytes': f"%PDF-1.4 report {i}".encode()} for i in range(n)]
+
+
+def _send(smtp_server, jobs, **kwargs):
+    kwargs.setdefault('backoff_base', 0)
+    return send_bulk(jobs, config=CONFIG, smtp_factory=smtp_server.factory, **kwargs)
+
+
+def test_reuses_and_rotates_sessions(smtp_server):
+    outcome = _send(smtp_server, _jobs(7), sessions=1, max_per_session=3)
+
+    assert outcome['metrics']['sent'] == 7
+    # One session sends 3 messages per connection before reconnecting
+    assert [len(session.sent) for session in smtp_server.connections] == [3, 3, 1]
+    assert outcome['metrics']['connections_opened'] == 3
+    assert all(session.closed for session in smtp_server.connections)
+
+
+def test_parallel_sessions_share_the_work(smtp_server):
+    outcome = _send(smtp_server, _jobs(20), sessions=2, max_per_session=100)
+
+    assert outcome['metrics']['sessions'] == 2
+    assert outcome['metrics']['connections_opened'] == 2
+    assert sorted(smtp_server.delivered) == sorted(job['recipient'] for job in _jobs(20))
+
+
+def test_one_result_per_message_with_retries(smtp_server):
+    smtp_server.fail("user1@example.com", smtplib.SMTPResponseException(421, b"Try later"))
+    smtp_server.fail("user2@example.com", smtplib.SMTPResponseException(550, b"No such user"))
+    outcome = _send(smtp_server, _jobs(4), sessions=1, max_attempts=3)
+
+    results = outcome['results']
+    assert [r['recipient'] for r in results] == [job['recipient'] for job in _jobs(4)]
+    assert [r['status'] for r in results] == ['sent', 'sent', 'failed', 'sent']
+    assert [r['attempts'] for r in results] == [1, 2, 1, 1]
+    assert "No such user" in results[2]['error']
+    assert outcome['metrics']['failed'] == 1
+
+
+def test_bad_job_does_not_abort_the_batch(smtp_server, monkeypatch):
+    real_build_message = bulk_mailer.build_message
+
+    def build_message(**kwargs):
+        if kwargs['recipient'] == "user1@example.com":
+            raise ValueError("Cannot build message")
+        return real_build_message(**kwargs)
+
+    monkeypatch.setattr(bulk_mailer, "build_message", build_message)
+    jobs = _jobs(3) + [{'recipient': "nopdf@example.com"}]
+    outcome = _send(smtp_server, jobs, sessions=1)
+
+    assert [r['status'] for r in outcome['results']] == ['sent', 'failed', 'sent', 'failed']
+    assert "Cannot build message" in outcome['results'][1]['error']
+    assert outcome['results'][3]['recipient'] == "nopdf@example.com"
+    assert smtp_server.delivered == ["user0@example.com", "user2@example.com"]
+
+
+def test_resume_skips_messages_already_sent(smtp_server, tmp_path):
+    journal = tmp_path / "sent.jsonl"
+    jobs = _jobs(5)
+    smtp_server.fail("user3@example.com", smtplib.SMTPResponseException(550, b"Mailbox full"))
+    first = _send(smtp_server, jobs, sessions=1, journal_path=str(journal))
+    assert first['metrics']['sent'] == 4
+
+    # An interrupted write leaves a torn last line; it must not break resuming
+    with open(journal, "a") as f:
+        f.write('{"key": "torn')
+    assert load_journal(str(journal)) == {job_key(j['recipient'], j['pdf_bytes'])
+                                          for j in jobs if j['recipient'] != "user3@example.com"}
+
+    smtp_server.connections.clear()
+    second = _send(smtp_server, jobs, sessions=1, journal_path=str(journal))
+    assert [r['status'] for r in second['results']] == ['skipped'] * 3 + ['sent', 'skipped']
+    assert smtp_server.delivered == ["user3@example.com"]
+    entries = [json.loads(line) for line in open(journal) if line.startswith('{"key": "user')]
+    assert [e['status'] for e in entries].count('sent') == 5
@@ -0,0 +1,128 @@
+import smtplib
+import threading
+
+import email_outbox
+from email_outbox import (FAILED, RETRYING, SENT, Outbox, SMTPConnection, build_message, get_outbox,
+                          is_transient)
+
+
+def _outbox(smtp_server, sleep):
+    connection = SMTPConnection("localhost", 25, "sender@example.com", "secret",
+                                smtp_factory=smtp_server.factory)
+    return Outbox(connection, max_attempts=3, backoff_base=0.5, sleep=sleep)
+
+
+def _message(recipient):
+    return build_message("sender@example.com", recipient, "Report", "Hello", attachment=b"%PDF-1.4")
+
+
+def test_sends_over_one_pooled_connection(smtp_server):
+    outbox = _outbox(smtp_server, sleep=lambda seconds: None)
+    ids = [outbox.submit(_message(f"user{i}@example.com")) for i in range(3)]
+    records = [outbox.wait(message_id, timeout=5) for message_id in ids]
+    outbox.close()
+
+    assert [record['status'] for record in records] == [SENT] * 3
+    assert [record['attempts'] for record in records] == [1, 1, 1]
+    assert smtp_server.delivered == [f"user{i}@example.com" for i in range(3)]
+    assert len(smtp_server.connections) == 1
+    assert smtp_server.connections[0].logged_in
+
+
+def test_retries_transient_errors_with_backoff(smtp_server):
+    smtp_server.fail("user@example.com", smtplib.SMTPResponseException(421, b"Try later"),
+                     smtplib.SMTPResponseException(451, b"Busy"))
+    sleeps = []
+    outbox = _outbox(smtp_server, sleep=sleeps.append)
+    record = outbox.wait(outbox.submit(_message("user@example.com")), timeout=5)
+    outbox.close()
+
+    assert record['status'] == SENT
+    assert record['attempts'] == 3
+    assert record['error'] is None
+    assert sleeps == [0.5, 1.0]
+    # The session is dropped after each error and reopened for the retry
+    assert len(smtp_server.connections) == 3
+
+
+def test_reconnects_a_dropped_session_within_one_attempt(smtp_server):
+    smtp_server.fail("user@example.com", smtplib.SMTPServerDisconnected("Dropped"))
+    sleeps = []
+    outbox = _outbox(smtp_server, sleep=sleeps.append)
+    record = outbox.wait(outbox.submit(_message("user@example.com")), timeout=5)
+    outbox.close()
+
+    assert record['status'] == SENT
+    assert record['attempts'] == 1
+    assert sleeps == []
+    assert len(smtp_server.connections) == 2
+
+
+def test_permanent_error_fails_without_retry(smtp_server):
+    smtp_server.fail("bad@example.com", smtplib.SMTPResponseException(550, b"No such user"))
+    sleeps = []
+    outbox = _outbox(smtp_server, sleep=sleeps.append)
+    failed = outbox.wait(outbox.submit(_message("bad@example.com")), timeout=5)
+    sent = outbox.wait(outbox.submit(_message("good@example.com")), timeout=5)
+    outbox.close()
+
+    assert failed['status'] == FAILED
+    assert failed['attempts'] == 1
+    assert "No such user" in failed['error']
+    assert sleeps == []
+    assert sent['status'] == SENT
+
+
+def test_gives_up_after_max_attempts(smtp_server):
+    smtp_server.fail("user@example.com", *[smtplib.SMTPResponseException(451, b"Busy")] * 3)
+    outbox = _outbox(smtp_server, sleep=lambda seconds: None)
+    record = outbox.wait(outbox.submit(_message("user@example.com")), timeout=5)
+    outbox.close()
+
+    assert record['status'] == FAILED
+    assert record['attempts'] == 3
+
+
+def test_status_while_retrying(smtp_server):
+    smtp_server.fail("user@example.com", smtplib.SMTPResponseException(421, b"Try later"))
+    backing_off, release = threading.Event(), threading.Event()
+
+    def sleep(seconds):
+        backing_off.set()
+        release.wait(5)
+
+    outbox = _outbox(smtp_server, sleep=sleep)
+    message_id = outbox.submit(_message("user@example.com"))
+    assert backing_off.wait(5)
+    record = outbox.status(message_id)
+    assert record['status'] == RETRYING
+    assert record['attempts'] == 1
+    assert record['recipients'] == ["user@example.com"]
+    assert "Try later" in record['error']
+
+    release.set()
+    assert outbox.wait(message_id, timeout=5)['status'] == SENT
+    outbox.close()
+    assert outbox.status(message_id + 1) is None
+
+
+def test_is_transient():
+    assert is_transient(smtplib.SMTPResponseException(421, b""))
+    assert not is_transient(smtplib.SMTPResponseException(550, b""))
+    assert is_transient(smtplib.SMTPServerDisconnected())
+    assert is_transient(TimeoutError())
+    assert not is_transient(smtplib.SMTPAuthenticationError(535, b""))
+
+
+def test_one_outbox_per_process_replaced_on_settings_change(monkeypatch):
+    monkeypatch.setattr(email_outbox, "_outbox", None)
+    config = {'host': "localhost", 'port': 25, 'user': "sender@example.com", 'password': "secret"}
+    first = get_outbox(config)
+    assert get_outbox(dict(config)) is first
+
+    second = get_outbox(dict(config, password="rotated"))
+    assert second is not first
+    # The replaced outbox's sender thread stops instead of lingering
+    first._thread.join(5)
+    assert not first._thread.is_alive()
+    second.close()